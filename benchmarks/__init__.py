@@ -0,0 +1,11 @@
+"""
+Benchmarks for feast-mysql.
+
+``bench_retrieval`` drives the offline store end to end against a MySQL server,
+optionally one started locally by ``local_mysqld``, on data from ``datagen``:
+
+    python -m benchmarks.bench_retrieval --start-mysqld --entities 10000
+
+The ``bench_*`` scripts next to it time single components and can also be run as
+files.
+"""
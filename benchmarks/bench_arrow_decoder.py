@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for decoding MySQL result rows into Arrow.
+
+Compares the previous fetchall + per-cell transpose path of
+``MySQLRetrievalJob._to_arrow_internal`` against ``ArrowResultDecoder`` on
+synthetic rows shaped like pymysql output. No database is needed:
+
+    python benchmarks/bench_arrow_decoder.py --rows 1000000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, List
+
+import pyarrow as pa
+from pymysql import FIELD_TYPE
+
+from feast_mysql.arrow_decoder import ArrowResultDecoder, DEFAULT_FETCH_SIZE
+
+# name, type_code, display size, internal size, precision, scale, null_ok
+DESCRIPTION = [
+    ("driver_id", FIELD_TYPE.LONGLONG, None, 20, 20, 0, False),
+    ("event_timestamp", FIELD_TYPE.DATETIME, None, 26, 26, 6, False),
+    ("conv_rate", FIELD_TYPE.DOUBLE, None, 22, 22, 31, True),
+    ("trip_fare", FIELD_TYPE.NEWDECIMAL, None, 12, 12, 2, True),
+    ("city", FIELD_TYPE.VAR_STRING, None, 255, 255, 0, True),
+    ("attributes", FIELD_TYPE.JSON, None, 4294967295, 4294967295, 0, True),
+]
+SCHEMA = pa.schema(
+    [
+        ("driver_id", pa.int64()),
+        ("event_timestamp", pa.timestamp("us")),
+        ("conv_rate", pa.float64()),
+        ("trip_fare", pa.float64()),
+        ("city", pa.string()),
+        ("attributes", pa.string()),
+    ]
+)
+
+
+def make_rows(n: int) -> List[tuple]:
+    start = datetime(2022, 1, 1)
+    return [
+        (
+            i,
+            start + timedelta(seconds=i),
+            i / 7 if i % 10 else None,
+            Decimal(f"{i % 1000}.{i % 100:02d}"),
+            f"city_{i % 50}",
+            '{"rating": %d}' % (i % 5) if i % 3 else None,
+        )
+        for i in range(n)
+    ]
+
+
+def legacy_path(rows: List[tuple]) -> pa.Table:
+    data_transposed: List[List[Any]] = []
+    for col in range(len(DESCRIPTION)):
+        data_transposed.append([])
+        for row in range(len(rows)):
+            value = rows[row][col]
+            data_transposed[col].append(
+                float(value) if isinstance(value, Decimal) else value
+            )
+    return pa.Table.from_arrays(
+        [pa.array(column) for column in data_transposed], schema=SCHEMA
+    )
+
+
+def decoder_path(rows: List[tuple]) -> pa.Table:
+    decoder = ArrowResultDecoder(DESCRIPTION)
+    batches = [
+        decoder.decode(rows[i : i + DEFAULT_FETCH_SIZE])
+        for i in range(0, len(rows), DEFAULT_FETCH_SIZE)
+    ]
+    return pa.Table.from_batches(batches, schema=decoder.schema)
+
+
+def measure(fn, rows: List[tuple]) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = fn(rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert table.num_rows == len(rows)
+    return {
+        "seconds": round(elapsed, 4),
+        "rows_per_second": round(len(rows) / elapsed),
+        "peak_python_bytes": peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    results = {
+        "rows": args.rows,
+        "legacy": measure(legacy_path, rows),
+        "decoder": measure(decoder_path, rows),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput benchmark for uploading entity data frames with df_to_mysql_table.
+
+Runs every upload method against a MySQL server for a range of entity data frame
+sizes and prints rows/sec as JSON:
+
+    python benchmarks/bench_entity_upload.py --host 127.0.0.1 --user root \\
+        --password secret --database feast --sizes 10000 100000 1000000
+
+The load_data method needs ``local_infile=ON`` on the server. The run fails if
+df_to_mysql_table fell back to INSERT statements instead.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from feast_mysql.mysql_config import MySQLConfig
+from feast_mysql.utils import _get_conn, df_to_mysql_table, get_cur
+
+
+def make_entity_df(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "driver_id": rng.integers(1000, 100_000, n),
+            "customer_id": [f"c_{i}" for i in rng.integers(0, 50_000, n)],
+            "event_timestamp": pd.Timestamp("2022-01-01", tz="UTC")
+            + pd.to_timedelta(rng.integers(0, 90 * 86400, n), unit="s"),
+            "label": rng.random(n),
+        }
+    )
+
+
+def load_data_statements(cur) -> int:
+    """LOAD DATA statements run on the connection so far"""
+    cur.execute("SHOW SESSION STATUS LIKE 'Com_load'")
+    (_, count) = cur.fetchone()
+    return int(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="feast")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--methods", nargs="+", default=["insert", "load_data"],
+    )
+    args = parser.parse_args()
+
+    results = []
+    for method in args.methods:
+        config = MySQLConfig(
+            host=args.host,
+            port=args.port,
+            user=args.user,
+            password=args.password,
+            database=args.database,
+            local_infile=method == "load_data",
+        )
+        for size in args.sizes:
+            df = make_entity_df(size)
+            table_name = f"feast_bench_upload_{method}_{size}"
+            with _get_conn(config) as conn:
+                with get_cur(conn) as cur:
+                    load_data_before = load_data_statements(cur)
+                start = time.perf_counter()
+                df_to_mysql_table(
+                    conn,
+                    df,
+                    table_name,
+                    local_infile=config.local_infile,
+                    temporary=True,
+                    index_columns=["driver_id", "customer_id", "event_timestamp"],
+                )
+                elapsed = time.perf_counter() - start
+
+                with get_cur(conn) as cur:
+                    used_load_data = load_data_statements(cur) > load_data_before
+                    cur.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+                    (count,) = cur.fetchone()
+                    cur.execute(f"DROP TEMPORARY TABLE `{table_name}`")
+            assert count == size, f"{method} uploaded {count} of {size} rows"
+            if method == "load_data" and not used_load_data:
+                raise SystemExit(
+                    "LOAD DATA LOCAL INFILE was refused and the rows were inserted "
+                    "instead, enable local_infile on the server"
+                )
+
+            results.append(
+                {
+                    "method": method,
+                    "rows": size,
+                    "seconds": round(elapsed, 3),
+                    "rows_per_second": round(size / elapsed),
+                }
+            )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Benchmark of the point-in-time join templates against a MySQL 8 server.
+
+Creates a synthetic feature table and entity data frame, then times the previous
+Postgres-derived template and the "window" and "lateral" MySQL templates, and
+prints entity rows/sec as JSON:
+
+    python benchmarks/bench_pit_join.py --host 127.0.0.1 --user root \\
+        --password secret --database feast --entities 10000 --feature-rows 1000000
+
+The previous template can't run under MySQL's default SQL mode (it relies on ``||``
+concatenation and double-quoted identifiers, and on ``n * interval`` arithmetic for
+TTLs). The copy below only has the quoting of its final column list fixed, runs
+with ANSI_QUOTES,PIPES_AS_CONCAT, and every template is timed with a TTL of 0 so the
+results are comparable.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from feast_mysql.arrow_decoder import cursor_to_arrow_table
+from feast_mysql.mysql_config import MySQLConfig
+from feast_mysql.offline_store.mysql import (
+    POINT_IN_TIME_JOIN_TEMPLATES,
+    build_point_in_time_query,
+)
+from feast_mysql.utils import _get_conn, df_to_mysql_table, get_cur
+
+FEATURE_TABLE = "feast_bench_driver_stats"
+ENTITY_TABLE = "feast_bench_entity_df"
+
+
+def create_feature_table(conn, feature_rows: int, entities: int, batch: int = 50_000):
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp("2022-01-01")
+    with get_cur(conn) as cur:
+        cur.execute(f"DROP TABLE IF EXISTS `{FEATURE_TABLE}`")
+        cur.execute(
+            f"CREATE TABLE `{FEATURE_TABLE}` ("
+            "driver_id BIGINT NOT NULL, event_timestamp DATETIME(6) NOT NULL, "
+            "created DATETIME(6) NOT NULL, conv_rate DOUBLE, acc_rate DOUBLE, "
+            "INDEX (driver_id, event_timestamp, created))"
+        )
+        for offset in range(0, feature_rows, batch):
+            n = min(batch, feature_rows - offset)
+            event_timestamps = start + pd.to_timedelta(
+                rng.integers(0, 90 * 86400, n), unit="s"
+            )
+            rows = list(
+                zip(
+                    rng.integers(0, entities, n).tolist(),
+                    event_timestamps.to_pydatetime().tolist(),
+                    event_timestamps.to_pydatetime().tolist(),
+                    rng.random(n).tolist(),
+                    rng.random(n).tolist(),
+                )
+            )
+            cur.executemany(
+                f"INSERT INTO `{FEATURE_TABLE}` VALUES (%s, %s, %s, %s, %s)", rows
+            )
+    conn.commit()
+
+
+def make_entity_df(rows: int, entities: int) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    return pd.DataFrame(
+        {
+            "driver_id": rng.integers(0, entities, rows),
+            "event_timestamp": pd.Timestamp("2022-01-01", tz="UTC")
+            + pd.to_timedelta(rng.integers(0, 90 * 86400, rows), unit="s"),
+        }
+    )
+
+
+def render(template: str, legacy: bool) -> str:
+    quote = '"' if legacy else "`"
+    context = {
+        "name": "driver_stats",
+        "ttl": 0,
+        "entities": ["driver_id"],
+        "features": ["conv_rate", "acc_rate"],
+        "event_timestamp_column": "event_timestamp",
+        "created_timestamp_column": "created",
+        "table_subquery": f"(SELECT * FROM `{FEATURE_TABLE}`)",
+        "entity_selections": [f"{quote}driver_id{quote} AS {quote}driver_id{quote}"],
+        "entity_columns": [["driver_id", "driver_id"]],
+    }
+    return build_point_in_time_query(
+        [context],
+        left_table_query_string=ENTITY_TABLE if legacy else f"`{ENTITY_TABLE}`",
+        entity_df_event_timestamp_col="event_timestamp",
+        entity_df_columns={"driver_id": None, "event_timestamp": None}.keys(),
+        query_template=template,
+        entity_row_ids_uploaded=not legacy,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="feast")
+    parser.add_argument("--entities", type=int, default=10_000)
+    parser.add_argument("--entity-rows", type=int, default=100_000)
+    parser.add_argument("--feature-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config = MySQLConfig(
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password,
+        database=args.database,
+    )
+    queries = {
+        "legacy": render(LEGACY_POINT_IN_TIME_JOIN, legacy=True),
+        **{
+            name: render(template, legacy=False)
+            for name, template in POINT_IN_TIME_JOIN_TEMPLATES.items()
+        },
+    }
+
+    entity_df = make_entity_df(args.entity_rows, args.entities)
+    results = []
+    with _get_conn(config) as conn:
+        create_feature_table(conn, args.feature_rows, args.entities)
+        with get_cur(conn) as cur:
+            for name, query in queries.items():
+                # The entity table is TEMPORARY like the offline store's, except for
+                # the legacy template, which reads it once per reference and can't
+                # reopen a TEMPORARY table (ER_CANT_REOPEN_TABLE)
+                temporary = name != "legacy"
+                cur.execute(f"DROP TABLE IF EXISTS `{ENTITY_TABLE}`")
+                df_to_mysql_table(
+                    conn,
+                    entity_df,
+                    ENTITY_TABLE,
+                    temporary=temporary,
+                    index_columns=["driver_id", "event_timestamp"],
+                    row_id_columns=["driver_id", "event_timestamp"],
+                )
+                cur.execute(
+                    "SET SESSION sql_mode = CONCAT(@@sql_mode, "
+                    "',ANSI_QUOTES,PIPES_AS_CONCAT')"
+                    if name == "legacy"
+                    else "SET SESSION sql_mode = DEFAULT"
+                )
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    cur.execute(query)
+                    table = cursor_to_arrow_table(cur)
+                    timings.append(time.perf_counter() - start)
+                assert table.num_rows == args.entity_rows
+                best = min(timings)
+                results.append(
+                    {
+                        "template": name,
+                        "temporary_entity_table": temporary,
+                        "entity_rows": args.entity_rows,
+                        "feature_rows": args.feature_rows,
+                        "best_seconds": round(best, 3),
+                        "rows_per_second": round(args.entity_rows / best),
+                    }
+                )
+                cur.execute("SET SESSION sql_mode = DEFAULT")
+                cur.execute(
+                    f"DROP {'TEMPORARY ' if temporary else ''}TABLE `{ENTITY_TABLE}`"
+                )
+            cur.execute(f"DROP TABLE `{FEATURE_TABLE}`")
+
+    print(json.dumps(results, indent=2))
+
+
+# The point-in-time join template before the MySQL 8 rewrite
+LEGACY_POINT_IN_TIME_JOIN = """
+/*
+ Compute a deterministic hash for the `left_table_query_string` that will be used throughout
+ all the logic as the field to GROUP BY the data
+*/
+WITH entity_dataframe AS (
+    SELECT *,
+        {{entity_df_event_timestamp_col}} AS entity_timestamp
+        {% for featureview in featureviews %}
+            {% if featureview.entities %}
+            ,(
+                {% for entity in featureview.entities %}
+                    CAST({{entity}} as CHAR) ||
+                {% endfor %}
+                CAST({{entity_df_event_timestamp_col}} AS CHAR)
+            ) AS {{featureview.name}}__entity_row_unique_id
+            {% else %}
+            ,CAST({{entity_df_event_timestamp_col}} AS CHAR) AS {{featureview.name}}__entity_row_unique_id
+            {% endif %}
+        {% endfor %}
+    FROM {{ left_table_query_string }}
+),
+
+{% for featureview in featureviews %}
+
+{{ featureview.name }}__entity_dataframe AS (
+    SELECT
+        {% if featureview.entities %}{{ featureview.entities | join('", "') }},{% endif %}
+        entity_timestamp,
+        {{featureview.name}}__entity_row_unique_id
+    FROM entity_dataframe
+    GROUP BY
+        {% if featureview.entities %}{{ featureview.entities | join('", "')}},{% endif %}
+        entity_timestamp,
+        {{featureview.name}}__entity_row_unique_id
+),
+
+/*
+ This query template performs the point-in-time correctness join for a single feature set table
+ to the provided entity table.
+
+ 1. We first join the current feature_view to the entity dataframe that has been passed.
+ This JOIN has the following logic:
+    - For each row of the entity dataframe, only keep the rows where the `event_timestamp_column`
+    is less than the one provided in the entity dataframe
+    - If there a TTL for the current feature_view, also keep the rows where the `event_timestamp_column`
+    is higher the the one provided minus the TTL
+    - For each row, Join on the entity key and retrieve the `entity_row_unique_id` that has been
+    computed previously
+
+ The output of this CTE will contain all the necessary information and already filtered out most
+ of the data that is not relevant.
+*/
+
+{{ featureview.name }}__subquery AS (
+    SELECT
+        {{ featureview.event_timestamp_column }} as event_timestamp,
+        {{ '"' ~ featureview.created_timestamp_column ~ '" as created_timestamp,' if featureview.created_timestamp_column else '' }}
+        {{ featureview.entity_selections | join(', ')}}{% if featureview.entity_selections %},{% else %}{% endif %}
+        {% for feature in featureview.features %}
+            {{ feature }} as {% if full_feature_names %}{{ featureview.name }}__{{feature}}{% else %}{{ feature }}{% endif %}{% if loop.last %}{% else %}, {% endif %}
+        {% endfor %}
+    FROM {{ featureview.table_subquery }} AS sub
+    WHERE {{ featureview.event_timestamp_column }} <= (SELECT MAX(entity_timestamp) FROM entity_dataframe)
+    {% if featureview.ttl == 0 %}{% else %}
+    AND {{ featureview.event_timestamp_column }} >= (SELECT MIN(entity_timestamp) FROM entity_dataframe) - {{ featureview.ttl }} * interval '1' second
+    {% endif %}
+),
+
+{{ featureview.name }}__base AS (
+    SELECT
+        subquery.*,
+        entity_dataframe.entity_timestamp,
+        entity_dataframe.{{featureview.name}}__entity_row_unique_id
+    FROM {{ featureview.name }}__subquery AS subquery
+    INNER JOIN {{ featureview.name }}__entity_dataframe AS entity_dataframe
+    ON TRUE
+        AND subquery.event_timestamp <= entity_dataframe.entity_timestamp
+
+        {% if featureview.ttl == 0 %}{% else %}
+        AND subquery.event_timestamp >= entity_dataframe.entity_timestamp - {{ featureview.ttl }} * interval '1' second
+        {% endif %}
+
+        {% for entity in featureview.entities %}
+        AND subquery.{{ entity }} = entity_dataframe.{{ entity }}
+        {% endfor %}
+),
+
+/*
+ 2. If the `created_timestamp_column` has been set, we need to
+ deduplicate the data first. This is done by calculating the
+ `MAX(created_at_timestamp)` for each event_timestamp.
+ We then join the data on the next CTE
+*/
+{% if featureview.created_timestamp_column %}
+{{ featureview.name }}__dedup AS (
+    SELECT
+        {{featureview.name}}__entity_row_unique_id,
+        event_timestamp,
+        MAX(created_timestamp) as created_timestamp
+    FROM {{ featureview.name }}__base
+    GROUP BY {{featureview.name}}__entity_row_unique_id, event_timestamp
+),
+{% endif %}
+
+/*
+ 3. The data has been filtered during the first CTE "*__base"
+ Thus we only need to compute the latest timestamp of each feature.
+*/
+{{ featureview.name }}__latest AS (
+    SELECT
+        event_timestamp,
+        {% if featureview.created_timestamp_column %}created_timestamp,{% endif %}
+        {{featureview.name}}__entity_row_unique_id
+    FROM
+    (
+        SELECT *,
+            ROW_NUMBER() OVER(
+                PARTITION BY {{featureview.name}}__entity_row_unique_id
+                ORDER BY event_timestamp DESC{% if featureview.created_timestamp_column %},created_timestamp DESC{% endif %}
+            ) AS row_number
+        FROM {{ featureview.name }}__base
+        {% if featureview.created_timestamp_column %}
+            INNER JOIN {{ featureview.name }}__dedup
+            USING ({{featureview.name}}__entity_row_unique_id, event_timestamp, created_timestamp)
+        {% endif %}
+    ) AS sub
+    WHERE row_number = 1
+),
+
+/*
+ 4. Once we know the latest value of each feature for a given timestamp,
+ we can join again the data back to the original "base" dataset
+*/
+{{ featureview.name }}__cleaned AS (
+    SELECT base.*
+    FROM {{ featureview.name }}__base as base
+    INNER JOIN {{ featureview.name }}__latest
+    USING(
+        {{featureview.name}}__entity_row_unique_id,
+        event_timestamp
+        {% if featureview.created_timestamp_column %}
+            ,created_timestamp
+        {% endif %}
+    )
+){% if loop.last %}{% else %}, {% endif %}
+
+
+{% endfor %}
+/*
+ Joins the outputs of multiple time travel joins to a single table.
+ The entity_dataframe dataset being our source of truth here.
+ */
+
+SELECT "{{ final_output_feature_names | join('", "')}}"
+FROM entity_dataframe
+{% for featureview in featureviews %}
+LEFT JOIN (
+    SELECT
+        {{featureview.name}}__entity_row_unique_id
+        {% for feature in featureview.features %}
+            ,{% if full_feature_names %}{{ featureview.name }}__{{feature}}{% else %}{{ feature }}{% endif %}
+        {% endfor %}
+    FROM {{ featureview.name }}__cleaned
+) AS {{featureview.name}} USING ({{featureview.name}}__entity_row_unique_id)
+{% endfor %}
+"""
+
+
+if __name__ == "__main__":
+    main()
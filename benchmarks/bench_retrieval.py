@@ -0,0 +1,265 @@
+"""
+End-to-end benchmark of the MySQL offline store.
+
+Loads synthetic feature tables (see ``benchmarks.datagen``) into a MySQL 8 server,
+registers a feature view per table in a temporary feature repo, then times
+get_historical_features, pull_latest_from_table_or_query and
+pull_all_from_table_or_query and prints the results as JSON:
+
+    python -m benchmarks.bench_retrieval --start-mysqld --entities 10000 \\
+        --entity-rows 100000 --feature-views 2 --rows-per-feature-view 1000000
+
+or against a running server with --host/--port/--user/--password/--database.
+Offline store options are set with ``--option point_in_time_join=lateral``, so runs
+of two configurations can be compared.
+
+Every operation runs in its own process, so its peak RSS isn't inflated by the
+data generation or by the operations before it. A pull sample reads every feature
+view once over the whole date range, like a materialization run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields
+from multiprocessing import get_context
+from typing import Any, Dict, List
+
+import numpy as np
+import yaml
+
+from feast import FeatureStore
+from feast_mysql import MySQLOfflineStore
+from feast_mysql.mysql_config import MySQLConfig
+
+from .datagen import (
+    CREATED_TIMESTAMP_COLUMN,
+    EVENT_TIMESTAMP_COLUMN,
+    JOIN_KEY,
+    START,
+    DatasetSpec,
+    create_feature_tables,
+    drop_feature_tables,
+    make_entity_df,
+    make_feature_views,
+)
+from .local_mysqld import local_mysqld
+
+OPERATIONS = (
+    "get_historical_features",
+    "pull_latest_from_table_or_query",
+    "pull_all_from_table_or_query",
+)
+PERCENTILES = (50, 90, 99)
+
+
+def write_repo(
+    repo_path: str, config: MySQLConfig, offline_store_options: Dict[str, Any]
+):
+    feature_store_yaml = {
+        "project": "feast_bench",
+        "provider": "local",
+        "registry": os.path.join(repo_path, "registry.db"),
+        "online_store": {
+            "type": "sqlite",
+            "path": os.path.join(repo_path, "online_store.db"),
+        },
+        "offline_store": {
+            "type": "feast_mysql.MySQLOfflineStore",
+            "host": config.host,
+            "port": config.port,
+            "user": config.user,
+            "password": config.password,
+            "database": config.database,
+            "local_infile": config.local_infile,
+            **offline_store_options,
+        },
+    }
+    with open(os.path.join(repo_path, "feature_store.yaml"), "w") as f:
+        yaml.safe_dump(feature_store_yaml, f)
+
+
+def run_operation(
+    operation: str, repo_path: str, spec: DatasetSpec, repeat: int, warmup: int
+) -> Dict[str, Any]:
+    """Time ``operation`` in the current process, meant to run in a child process"""
+    store = FeatureStore(repo_path=repo_path)
+    _, feature_views = make_feature_views(spec)
+
+    if operation == "get_historical_features":
+        entity_df = make_entity_df(spec)
+        features = [
+            f"{feature_view.name}:{feature.name}"
+            for feature_view in feature_views
+            for feature in feature_view.features
+        ]
+
+        def run() -> int:
+            return store.get_historical_features(
+                entity_df=entity_df, features=features
+            ).to_arrow().num_rows
+
+    else:
+        pull = getattr(MySQLOfflineStore, operation)
+
+        def run() -> int:
+            rows = 0
+            for feature_view in feature_views:
+                kwargs = {
+                    "config": store.config,
+                    "data_source": feature_view.batch_source,
+                    "join_key_columns": [JOIN_KEY],
+                    "feature_name_columns": [f.name for f in feature_view.features],
+                    "event_timestamp_column": EVENT_TIMESTAMP_COLUMN,
+                    "start_date": START.to_pydatetime(),
+                    "end_date": spec.end.to_pydatetime(),
+                }
+                if operation == "pull_latest_from_table_or_query":
+                    kwargs["created_timestamp_column"] = CREATED_TIMESTAMP_COLUMN
+                rows += pull(**kwargs).to_arrow().num_rows
+            return rows
+
+    for _ in range(warmup):
+        run()
+    baseline_rss = _peak_rss_bytes()
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run()
+        seconds.append(time.perf_counter() - start)
+
+    median = float(np.median(seconds))
+    return {
+        "operation": operation,
+        "rows": rows,
+        "repeat": repeat,
+        "seconds": {
+            "min": round(min(seconds), 4),
+            "mean": round(float(np.mean(seconds)), 4),
+            **{
+                f"p{p}": round(float(np.percentile(seconds, p)), 4)
+                for p in PERCENTILES
+            },
+            "max": round(max(seconds), 4),
+        },
+        "rows_per_second": round(rows / median) if median else None,
+        "baseline_rss_bytes": baseline_rss,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _parse_option(option: str):
+    key, _, value = option.partition("=")
+    return key, yaml.safe_load(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--start-mysqld",
+        action="store_true",
+        help="run against a throwaway mysqld instead of --host",
+    )
+    parser.add_argument("--mysqld", default="mysqld")
+    parser.add_argument("--mysqld-arg", action="append", default=[])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="feast")
+    parser.add_argument("--local-infile", action="store_true")
+    for field in fields(DatasetSpec):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}", type=field.type, default=field.default
+        )
+    parser.add_argument(
+        "--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS)
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        type=_parse_option,
+        help="offline store option as key=value, may be repeated",
+    )
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        **{field.name: getattr(args, field.name) for field in fields(DatasetSpec)}
+    )
+    offline_store_options = dict(args.option)
+
+    if args.start_mysqld:
+        server = local_mysqld(args.mysqld, args.database, args.mysqld_arg)
+    else:
+        server = contextlib.nullcontext(
+            MySQLConfig(
+                host=args.host,
+                port=args.port,
+                user=args.user,
+                password=args.password,
+                database=args.database,
+                local_infile=args.local_infile,
+            )
+        )
+
+    with server as config, tempfile.TemporaryDirectory() as repo_path:
+        start = time.perf_counter()
+        create_feature_tables(config, spec)
+        load_seconds = time.perf_counter() - start
+
+        write_repo(repo_path, config, offline_store_options)
+        entity, feature_views = make_feature_views(spec)
+        FeatureStore(repo_path=repo_path).apply([entity, *feature_views])
+
+        results: List[Dict[str, Any]] = []
+        try:
+            for operation in args.operations:
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=get_context("spawn")
+                ) as executor:
+                    results.append(
+                        executor.submit(
+                            run_operation,
+                            operation,
+                            repo_path,
+                            spec,
+                            args.repeat,
+                            args.warmup,
+                        ).result()
+                    )
+        finally:
+            drop_feature_tables(config, spec)
+
+    report = {
+        "dataset": asdict(spec),
+        "offline_store_options": offline_store_options,
+        "load_seconds": round(load_seconds, 3),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
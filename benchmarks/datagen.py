@@ -0,0 +1,143 @@
+"""
+Synthetic feature tables and entity data frames for the benchmarks.
+
+Every feature view reads its own table of ``rows_per_feature_view`` rows spread over
+``entities`` drivers and ``days`` days. A ``duplicate_fraction`` of the rows is
+written again with the same event timestamp, a later created timestamp and new
+values, like a backfill that corrected earlier rows. All data is generated from
+``seed``, so runs with the same spec read the same rows.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feast import Entity, Feature, FeatureView, ValueType
+from feast_mysql import MySQLSource
+from feast_mysql.mysql_config import MySQLConfig
+from feast_mysql.utils import _get_conn, df_to_mysql_table, get_cur
+
+ENTITY_NAME = "driver"
+JOIN_KEY = "driver_id"
+EVENT_TIMESTAMP_COLUMN = "event_timestamp"
+CREATED_TIMESTAMP_COLUMN = "created"
+
+START = pd.Timestamp("2022-01-01", tz="UTC")
+
+
+@dataclass
+class DatasetSpec:
+    entities: int = 10_000
+    entity_rows: int = 100_000
+    feature_views: int = 2
+    features_per_view: int = 4
+    rows_per_feature_view: int = 1_000_000
+    # Feature view TTL, 0 for none
+    ttl_seconds: int = 0
+    duplicate_fraction: float = 0.0
+    days: int = 90
+    seed: int = 0
+
+    @property
+    def end(self) -> pd.Timestamp:
+        return START + pd.Timedelta(days=self.days)
+
+
+def feature_table_name(view: int) -> str:
+    return f"feast_bench_features_{view}"
+
+
+def feature_names(spec: DatasetSpec, view: int) -> List[str]:
+    return [f"f{view}_{i}" for i in range(spec.features_per_view)]
+
+
+def make_feature_df(spec: DatasetSpec, view: int) -> pd.DataFrame:
+    rng = np.random.default_rng([spec.seed, view + 1])
+    n = spec.rows_per_feature_view
+    event_timestamps = START.tz_localize(None) + pd.to_timedelta(
+        rng.integers(0, spec.days * 86400, n), unit="s"
+    )
+    df = pd.DataFrame(
+        {
+            JOIN_KEY: rng.integers(0, spec.entities, n),
+            EVENT_TIMESTAMP_COLUMN: event_timestamps,
+            CREATED_TIMESTAMP_COLUMN: event_timestamps,
+            **{name: rng.random(n) for name in feature_names(spec, view)},
+        }
+    )
+
+    duplicates = df.sample(frac=spec.duplicate_fraction, random_state=spec.seed)
+    if len(duplicates):
+        duplicates[CREATED_TIMESTAMP_COLUMN] += pd.to_timedelta(
+            rng.integers(1, 86400, len(duplicates)), unit="s"
+        )
+        for name in feature_names(spec, view):
+            duplicates[name] = rng.random(len(duplicates))
+        df = pd.concat([df, duplicates], ignore_index=True)
+    return df
+
+
+def make_entity_df(spec: DatasetSpec) -> pd.DataFrame:
+    rng = np.random.default_rng([spec.seed, 0])
+    return pd.DataFrame(
+        {
+            JOIN_KEY: rng.integers(0, spec.entities, spec.entity_rows),
+            EVENT_TIMESTAMP_COLUMN: START
+            + pd.to_timedelta(
+                rng.integers(0, spec.days * 86400, spec.entity_rows), unit="s"
+            ),
+        }
+    )
+
+
+def create_feature_tables(config: MySQLConfig, spec: DatasetSpec):
+    """(Re)create and load the feature table of every feature view"""
+    for view in range(spec.feature_views):
+        table_name = feature_table_name(view)
+        df = make_feature_df(spec, view)
+        with _get_conn(config) as conn:
+            with get_cur(conn) as cur:
+                cur.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+            df_to_mysql_table(
+                conn,
+                df,
+                table_name,
+                local_infile=config.local_infile,
+                index_columns=[
+                    JOIN_KEY,
+                    EVENT_TIMESTAMP_COLUMN,
+                    CREATED_TIMESTAMP_COLUMN,
+                ],
+            )
+
+
+def drop_feature_tables(config: MySQLConfig, spec: DatasetSpec):
+    with _get_conn(config) as conn, get_cur(conn) as cur:
+        for view in range(spec.feature_views):
+            cur.execute(f"DROP TABLE IF EXISTS `{feature_table_name(view)}`")
+
+
+def make_feature_views(spec: DatasetSpec) -> Tuple[Entity, List[FeatureView]]:
+    entity = Entity(name=ENTITY_NAME, value_type=ValueType.INT64, join_key=JOIN_KEY)
+    feature_views = [
+        FeatureView(
+            name=f"bench_view_{view}",
+            entities=[ENTITY_NAME],
+            ttl=timedelta(seconds=spec.ttl_seconds),
+            features=[
+                Feature(name=name, dtype=ValueType.DOUBLE)
+                for name in feature_names(spec, view)
+            ],
+            batch_source=MySQLSource(
+                table=feature_table_name(view),
+                event_timestamp_column=EVENT_TIMESTAMP_COLUMN,
+                created_timestamp_column=CREATED_TIMESTAMP_COLUMN,
+                name=feature_table_name(view),
+            ),
+            online=False,
+        )
+        for view in range(spec.feature_views)
+    ]
+    return entity, feature_views
@@ -0,0 +1,119 @@
+"""
+Start a throwaway MySQL server for the benchmarks.
+
+The server gets a fresh data directory initialized with a passwordless root user,
+listens on a free port on 127.0.0.1 and is stopped and deleted on exit, so runs
+don't depend on, or disturb, whatever else runs on the machine.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+import pymysql
+
+from feast_mysql.mysql_config import MySQLConfig
+
+
+@contextmanager
+def local_mysqld(
+    mysqld: str = "mysqld",
+    database: str = "feast",
+    extra_args: Sequence[str] = (),
+    startup_timeout_seconds: float = 120,
+) -> Iterator[MySQLConfig]:
+    """
+    Run a mysqld binary for the duration of the block and yield the config to
+    connect to it. ``extra_args`` are passed on to the server, e.g.
+    ``["--innodb-buffer-pool-size=4G"]``.
+    """
+    binary = shutil.which(mysqld)
+    if binary is None:
+        raise FileNotFoundError(
+            f"{mysqld} not found, install a MySQL 8 server or pass its path"
+        )
+
+    base_dir = tempfile.mkdtemp(prefix="feast_mysql_bench_")
+    data_dir = os.path.join(base_dir, "data")
+    error_log = os.path.join(base_dir, "error.log")
+    # --no-defaults has to come first, so no option file changes the setup
+    common_args = [binary, "--no-defaults", f"--datadir={data_dir}"]
+    if getattr(os, "geteuid", lambda: None)() == 0:
+        common_args.append("--user=root")
+
+    process = None
+    try:
+        subprocess.run(
+            common_args + ["--initialize-insecure", f"--log-error={error_log}"],
+            check=True,
+        )
+        port = _free_port()
+        process = subprocess.Popen(
+            common_args
+            + [
+                f"--port={port}",
+                "--bind-address=127.0.0.1",
+                f"--socket={os.path.join(base_dir, 'mysqld.sock')}",
+                f"--pid-file={os.path.join(base_dir, 'mysqld.pid')}",
+                f"--log-error={error_log}",
+                "--mysqlx=OFF",
+                "--local-infile=ON",
+                *extra_args,
+            ]
+        )
+
+        conn = _wait_for_server(process, port, startup_timeout_seconds, error_log)
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        conn.close()
+
+        yield MySQLConfig(
+            host="127.0.0.1",
+            port=port,
+            user="root",
+            password="",
+            database=database,
+            local_infile=True,
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(
+    process: subprocess.Popen, port: int, timeout_seconds: float, error_log: str
+) -> pymysql.Connection:
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        try:
+            return pymysql.connect(host="127.0.0.1", port=port, user="root")
+        except pymysql.err.OperationalError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(
+                    f"mysqld did not start, see its log:\n{_tail(error_log)}"
+                )
+            time.sleep(0.2)
+
+
+def _tail(path: str, lines: int = 20) -> str:
+    try:
+        with open(path, errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+    except FileNotFoundError:
+        return ""
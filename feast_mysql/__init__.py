@@ -2,15 +2,24 @@ from .offline_store.mysql import (
     MySQLOfflineStore,
     MySQLOfflineStoreConfig,
     MySQLRetrievalJob,
+    MySQLRetrievalMetadata,
 )
-from .offline_store.mysql_source import MySQLOptions, MySQLSource
+from .offline_store.mysql_source import (
+    MySQLOptions,
+    MySQLSource,
+    SavedDatasetMySQLStorage,
+)
+from .provider import MySQLProvider
 from .registry_store import MySQLRegistryStore
 
 __all__ = [
     "MySQLOfflineStore",
     "MySQLOfflineStoreConfig",
     "MySQLRetrievalJob",
+    "MySQLRetrievalMetadata",
     "MySQLOptions",
     "MySQLSource",
+    "SavedDatasetMySQLStorage",
+    "MySQLProvider",
     "MySQLRegistryStore",
 ]
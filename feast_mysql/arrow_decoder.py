@@ -0,0 +1,138 @@
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+from pymysql import FIELD_TYPE
+from pymysql.cursors import Cursor
+
+from .instrumentation import ARROW_CONVERSION, ROW_FETCH, timed
+from .type_map import (
+    ColumnType,
+    description_shape,
+    resolve_result_shape,
+    result_shape,
+)
+
+# Number of rows pulled from the cursor and decoded into one record batch
+DEFAULT_FETCH_SIZE = 65536
+
+_DECIMAL_TYPE_CODES = (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL)
+# Widest decimal128 precision; wider DECIMAL columns are converted value by value
+_MAX_DECIMAL_PRECISION = 38
+
+
+class ArrowResultDecoder:
+    """
+    Decodes the row tuples of a MySQL result set column by column into typed Arrow
+    record batches.
+
+    The Arrow type of every column is picked once, from ``column_types`` or else
+    from the ``cursor.description`` type codes. Columns whose type can't be told
+    from the type code alone (CHAR/TEXT and BINARY/BLOB share codes) are inferred
+    from the first batch and then fixed, as strings if it has only NULLs, so every
+    batch has the same schema.
+    """
+
+    def __init__(
+        self,
+        description: Sequence[Tuple[Any, ...]],
+        column_types: Optional[Sequence[ColumnType]] = None,
+    ):
+        if column_types is None:
+            column_types = resolve_result_shape(description_shape(description))
+        self._names: List[str] = [col[0] for col in description]
+        self._type_codes: List[int] = [col[1] for col in description]
+        self._scales: List[int] = [col[5] or 0 for col in description]
+        self._types: List[Optional[pa.DataType]] = [
+            column_type.arrow_type for column_type in column_types
+        ]
+
+    @property
+    def schema(self) -> pa.Schema:
+        return pa.schema(
+            [
+                (name, arrow_type if arrow_type is not None else pa.string())
+                for name, arrow_type in zip(self._names, self._types)
+            ]
+        )
+
+    def decode(self, rows: Sequence[Tuple[Any, ...]]) -> pa.RecordBatch:
+        if not rows:
+            return pa.RecordBatch.from_arrays(
+                [pa.array([], type=f.type) for f in self.schema], schema=self.schema
+            )
+
+        # zip(*rows) transposes in C, leaving one tuple per column to hand to Arrow
+        arrays = [
+            self._decode_column(i, values) for i, values in enumerate(zip(*rows))
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _decode_column(self, i: int, values: Tuple[Any, ...]) -> pa.Array:
+        if self._type_codes[i] in _DECIMAL_TYPE_CODES:
+            return _decode_decimal_column(values, self._scales[i])
+
+        arrow_type = self._types[i]
+        if arrow_type is not None and pa.types.is_boolean(arrow_type):
+            # BIT(1) values arrive as one byte
+            return pa.array(
+                [v != b"\x00" if v is not None else None for v in values],
+                type=arrow_type,
+            )
+        if arrow_type is not None:
+            return pa.array(values, type=arrow_type)
+
+        array = pa.array(values)
+        if pa.types.is_null(array.type):
+            array = array.cast(pa.string())
+        self._types[i] = array.type
+        return array
+
+
+def _decode_decimal_column(values: Tuple[Any, ...], scale: int) -> pa.Array:
+    try:
+        decimals = pa.array(
+            values, type=pa.decimal128(_MAX_DECIMAL_PRECISION, min(scale, 30))
+        )
+        return decimals.cast(pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array(
+            [float(v) if v is not None else None for v in values], type=pa.float64()
+        )
+
+
+def iter_cursor_record_batches(
+    cur: Cursor, batch_size: int = DEFAULT_FETCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """
+    Yield the rows of an executed cursor as Arrow record batches of at most
+    ``batch_size`` rows.
+    """
+    return _iter_batches(cur, _cursor_decoder(cur), batch_size)
+
+
+def cursor_to_arrow_table(
+    cur: Cursor, batch_size: int = DEFAULT_FETCH_SIZE
+) -> pa.Table:
+    """Read all rows of an executed cursor into an Arrow table"""
+    decoder = _cursor_decoder(cur)
+    batches = list(_iter_batches(cur, decoder, batch_size))
+    return pa.Table.from_batches(batches, schema=decoder.schema)
+
+
+def _cursor_decoder(cur: Cursor) -> ArrowResultDecoder:
+    return ArrowResultDecoder(
+        cur.description, resolve_result_shape(result_shape(cur))
+    )
+
+
+def _iter_batches(
+    cur: Cursor, decoder: ArrowResultDecoder, batch_size: int
+) -> Iterator[pa.RecordBatch]:
+    while True:
+        with timed(ROW_FETCH):
+            rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        with timed(ARROW_CONVERSION):
+            batch = decoder.decode(rows)
+        yield batch
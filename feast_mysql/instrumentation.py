@@ -0,0 +1,221 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Phases of a retrieval that are timed
+CONNECTION_ACQUIRE = "connection_acquire"
+ENTITY_UPLOAD = "entity_upload"
+SCHEMA_PROBE = "schema_probe"
+TIMESTAMP_RANGE = "timestamp_range"
+TEMPLATE_RENDER = "template_render"
+QUERY_EXECUTION = "query_execution"
+ROW_FETCH = "row_fetch"
+ARROW_CONVERSION = "arrow_conversion"
+TEMP_TABLE_CLEANUP = "temp_table_cleanup"
+
+PHASES = (
+    CONNECTION_ACQUIRE,
+    ENTITY_UPLOAD,
+    SCHEMA_PROBE,
+    TIMESTAMP_RANGE,
+    TEMPLATE_RENDER,
+    QUERY_EXECUTION,
+    ROW_FETCH,
+    ARROW_CONVERSION,
+    TEMP_TABLE_CLEANUP,
+)
+
+
+class RetrievalTimings:
+    """
+    Seconds spent in each phase of one retrieval, and the rows and bytes it
+    returned. Phases of partitions or slices running in parallel are summed, so
+    their total can exceed ``total_seconds``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phase_seconds: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+        self.rows = 0
+        self.bytes = 0
+        self.total_seconds = 0.0
+        self.min_event_timestamp: Optional[datetime] = None
+        self.max_event_timestamp: Optional[datetime] = None
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phase_seconds[phase] += seconds
+
+    def add_result(self, rows: int, nbytes: int):
+        with self._lock:
+            self.rows += rows
+            self.bytes += nbytes
+
+    def observe_event_timestamps(
+        self, min_timestamp: datetime, max_timestamp: datetime
+    ):
+        with self._lock:
+            if self.min_event_timestamp is not None:
+                min_timestamp = min(self.min_event_timestamp, min_timestamp)
+                max_timestamp = max(self.max_event_timestamp, max_timestamp)
+            self.min_event_timestamp = min_timestamp
+            self.max_event_timestamp = max_timestamp
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phase_seconds": dict(self.phase_seconds),
+                "total_seconds": self.total_seconds,
+                "rows": self.rows,
+                "bytes": self.bytes,
+            }
+
+
+_current_timings: contextvars.ContextVar[
+    Optional[RetrievalTimings]
+] = contextvars.ContextVar("feast_mysql_retrieval_timings", default=None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to phase of the retrieval being collected"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def current_timings() -> Optional[RetrievalTimings]:
+    return _current_timings.get()
+
+
+# Called with the operation name ("get_historical_features",
+# "pull_latest_from_table_or_query" or "pull_all_from_table_or_query") and the
+# timings of every finished retrieval
+MetricsHook = Callable[[str, RetrievalTimings], None]
+
+_metrics_hooks: List[MetricsHook] = []
+
+
+def add_metrics_hook(hook: MetricsHook):
+    _metrics_hooks.append(hook)
+
+
+def remove_metrics_hook(hook: MetricsHook):
+    _metrics_hooks.remove(hook)
+
+
+@contextmanager
+def activate(timings: RetrievalTimings) -> Iterator[RetrievalTimings]:
+    """
+    Record the phases timed in the block into timings. Work submitted to thread
+    pools in the block has to run in a copy of the context to be recorded, see
+    ``contextvars.copy_context``.
+    """
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def report(operation: str, timings: RetrievalTimings, log: bool = False):
+    """
+    Pass the timings of a finished retrieval to the metrics hooks and, with
+    ``log``, log them as a JSON record
+    """
+    for hook in list(_metrics_hooks):
+        try:
+            hook(operation, timings)
+        except Exception:
+            logger.exception("Retrieval metrics hook %r failed", hook)
+    if log:
+        record = {"operation": operation, **timings.to_dict()}
+        logger.info("%s", json.dumps(record), extra={"feast_mysql_retrieval": record})
+
+
+@contextmanager
+def collect(operation: str, log: bool = False) -> Iterator[RetrievalTimings]:
+    """Time the retrieval run in the block and report it when the block exits"""
+    timings = RetrievalTimings()
+    start = time.perf_counter()
+    try:
+        with activate(timings):
+            yield timings
+    finally:
+        timings.total_seconds = time.perf_counter() - start
+        report(operation, timings, log)
+
+
+class PrometheusMetricsHook:
+    """
+    A metrics hook exporting retrieval timings with ``prometheus_client``: a count
+    of retrievals, rows and bytes per operation, and histograms of the total and
+    per-phase seconds. Register it with ``add_metrics_hook``.
+    """
+
+    def __init__(self, namespace: str = "feast_mysql", registry: Any = None):
+        try:
+            from prometheus_client import REGISTRY, Counter, Histogram
+        except ImportError:
+            raise ImportError(
+                "PrometheusMetricsHook needs prometheus_client, "
+                "install it with `pip install prometheus-client`"
+            )
+        registry = registry if registry is not None else REGISTRY
+
+        self._retrievals = Counter(
+            "retrievals",
+            "Finished retrievals",
+            ["operation"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._rows = Counter(
+            "retrieval_rows",
+            "Rows returned by retrievals",
+            ["operation"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._bytes = Counter(
+            "retrieval_bytes",
+            "Arrow bytes returned by retrievals",
+            ["operation"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._seconds = Histogram(
+            "retrieval_seconds",
+            "Wall time of retrievals",
+            ["operation"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._phase_seconds = Histogram(
+            "retrieval_phase_seconds",
+            "Time retrievals spent in each phase",
+            ["operation", "phase"],
+            namespace=namespace,
+            registry=registry,
+        )
+
+    def __call__(self, operation: str, timings: RetrievalTimings):
+        self._retrievals.labels(operation).inc()
+        self._rows.labels(operation).inc(timings.rows)
+        self._bytes.labels(operation).inc(timings.bytes)
+        self._seconds.labels(operation).observe(timings.total_seconds)
+        for phase, seconds in timings.phase_seconds.items():
+            self._phase_seconds.labels(operation, phase).observe(seconds)
@@ -10,3 +10,17 @@ class MySQLConfig(FeastConfigBaseModel):
     port: int = 3306
     user: StrictStr
     password: StrictStr
+    # Allow LOAD DATA LOCAL INFILE for bulk uploads. The server must also have
+    # local_infile enabled, otherwise uploads fall back to INSERT statements.
+    local_infile: bool = False
+
+    # Connections are borrowed from a process-wide pool per server and user
+    pool_min_size: int = 0
+    pool_max_size: int = 10
+    pool_idle_timeout_seconds: float = 300
+    pool_ping_on_checkout: bool = True
+    pool_checkout_timeout_seconds: float = 30
+
+    # How long the schemas learned by LIMIT 0 probes of source and entity queries
+    # are reused, 0 probes every time. See schema_cache.invalidate_schema_cache.
+    schema_cache_ttl_seconds: float = 300
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from pymysql import Connection
+
+from ..type_map import resolve_result_shape, result_shape
+from ..utils import MAX_INDEX_KEY_BYTES, add_index_sql, get_cur, quote_table_name
+
+FULL_SCAN = "full_scan"
+FILESORT = "filesort"
+TEMPORARY_TABLE = "temporary_table"
+
+# EXPLAIN access types that read every row of a table or of one of its indexes
+_FULL_SCAN_ACCESS_TYPES = {"ALL", "index"}
+
+# InnoDB limit on the columns of one index
+_MAX_KEY_PARTS = 16
+
+# Bytes per key part of fixed size types, anything else can't be in a covering index
+_KEY_PART_BYTES = {
+    "tinyint": 1,
+    "smallint": 2,
+    "mediumint": 3,
+    "int": 4,
+    "bigint": 8,
+    "float": 4,
+    "double": 8,
+    "decimal": 16,
+    "date": 3,
+    "time": 6,
+    "datetime": 8,
+    "timestamp": 7,
+    "year": 1,
+    "bit": 8,
+    "enum": 2,
+    "set": 8,
+}
+_VARIABLE_LENGTH_TYPE = re.compile(r"^(varchar|char|varbinary|binary)\((\d+)\)")
+
+
+class PlanFinding(NamedTuple):
+    """A costly step of a query plan, with the table alias it applies to if any"""
+
+    kind: str
+    table: Optional[str]
+    rows: Optional[int]
+
+
+class IndexRecommendation(NamedTuple):
+    """
+    The index a feature view's source table should have for point-in-time joins
+    and materialization: its join key columns, then the event and created
+    timestamps, then its feature columns if they fit, so the index covers the
+    queries. ``table`` is None for query sources, which can't be indexed.
+    """
+
+    feature_view: str
+    table: Optional[str]
+    columns: List[str]
+    covering: bool
+    existing_index: Optional[str]
+    findings: List[PlanFinding]
+    # The statement creating the index, None if there is nothing to create
+    create_index_sql: Optional[str]
+
+
+def explain_query(conn: Connection, query: str) -> List[PlanFinding]:
+    """
+    Run EXPLAIN FORMAT=JSON on query and return its full scans, filesorts and
+    temporary tables
+    """
+    with get_cur(conn) as cur:
+        cur.execute(f"EXPLAIN FORMAT=JSON {query}")
+        (plan,) = cur.fetchone()
+    return plan_findings(json.loads(plan))
+
+
+def plan_findings(plan: Dict[str, Any]) -> List[PlanFinding]:
+    findings: List[PlanFinding] = []
+
+    def walk(node: Any, table: Optional[str]):
+        if isinstance(node, list):
+            for item in node:
+                walk(item, table)
+            return
+        if not isinstance(node, dict):
+            return
+
+        if "table_name" in node:
+            table = node["table_name"]
+            if node.get("access_type") in _FULL_SCAN_ACCESS_TYPES:
+                findings.append(
+                    PlanFinding(FULL_SCAN, table, node.get("rows_examined_per_scan"))
+                )
+        if node.get("using_filesort"):
+            findings.append(PlanFinding(FILESORT, table, None))
+        if node.get("using_temporary_table"):
+            findings.append(PlanFinding(TEMPORARY_TABLE, table, None))
+        for value in node.values():
+            walk(value, table)
+
+    walk(plan, None)
+    return findings
+
+
+def table_indexes(conn: Connection, table_ref: str) -> Dict[str, List[str]]:
+    """The columns of every index of a table, in key order"""
+    database, _, table_name = table_ref.rpartition(".")
+    with get_cur(conn) as cur:
+        cur.execute(
+            "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE()) AND TABLE_NAME = %s "
+            "ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (database or None, table_name),
+        )
+        rows = cur.fetchall()
+
+    indexes: Dict[str, List[str]] = {}
+    for name, column in rows:
+        indexes.setdefault(name, []).append(column)
+    return indexes
+
+
+def find_index(
+    indexes: Dict[str, List[str]], columns: Sequence[str]
+) -> Optional[str]:
+    """The name of an index whose leading columns are columns, if there is one"""
+    for name, index_columns in indexes.items():
+        if [column.lower() for column in index_columns[: len(columns)]] == [
+            column.lower() for column in columns
+        ]:
+            return name
+    return None
+
+
+def index_name(columns: Sequence[str]) -> str:
+    digest = hashlib.sha1(",".join(columns).encode()).hexdigest()[:12]
+    return f"feast_idx_{digest}"
+
+
+def lookup_index_columns(
+    join_key_columns: Sequence[str],
+    event_timestamp_column: str,
+    created_timestamp_column: Optional[str],
+) -> List[str]:
+    columns = list(join_key_columns) + [event_timestamp_column]
+    if created_timestamp_column:
+        columns.append(created_timestamp_column)
+    return columns
+
+
+def recommend_index(
+    conn: Connection,
+    feature_view: str,
+    table_ref: Optional[str],
+    join_key_columns: Sequence[str],
+    event_timestamp_column: str,
+    created_timestamp_column: Optional[str],
+    feature_columns: Sequence[str],
+    column_types: Dict[str, str],
+    findings: List[PlanFinding],
+) -> IndexRecommendation:
+    """
+    Recommend the index of one feature view's source. An existing index that starts
+    with the join keys and timestamps is good enough, even if it doesn't cover.
+    """
+    lookup_columns = lookup_index_columns(
+        join_key_columns, event_timestamp_column, created_timestamp_column
+    )
+    columns, covering = _covering_columns(
+        lookup_columns, feature_columns, column_types
+    )
+    existing_index = None
+    create_index_sql = None
+    if table_ref is not None:
+        existing_index = find_index(table_indexes(conn, table_ref), lookup_columns)
+        if existing_index is None:
+            create_index_sql = _create_index_sql(
+                table_ref,
+                columns,
+                [column_types.get(column, "") for column in columns],
+            )
+    return IndexRecommendation(
+        feature_view=feature_view,
+        table=table_ref,
+        columns=columns,
+        covering=covering,
+        existing_index=existing_index,
+        findings=findings,
+        create_index_sql=create_index_sql,
+    )
+
+
+def ensure_index(
+    conn: Connection, table_ref: str, columns: Sequence[str]
+) -> Optional[str]:
+    """
+    Create an index on columns unless one starting with them exists. Returns the
+    name of the created index.
+    """
+    if find_index(table_indexes(conn, table_ref), columns) is not None:
+        return None
+    with get_cur(conn) as cur:
+        cur.execute(
+            f"SELECT {', '.join(f'`{column}`' for column in columns)} "
+            f"FROM {quote_table_name(table_ref)} LIMIT 0"
+        )
+        column_types = resolve_result_shape(result_shape(cur))
+        cur.execute(
+            _create_index_sql(
+                table_ref,
+                columns,
+                [column_type.mysql_type for column_type in column_types],
+            )
+        )
+    return index_name(columns)
+
+
+def _create_index_sql(
+    table_ref: str, columns: Sequence[str], mysql_types: Sequence[str]
+) -> str:
+    return add_index_sql(
+        quote_table_name(table_ref),
+        list(columns),
+        list(mysql_types),
+        index_name=index_name(columns),
+    )
+
+
+def _covering_columns(
+    lookup_columns: List[str],
+    feature_columns: Sequence[str],
+    column_types: Dict[str, str],
+) -> Tuple[List[str], bool]:
+    columns = lookup_columns + [
+        column for column in feature_columns if column not in lookup_columns
+    ]
+    key_bytes = [_key_part_bytes(column_types.get(column, "")) for column in columns]
+    if (
+        len(columns) <= _MAX_KEY_PARTS
+        and None not in key_bytes
+        and sum(key_bytes) <= MAX_INDEX_KEY_BYTES
+    ):
+        return columns, True
+    return lookup_columns, False
+
+
+def _key_part_bytes(mysql_type: str) -> Optional[int]:
+    mysql_type = mysql_type.lower()
+    match = _VARIABLE_LENGTH_TYPE.match(mysql_type)
+    if match:
+        # utf8mb4 characters take up to 4 bytes, plus the length prefix
+        return int(match.group(2)) * 4 + 2
+    return _KEY_PART_BYTES.get(mysql_type.split("(")[0].split(" ")[0])
@@ -1,23 +1,38 @@
+import collections
 import contextlib
+import contextvars
+import functools
+import hashlib
+import importlib
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import (
-    Any,
     Callable,
     ContextManager,
+    Dict,
     Iterator,
     KeysView,
     List,
     Optional,
+    Set,
     Union,
     Tuple,
 )
 
+import numpy as np
 import pandas as pd
 import pyarrow as pa
-from jinja2 import BaseLoader, Environment
+import pyarrow.compute as pc
+from jinja2 import BaseLoader, Environment, Template
 from pydantic import StrictStr
 from pydantic.typing import Literal
+from pymysql import Connection, InterfaceError, OperationalError
+from pymysql.constants import ER
+from pymysql.cursors import SSCursor
 from pytz import utc
 
 from feast.data_source import DataSource
@@ -33,21 +48,132 @@ from feast.on_demand_feature_view import OnDemandFeatureView
 from feast.registry import Registry
 from feast.repo_config import RepoConfig
 from feast.saved_dataset import SavedDatasetStorage
-from ..type_map import mysql_type_to_arrow_type_string
+from ..arrow_decoder import (
+    DEFAULT_FETCH_SIZE,
+    cursor_to_arrow_table,
+    iter_cursor_record_batches,
+)
+from ..instrumentation import (
+    ENTITY_UPLOAD,
+    QUERY_EXECUTION,
+    TEMP_TABLE_CLEANUP,
+    TEMPLATE_RENDER,
+    TIMESTAMP_RANGE,
+    RetrievalTimings,
+    activate,
+    collect,
+    current_timings,
+    report,
+    timed,
+)
 from ..utils import (
+    ENTITY_ROW_ID_COLUMN,
     _get_conn,
+    add_table_index,
     get_cur,
     df_to_mysql_table,
     get_query_schema,
+    quote_table_name,
+    table_exists,
+    upload_column_types,
 )
 
 from ..mysql_config import MySQLConfig
-from .mysql_source import MySQLSource
+from ..pool import kill_query
+from .index_advisor import IndexRecommendation, explain_query, recommend_index
+from .mysql_source import (
+    MySQLSource,
+    SavedDatasetMySQLStorage,
+    _check_custom_storage,
+)
+from .outfile_export import export_query, iter_export_batches, read_export
+from .result_cache import ResultCache, get_result_cache
+from .watermarks import WATERMARK_COLUMN, MaterializationWatermark
+
+QueryGenerator = Callable[[Connection], ContextManager[str]]
+
+# Position of each entity row in the original entity data frame, added to the
+# partitions of a partitioned retrieval and removed again once the results are merged
+ENTITY_ROW_ORDER_COLUMN = "_feast_entity_row_order"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=utc)
 
 
 class MySQLOfflineStoreConfig(MySQLConfig):
     type: Literal["feast_mysql.MySQLOfflineStore"] = "feast_mysql.MySQLOfflineStore"
 
+    # Storage engine of the temporary tables entity data frames are uploaded into
+    entity_table_engine: Literal["InnoDB", "MEMORY"] = "InnoDB"
+
+    # Split data frame entity retrievals into this many partitions, each uploaded and
+    # joined on its own pooled connection
+    historical_retrieval_partitions: int = 1
+    historical_retrieval_partition_by: Literal[
+        "entity_hash", "event_timestamp"
+    ] = "entity_hash"
+    # Partitions run at once, defaults to the number of partitions. Both this and
+    # pull_concurrency are capped at pool_max_size.
+    historical_retrieval_concurrency: Optional[int] = None
+
+    # "window" ranks the candidate rows of each feature view with ROW_NUMBER(),
+    # "lateral" looks up the latest row per entity row with a LATERAL join, which is
+    # faster when feature tables are indexed on (join keys, event timestamp)
+    point_in_time_join: Literal["window", "lateral"] = "window"
+
+    # Materialize only the rows whose event or created timestamp is past the newest
+    # one read by the previous run, tracked per feature view in the watermark table.
+    # Ranges ending before the watermark, like backfills, are read in full.
+    incremental_materialization: bool = False
+    materialization_watermark_table: StrictStr = "feast_materialization_watermarks"
+    # "manual" leaves advancing the watermark to MySQLRetrievalJob.commit_watermark(),
+    # which feast_mysql.MySQLProvider calls once the online write is done. "on_read"
+    # advances it as soon as the result has been read, so rows of a failed online
+    # write are skipped by the next run. Defaults to "manual" with MySQLProvider and
+    # to "on_read" with any other provider, which never calls commit_watermark().
+    materialization_watermark_commit: Optional[Literal["on_read", "manual"]] = None
+
+    # Keep historical retrieval results in this directory and serve repeated
+    # retrievals from it, as long as every feature view source has a freshness_query
+    result_cache_dir: Optional[StrictStr] = None
+    result_cache_max_bytes: int = 10 * 1024 ** 3
+
+    # Copy SQL entity queries into an indexed temporary table once, and read the
+    # entity schema and timestamp range and run the join against that table
+    entity_query_materialization: bool = False
+
+    # Store the schemas probed for MySQLSources in the sources, so sources read back
+    # from the registry don't probe the database again
+    persist_source_schemas: bool = False
+
+    # Split the time range of materialization pulls into slices of this many seconds,
+    # run up to pull_concurrency at a time on pooled connections. A failed slice is
+    # retried up to pull_slice_retries times. None reads the range in one query.
+    pull_slice_seconds: Optional[int] = None
+    pull_concurrency: int = 4
+    pull_slice_retries: int = 2
+
+    # Have the server write pull_all_from_table_or_query results into this
+    # directory with SELECT ... INTO OUTFILE, and read them back with pyarrow's CSV
+    # reader instead of through the client protocol. It must be within the server's
+    # secure_file_priv and readable by the client, at outfile_export_client_dir if
+    # it is mounted elsewhere there.
+    outfile_export_dir: Optional[StrictStr] = None
+    outfile_export_client_dir: Optional[StrictStr] = None
+
+    # Index table sources on their index_columns and timestamps during feast apply
+    # with feast_mysql.MySQLProvider, see MySQLSource.create_index and
+    # MySQLOfflineStore.recommend_indexes. feast plan only reports missing indexes.
+    auto_create_indexes: bool = False
+
+    # net_write_timeout of to_arrow_batches reads: how long the server waits for the
+    # consumer to take more rows before it aborts the query. The server default of
+    # 60 seconds is too short for consumers doing work between batches.
+    streaming_net_write_timeout_seconds: int = 3600
+
+    # Log the per-phase timings of every retrieval as a JSON record, see
+    # feast_mysql.instrumentation for metrics hooks
+    log_retrieval_timings: bool = False
+
 
 class MySQLOfflineStore(OfflineStore):
     @staticmethod
@@ -60,44 +186,77 @@ class MySQLOfflineStore(OfflineStore):
         created_timestamp_column: Optional[str],
         start_date: datetime,
         end_date: datetime,
+        feature_view_name: Optional[str] = None,
     ) -> RetrievalJob:
+        """
+        ``feature_view_name`` keys the materialization watermark, so feature views
+        reading the same columns of one source don't share it. It is passed by
+        feast_mysql.MySQLProvider.
+        """
         assert isinstance(data_source, MySQLSource)
-        from_expression = data_source.get_table_query_string()
+        offline_store_config = config.offline_store
 
-        partition_by_join_key_string = ", ".join(_append_alias(join_key_columns, "a"))
-        if partition_by_join_key_string != "":
-            partition_by_join_key_string = (
-                "PARTITION BY " + partition_by_join_key_string
+        watermark = None
+        if offline_store_config.incremental_materialization:
+            watermark = MaterializationWatermark(
+                offline_store_config.materialization_watermark_table,
+                key=hashlib.sha256(
+                    json.dumps(
+                        [
+                            feature_view_name,
+                            data_source.get_table_query_string(),
+                            join_key_columns,
+                            feature_name_columns,
+                            event_timestamp_column,
+                            created_timestamp_column,
+                        ]
+                    ).encode()
+                ).hexdigest(),
+                source=feature_view_name
+                or data_source.name
+                or data_source.get_table_query_string(),
             )
-        timestamps = [event_timestamp_column]
-        if created_timestamp_column:
-            timestamps.append(created_timestamp_column)
-        timestamp_desc_string = " DESC, ".join(_append_alias(timestamps, "a")) + " DESC"
-        a_field_string = ", ".join(
-            _append_alias(join_key_columns + feature_name_columns + timestamps, "a")
-        )
-        b_field_string = ", ".join(
-            _append_alias(join_key_columns + feature_name_columns + timestamps, "b")
-        )
 
-        query = f"""
-            SELECT
-                {b_field_string}
-                {f", {repr(DUMMY_ENTITY_VAL)} AS {DUMMY_ENTITY_ID}" if not join_key_columns else ""}
-            FROM (
-                SELECT {a_field_string},
-                ROW_NUMBER() OVER({partition_by_join_key_string} ORDER BY {timestamp_desc_string}) AS _feast_row
-                FROM ({from_expression}) a
-                WHERE a."{event_timestamp_column}" BETWEEN '{start_date}'::timestamptz AND '{end_date}'::timestamptz
-            ) b
-            WHERE _feast_row = 1
-            """
+        query_generator = functools.partial(
+            _pull_latest_query_generator,
+            watermark=watermark,
+            pull_end_date=end_date,
+            from_expression=data_source.get_table_query_string(),
+            join_key_columns=join_key_columns,
+            feature_name_columns=feature_name_columns,
+            event_timestamp_column=event_timestamp_column,
+            created_timestamp_column=created_timestamp_column,
+            date_partition_column=data_source.date_partition_column,
+        )
+        # Newest slice first, so the first row seen for an entity is its latest
+        slices = _time_slices(
+            start_date, end_date, offline_store_config.pull_slice_seconds
+        )[::-1]
 
         return MySQLRetrievalJob(
-            query=query,
+            query=[
+                functools.partial(
+                    query_generator,
+                    start_date=slice_start,
+                    end_date=slice_end,
+                    end_inclusive=end_inclusive,
+                )
+                for slice_start, slice_end, end_inclusive in slices
+            ],
             config=config,
             full_feature_names=False,
             on_demand_feature_views=None,
+            max_workers=offline_store_config.pull_concurrency,
+            watermark=watermark,
+            time_sliced=len(slices) > 1,
+            latest_by_join_keys=join_key_columns or [DUMMY_ENTITY_ID],
+            operation="pull_latest_from_table_or_query",
+            metadata=RetrievalMetadata(
+                features=feature_name_columns,
+                keys=join_key_columns,
+                min_event_timestamp=start_date,
+                max_event_timestamp=end_date,
+            ),
         )
 
     @staticmethod
@@ -110,82 +269,70 @@ class MySQLOfflineStore(OfflineStore):
         project: str,
         full_feature_names: bool = False,
     ) -> RetrievalJob:
-        @contextlib.contextmanager
-        def query_generator() -> Iterator[str]:
-            table_name = None
-            if isinstance(entity_df, pd.DataFrame):
-                table_name = offline_utils.get_temp_entity_table_name()
-                entity_schema = df_to_mysql_table(
-                    config.offline_store, entity_df, table_name
-                )
-                df_query = table_name
-            elif isinstance(entity_df, str):
-                df_query = f"({entity_df}) AS sub"
-                entity_schema = get_query_schema(config.offline_store, df_query)
-            else:
-                raise TypeError(entity_df)
-
-            entity_df_event_timestamp_col = (
-                offline_utils.infer_event_timestamp_from_entity_df(entity_schema)
-            )
-
-            expected_join_keys = offline_utils.get_expected_join_keys(
-                project, feature_views, registry
-            )
-
-            offline_utils.assert_expected_columns_in_entity_df(
-                entity_schema, expected_join_keys, entity_df_event_timestamp_col
-            )
+        query_generator = functools.partial(
+            _point_in_time_query,
+            config=config,
+            feature_views=feature_views,
+            feature_refs=feature_refs,
+            registry=registry,
+            project=project,
+            full_feature_names=full_feature_names,
+        )
 
-            entity_df_event_timestamp_range = _get_entity_df_event_timestamp_range(
-                entity_df,
-                entity_df_event_timestamp_col,
-                config,
-                df_query,
-            )
+        offline_store_config = config.offline_store
+        expected_join_keys = sorted(
+            offline_utils.get_expected_join_keys(project, feature_views, registry)
+        )
+        partitions = offline_store_config.historical_retrieval_partitions
+        if isinstance(entity_df, pd.DataFrame) and partitions > 1:
+            # String columns of every partition are sized for the whole data frame,
+            # persist() creates its table from the first partition's result
+            entity_column_types = upload_column_types(entity_df)
+            query: Union[QueryGenerator, List[QueryGenerator]] = [
+                functools.partial(
+                    query_generator,
+                    entity_df=partition,
+                    entity_column_types=entity_column_types,
+                )
+                for partition in _partition_entity_df(
+                    entity_df,
+                    partitions,
+                    offline_store_config.historical_retrieval_partition_by,
+                    expected_join_keys,
+                )
+            ]
+        else:
+            query = functools.partial(query_generator, entity_df=entity_df)
 
-            query_context = offline_utils.get_feature_view_query_context(
-                feature_refs,
-                feature_views,
-                registry,
-                project,
-                entity_df_event_timestamp_range,
+        result_cache_key = None
+        if isinstance(entity_df, pd.DataFrame):
+            result_cache_key = functools.partial(
+                _result_cache_key,
+                config=config,
+                entity_df=entity_df,
+                feature_views=feature_views,
+                feature_refs=feature_refs,
+                registry=registry,
+                project=project,
+                full_feature_names=full_feature_names,
             )
 
-            query_context = [asdict(context) for context in query_context]
-            # Hack for query_context.entity_selections to support uppercase in columns
-            for context in query_context:
-                context["entity_selections"] = [
-                    f'''"{entity_selection.replace(' AS ', '" AS "')}\"'''
-                    for entity_selection in context["entity_selections"]
-                ]
-            try:
-                yield build_point_in_time_query(
-                    query_context,
-                    left_table_query_string=df_query,
-                    entity_df_event_timestamp_col=entity_df_event_timestamp_col,
-                    entity_df_columns=entity_schema.keys(),
-                    query_template=MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN,
-                    full_feature_names=full_feature_names,
-                )
-            finally:
-                if table_name:
-                    with _get_conn(config.offline_store) as conn, conn.cursor() as cur:
-                        cur.execute(
-                            sql.SQL(
-                                """
-                                DROP TABLE IF EXISTS {};
-                                """
-                            ).format(sql.Identifier(table_name)),
-                        )
-
         return MySQLRetrievalJob(
-            query=query_generator,
+            query=query,
             config=config,
             full_feature_names=full_feature_names,
             on_demand_feature_views=OnDemandFeatureView.get_requested_odfvs(
                 feature_refs, project, registry
             ),
+            max_workers=offline_store_config.historical_retrieval_concurrency,
+            result_cache_key=result_cache_key,
+            operation="get_historical_features",
+            metadata=RetrievalMetadata(
+                features=feature_refs,
+                keys=expected_join_keys,
+                min_event_timestamp=None,
+                max_event_timestamp=None,
+            ),
         )
 
     @staticmethod
@@ -199,47 +346,238 @@ class MySQLOfflineStore(OfflineStore):
         end_date: datetime,
     ) -> RetrievalJob:
         assert isinstance(data_source, MySQLSource)
-        from_expression = data_source.get_table_query_string()
-
-        field_string = ", ".join(
-            join_key_columns + feature_name_columns + [event_timestamp_column]
+        offline_store_config = config.offline_store
+        slices = _time_slices(
+            start_date, end_date, offline_store_config.pull_slice_seconds
         )
 
-        start_date = start_date.astimezone(tz=utc)
-        end_date = end_date.astimezone(tz=utc)
-
-        query = f"""
-            SELECT {field_string}
-            FROM {from_expression}
-            WHERE "{event_timestamp_column}" BETWEEN '{start_date}'::timestamptz AND '{end_date}'::timestamptz
-        """
-
         return MySQLRetrievalJob(
-            query=query,
+            query=[
+                functools.partial(
+                    _static_query,
+                    query=_pull_all_query(
+                        from_expression=data_source.get_table_query_string(),
+                        join_key_columns=join_key_columns,
+                        feature_name_columns=feature_name_columns,
+                        event_timestamp_column=event_timestamp_column,
+                        date_partition_column=data_source.date_partition_column,
+                        start_date=slice_start,
+                        end_date=slice_end,
+                        end_inclusive=end_inclusive,
+                    ),
+                )
+                for slice_start, slice_end, end_inclusive in slices
+            ],
             config=config,
             full_feature_names=False,
             on_demand_feature_views=None,
+            max_workers=offline_store_config.pull_concurrency,
+            time_sliced=len(slices) > 1,
+            outfile_export=(
+                (
+                    offline_store_config.outfile_export_dir,
+                    offline_store_config.outfile_export_client_dir,
+                )
+                if offline_store_config.outfile_export_dir
+                else None
+            ),
+            operation="pull_all_from_table_or_query",
+            metadata=RetrievalMetadata(
+                features=feature_name_columns,
+                keys=join_key_columns,
+                min_event_timestamp=start_date,
+                max_event_timestamp=end_date,
+            ),
+        )
+
+    @staticmethod
+    def recommend_indexes(
+        config: RepoConfig,
+        feature_views: List[FeatureView],
+        registry: Registry,
+        project: str,
+        entity_df: Optional[Union[pd.DataFrame, str]] = None,
+    ) -> List[IndexRecommendation]:
+        """
+        EXPLAIN the queries reading each feature view and recommend the index its
+        source table should have.
+
+        Given an entity_df, the point-in-time join of each feature view with it is
+        explained, otherwise its pull_latest_from_table_or_query. Data frames are
+        uploaded once per feature view, so a sample of the entity rows will do.
+        """
+        recommendations = []
+        with _get_conn(config.offline_store) as conn:
+            for feature_view in feature_views:
+                feature_refs = [
+                    f"{feature_view.projection.name_to_use()}:{feature.name}"
+                    for feature in feature_view.features
+                ]
+                (context,) = offline_utils.get_feature_view_query_context(
+                    feature_refs, [feature_view], registry, project, (_EPOCH, _EPOCH)
+                )
+                data_source = feature_view.batch_source
+                assert isinstance(data_source, MySQLSource)
+                join_key_columns = [
+                    entity_selection.split(" AS ")[0]
+                    for entity_selection in context.entity_selections
+                ]
+
+                if entity_df is None:
+                    findings = explain_query(
+                        conn,
+                        _pull_latest_query(
+                            from_expression=data_source.get_table_query_string(),
+                            join_key_columns=join_key_columns,
+                            feature_name_columns=context.features,
+                            event_timestamp_column=context.event_timestamp_column,
+                            created_timestamp_column=(
+                                context.created_timestamp_column
+                            ),
+                            start_date=_EPOCH,
+                            end_date=datetime.now(utc),
+                            date_partition_column=data_source.date_partition_column,
+                        ),
+                    )
+                else:
+                    with _point_in_time_query(
+                        conn,
+                        config,
+                        entity_df,
+                        [feature_view],
+                        feature_refs,
+                        registry,
+                        project,
+                        full_feature_names=False,
+                    ) as query:
+                        findings = explain_query(conn, query)
+
+                recommendations.append(
+                    recommend_index(
+                        conn,
+                        feature_view.name,
+                        data_source.table,
+                        join_key_columns,
+                        context.event_timestamp_column,
+                        context.created_timestamp_column,
+                        context.features,
+                        dict(data_source.get_table_column_names_and_types(config)),
+                        findings,
+                    )
+                )
+        return recommendations
+
+
+class MySQLRetrievalMetadata(RetrievalMetadata):
+    """RetrievalMetadata with the per-phase timings and result size of a run"""
+
+    def __init__(
+        self,
+        features: List[str],
+        keys: List[str],
+        min_event_timestamp: Optional[datetime] = None,
+        max_event_timestamp: Optional[datetime] = None,
+        phase_seconds: Optional[Dict[str, float]] = None,
+        total_seconds: Optional[float] = None,
+        rows: Optional[int] = None,
+        bytes: Optional[int] = None,
+    ):
+        super().__init__(features, keys, min_event_timestamp, max_event_timestamp)
+        self.phase_seconds = phase_seconds
+        self.total_seconds = total_seconds
+        self.rows = rows
+        self.bytes = bytes
+
+    @classmethod
+    def from_timings(
+        cls, metadata: RetrievalMetadata, timings: Optional[RetrievalTimings]
+    ) -> "MySQLRetrievalMetadata":
+        if timings is None:
+            return cls(
+                metadata.features,
+                metadata.keys,
+                metadata.min_event_timestamp,
+                metadata.max_event_timestamp,
+            )
+        timings_dict = timings.to_dict()
+        return cls(
+            metadata.features,
+            metadata.keys,
+            metadata.min_event_timestamp or timings.min_event_timestamp,
+            metadata.max_event_timestamp or timings.max_event_timestamp,
+            **timings_dict,
         )
 
 
 class MySQLRetrievalJob(RetrievalJob):
     def __init__(
         self,
-        query: Union[str, Callable[[], ContextManager[str]]],
+        query: Union[str, QueryGenerator, List[QueryGenerator]],
         config: RepoConfig,
         full_feature_names: bool,
         on_demand_feature_views: Optional[List[OnDemandFeatureView]],
+        max_workers: Optional[int] = None,
+        result_cache_key: Optional[Callable[[Connection], Optional[str]]] = None,
+        watermark: Optional[MaterializationWatermark] = None,
+        time_sliced: bool = False,
+        latest_by_join_keys: Optional[List[str]] = None,
+        outfile_export: Optional[Tuple[str, Optional[str]]] = None,
+        operation: str = "retrieval",
+        metadata: Optional[RetrievalMetadata] = None,
     ):
-        if not isinstance(query, str):
-            self._query_generator = query
-        else:
+        """
+        ``query`` is either the SQL to run, or a callable returning a context manager
+        that prepares whatever the query needs on the connection it is given (e.g.
+        temporary entity tables), yields the SQL, and cleans up on exit.
+
+        A list of query generators is run as partitions of one result, up to
+        ``max_workers`` at a time on separate connections, at most pool_max_size. If
+        the partitions carry ENTITY_ROW_ORDER_COLUMN, the merged rows are sorted by
+        it and it is dropped.
+
+        If the offline store has a result_cache_dir, ``result_cache_key`` is called
+        with a connection to compute the content key of the result. Results are
+        looked up in and stored into the cache under that key, unless it is None.
 
-            @contextlib.contextmanager
-            def query_generator() -> Iterator[str]:
-                assert isinstance(query, str)
-                yield query
+        Incremental materialization jobs pass their ``watermark``. Its
+        WATERMARK_COLUMN is removed from the result, and the newest value read is
+        committed once the result has been read or on commit_watermark().
 
-            self._query_generator = query_generator
+        With ``time_sliced``, the query generators are time slices of one scan
+        instead. Their results are streamed in order with up to ``max_workers``
+        slices running ahead, and slices failing with a connection or server error
+        are retried. Given ``latest_by_join_keys``, slices must come newest first
+        and rows of entities already returned by a newer slice are dropped.
+
+        Given ``outfile_export`` (server directory, client directory), results are
+        written by the server with SELECT ... INTO OUTFILE and read back as CSV,
+        unless a column type doesn't round trip through CSV.
+
+        Every run is timed per phase and reported to the metrics hooks of
+        feast_mysql.instrumentation under ``operation``. The timings of the last run
+        are added to ``metadata`` by the metadata property.
+        """
+        if isinstance(query, str):
+            self._query_generators = [functools.partial(_static_query, query=query)]
+        elif isinstance(query, list):
+            self._query_generators = query
+        else:
+            self._query_generators = [query]
+        # Every worker holds a pooled connection, more than the pool's size would
+        # wait for each other until the checkout timeout
+        self._max_workers = min(
+            max_workers or len(self._query_generators),
+            config.offline_store.pool_max_size,
+        )
+        self._result_cache_key = result_cache_key
+        self._watermark = watermark
+        self._pending_watermark: Optional[datetime] = None
+        self._time_sliced = time_sliced
+        self._latest_by_join_keys = latest_by_join_keys
+        self._outfile_export = outfile_export
+        self._operation = operation
+        self._metadata = metadata
+        self._timings: Optional[RetrievalTimings] = None
         self.config = config
         self._full_feature_names = full_feature_names
         self._on_demand_feature_views = on_demand_feature_views
@@ -257,45 +595,645 @@ class MySQLRetrievalJob(RetrievalJob):
         return self._to_arrow_internal().to_pandas()
 
     def to_sql(self) -> str:
-        with self._query_generator() as query:
-            return query
+        queries = []
+        for query_generator in self._query_generators:
+            with _get_conn(self.config.offline_store) as conn, query_generator(
+                conn
+            ) as query:
+                queries.append(query)
+        return ";\n".join(queries)
 
     def _to_arrow_internal(self) -> pa.Table:
-        with self._query_generator() as query:
-            with _get_conn(self.config.offline_store) as conn, get_cur(conn) as cur:
-                cur.execute(query)
-                fields = [
-                    (col[1], mysql_type_to_arrow_type_string(col[1]))  # name, type
-                    for col in cur.description
+        with collect(
+            self._operation, log=self.config.offline_store.log_retrieval_timings
+        ) as timings:
+            self._timings = timings
+            table = self._to_arrow()
+            timings.add_result(table.num_rows, table.nbytes)
+        return table
+
+    def _to_arrow(self) -> pa.Table:
+        cache, key = self._result_cache()
+        if cache is not None:
+            table = cache.get(key)
+            if table is not None:
+                return table
+
+        table = self._execute()
+        if cache is not None:
+            cache.put(key, table)
+        if self._watermark is not None:
+            table = self._pop_watermark(table)
+            self._on_result_read()
+        return table
+
+    def _result_cache(self) -> Tuple[Optional[ResultCache], Optional[str]]:
+        offline_store_config = self.config.offline_store
+        if self._result_cache_key is None or not offline_store_config.result_cache_dir:
+            return None, None
+
+        with _get_conn(offline_store_config) as conn:
+            key = self._result_cache_key(conn)
+        if key is None:
+            return None, None
+        return (
+            get_result_cache(
+                offline_store_config.result_cache_dir,
+                offline_store_config.result_cache_max_bytes,
+            ),
+            key,
+        )
+
+    def _execute(self) -> pa.Table:
+        if self._time_sliced:
+            return pa.concat_tables(list(self._iter_slices()))
+
+        if len(self._query_generators) == 1:
+            return self._run_query(self._query_generators[0])
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            # Each partition runs in a copy of the context to record its timings
+            tables = [
+                future.result()
+                for future in [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._run_query,
+                        query_generator,
+                    )
+                    for query_generator in self._query_generators
                 ]
-                data = cur.fetchall()
-                schema = pa.schema(fields)
-                # TODO: Fix...
-                data_transposed: List[List[Any]] = []
-                for col in range(len(fields)):
-                    data_transposed.append([])
-                    for row in range(len(data)):
-                        data_transposed[col].append(data[row][col])
-
-                table = pa.Table.from_arrays(
-                    [pa.array(row) for row in data_transposed], schema=schema
+            ]
+
+        table = pa.concat_tables(tables)
+        if ENTITY_ROW_ORDER_COLUMN in table.column_names:
+            order_index = table.schema.get_field_index(ENTITY_ROW_ORDER_COLUMN)
+            table = table.take(
+                pc.sort_indices(table.column(order_index))
+            ).remove_column(order_index)
+        return table
+
+    def _run_query(self, query_generator: QueryGenerator) -> pa.Table:
+        with _get_conn(self.config.offline_store) as conn, query_generator(
+            conn
+        ) as query:
+            if self._outfile_export:
+                with export_query(conn, query, *self._outfile_export) as export:
+                    if export is not None:
+                        return read_export(*export)
+
+            with get_cur(conn, SSCursor) as cur:
+                with timed(QUERY_EXECUTION):
+                    cur.execute(query)
+                return cursor_to_arrow_table(cur)
+
+    def _run_slice(self, query_generator: QueryGenerator) -> pa.Table:
+        retries = self.config.offline_store.pull_slice_retries
+        for attempt in itertools.count():
+            try:
+                return self._run_query(query_generator)
+            except (OperationalError, InterfaceError):
+                if attempt >= retries:
+                    raise
+
+    def _iter_slices(self) -> Iterator[pa.Table]:
+        query_generators = iter(self._query_generators)
+        seen_entities: Set[Tuple] = set()
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            pending = collections.deque(
+                executor.submit(
+                    contextvars.copy_context().run, self._run_slice, query_generator
                 )
-                return table
+                for query_generator in itertools.islice(
+                    query_generators, self._max_workers
+                )
+            )
+            while pending:
+                table = pending.popleft().result()
+                query_generator = next(query_generators, None)
+                if query_generator is not None:
+                    pending.append(
+                        executor.submit(
+                            contextvars.copy_context().run,
+                            self._run_slice,
+                            query_generator,
+                        )
+                    )
+
+                if self._latest_by_join_keys is not None:
+                    table = _drop_seen_entities(
+                        table, self._latest_by_join_keys, seen_entities
+                    )
+                yield table
+
+    def to_arrow_batches(
+        self, batch_size: int = DEFAULT_FETCH_SIZE
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Stream the result as Arrow record batches of at most ``batch_size`` rows.
+
+        Rows are read through an unbuffered server-side cursor, so only one batch is
+        held in client memory at a time. Any temporary tables the query depends on
+        are kept until the iterator is exhausted or closed. Partitioned retrievals
+        are merged in memory first to restore the entity row order.
+
+        Cached results are served from the result cache, but streamed results are
+        not stored into it. Time sliced jobs hold one result per running slice.
+
+        Closing the iterator early kills the running query rather than reading the
+        rest of the result. While the consumer holds a batch, the server waits up to
+        ``streaming_net_write_timeout_seconds`` for it to read on.
+
+        On demand feature views are not applied to the batches, use to_df() or
+        to_arrow() for results with on demand features.
+
+        The retrieval is reported to the metrics hooks once the iterator is
+        exhausted or closed, its total time includes the time spent by the consumer.
+        """
+        timings = RetrievalTimings()
+        self._timings = timings
+        start = time.perf_counter()
+        batches = self._iter_arrow_batches(batch_size)
+        try:
+            while True:
+                # Only activate the timings while the job itself runs, the context
+                # must not leak into the consumer between batches
+                with activate(timings):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                timings.add_result(batch.num_rows, batch.nbytes)
+                yield batch
+        finally:
+            with activate(timings):
+                batches.close()
+            timings.total_seconds = time.perf_counter() - start
+            report(
+                self._operation,
+                timings,
+                log=self.config.offline_store.log_retrieval_timings,
+            )
+
+    def _iter_arrow_batches(self, batch_size: int) -> Iterator[pa.RecordBatch]:
+        if self._time_sliced:
+            for table in self._iter_slices():
+                if self._watermark is not None:
+                    table = self._pop_watermark(table)
+                yield from table.to_batches(batch_size)
+            if self._watermark is not None:
+                self._on_result_read()
+            return
+
+        if len(self._query_generators) > 1:
+            yield from self._to_arrow().to_batches(batch_size)
+            return
+
+        cache, key = self._result_cache()
+        if cache is not None:
+            table = cache.get(key)
+            if table is not None:
+                yield from table.to_batches(batch_size)
+                return
+
+        with _get_conn(self.config.offline_store) as conn, self._query_generators[0](
+            conn
+        ) as query:
+            yield from self._iter_query_batches(conn, query, batch_size)
+        if self._watermark is not None:
+            self._on_result_read()
+
+    def _iter_query_batches(
+        self, conn: Connection, query: str, batch_size: int
+    ) -> Iterator[pa.RecordBatch]:
+        if self._outfile_export:
+            with export_query(conn, query, *self._outfile_export) as export:
+                if export is not None:
+                    yield from iter_export_batches(*export, batch_size)
+                    return
+
+        with get_cur(conn, SSCursor) as cur:
+            cur.execute(
+                "SET SESSION net_write_timeout = %s",
+                (self.config.offline_store.streaming_net_write_timeout_seconds,),
+            )
+            with timed(QUERY_EXECUTION):
+                cur.execute(query)
+            try:
+                for batch in iter_cursor_record_batches(cur, batch_size):
+                    if self._watermark is not None:
+                        batch = self._pop_watermark(batch)
+                    yield batch
+            except GeneratorExit:
+                # Closed early: closing the cursor would read the rest of the result,
+                # so stop the query first. The connection is discarded on the way out.
+                _stop_unbuffered_query(self.config.offline_store, conn, cur)
+                raise
+            cur.execute("SET SESSION net_write_timeout = DEFAULT")
+
+    def commit_watermark(self):
+        """
+        Advance the materialization watermark to the newest event or created
+        timestamp in the result. Only needed in the manual commit mode, see
+        ``materialization_watermark_commit``, once the result is written.
+        """
+        if self._watermark is None or self._pending_watermark is None:
+            return
+        with _get_conn(self.config.offline_store) as conn:
+            self._watermark.advance(conn, self._pending_watermark)
+        self._pending_watermark = None
+
+    def _pop_watermark(self, data):
+        # Table or RecordBatch; remembers the newest watermark and drops the column
+        index = data.schema.get_field_index(WATERMARK_COLUMN)
+        watermark = pc.max(data.column(index)).as_py()
+        if watermark is not None and (
+            self._pending_watermark is None or watermark > self._pending_watermark
+        ):
+            self._pending_watermark = watermark
+        return type(data).from_arrays(
+            [column for i, column in enumerate(data.columns) if i != index],
+            schema=data.schema.remove(index),
+        )
+
+    def _on_result_read(self):
+        if _watermark_commit_mode(self.config) == "on_read":
+            self.commit_watermark()
 
     @property
     def metadata(self) -> Optional[RetrievalMetadata]:
-        return None
+        """
+        The features, keys and event timestamp range of the retrieval, with the
+        timings of its last run once it ran
+        """
+        if self._metadata is None:
+            return None
+        return MySQLRetrievalMetadata.from_timings(self._metadata, self._timings)
 
     def persist(self, storage: SavedDatasetStorage):
-        raise NotImplementedError(
-            "feast-mysql does not support persisting historical dataframes"
+        """
+        Write the result into the storage table without reading it into Python.
+
+        The table is created with CREATE TABLE ... AS SELECT, or appended to with
+        INSERT ... SELECT if it already exists, e.g. when it was created up front
+        with partitioning. Partitions of a partitioned retrieval are written one
+        after another on the same connection, their entity columns are sized for
+        every partition so the table created from the first one fits them all.
+
+        Raises NotImplementedError before writing anything if this Feast release
+        can't record the storage in the registry, so FeatureStore.create_saved_dataset
+        doesn't leave an unregistered table behind.
+        """
+        assert isinstance(storage, SavedDatasetMySQLStorage)
+        _check_custom_storage()
+        table_name = quote_table_name(storage.table_ref)
+
+        with _get_conn(self.config.offline_store) as conn:
+            for query_generator in self._query_generators:
+                with query_generator(conn) as query, get_cur(conn) as cur:
+                    cur.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+                    columns = ", ".join(
+                        f"`{column[0]}`"
+                        for column in cur.description
+                        if column[0] != ENTITY_ROW_ORDER_COLUMN
+                    )
+                    select = f"SELECT {columns} FROM ({query}) AS q"
+
+                    if table_exists(cur, storage.table_ref):
+                        cur.execute(f"INSERT INTO {table_name} ({columns}) {select}")
+                    else:
+                        cur.execute(f"CREATE TABLE {table_name} AS {select}")
+            conn.commit()
+
+
+def _watermark_commit_mode(config: RepoConfig) -> str:
+    mode = config.offline_store.materialization_watermark_commit
+    if mode is not None:
+        return mode
+    return "manual" if _uses_mysql_provider(config) else "on_read"
+
+
+def _uses_mysql_provider(config: RepoConfig) -> bool:
+    # Feast's own providers are named without a module path
+    if "." not in config.provider:
+        return False
+    from ..provider import MySQLProvider
+
+    module_name, class_name = config.provider.rsplit(".", 1)
+    try:
+        provider_class = getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError):
+        return False
+    return isinstance(provider_class, type) and issubclass(
+        provider_class, MySQLProvider
+    )
+
+
+def _stop_unbuffered_query(config: MySQLConfig, conn: Connection, cur: SSCursor):
+    """Kill the query an unbuffered cursor reads from and discard what it sent"""
+    kill_query(config, conn)
+    try:
+        cur.close()
+    except OperationalError as error:
+        if not (error.args and error.args[0] == ER.QUERY_INTERRUPTED):
+            raise
+
+
+@contextlib.contextmanager
+def _point_in_time_query(
+    conn: Connection,
+    config: RepoConfig,
+    entity_df: Union[pd.DataFrame, str],
+    feature_views: List[FeatureView],
+    feature_refs: List[str],
+    registry: Registry,
+    project: str,
+    full_feature_names: bool,
+    entity_column_types: Optional[Dict[str, str]] = None,
+) -> Iterator[str]:
+    """
+    Upload the entity data frame into a temporary table on conn, yield the
+    point-in-time join query against it, and drop the table on exit. SQL entity
+    queries are copied into a temporary table too with entity_query_materialization.
+    Partitions of one entity data frame pass the ``entity_column_types`` of all of
+    it, so their results have the same schema.
+    """
+    table_name = None
+    try:
+        if isinstance(entity_df, pd.DataFrame):
+            entity_schema = dict(zip(entity_df.columns, entity_df.dtypes))
+        elif isinstance(entity_df, str):
+            df_query = f"({entity_df}) AS sub"
+            if config.offline_store.entity_query_materialization:
+                table_name = offline_utils.get_temp_entity_table_name()
+                with timed(ENTITY_UPLOAD):
+                    entity_schema = _materialize_entity_query(
+                        conn, entity_df, table_name
+                    )
+                df_query = f"`{table_name}`"
+            else:
+                entity_schema = get_query_schema(config.offline_store, df_query)
+        else:
+            raise TypeError(entity_df)
+
+        entity_df_event_timestamp_col = (
+            offline_utils.infer_event_timestamp_from_entity_df(entity_schema)
         )
 
+        expected_join_keys = offline_utils.get_expected_join_keys(
+            project, feature_views, registry
+        )
 
-def _get_entity_df_event_timestamp_range(
+        offline_utils.assert_expected_columns_in_entity_df(
+            entity_schema, expected_join_keys, entity_df_event_timestamp_col
+        )
+
+        if isinstance(entity_df, pd.DataFrame):
+            table_name = offline_utils.get_temp_entity_table_name()
+            with timed(ENTITY_UPLOAD):
+                df_to_mysql_table(
+                    conn,
+                    entity_df,
+                    table_name,
+                    local_infile=config.offline_store.local_infile,
+                    temporary=True,
+                    engine=config.offline_store.entity_table_engine,
+                    index_columns=sorted(expected_join_keys)
+                    + [entity_df_event_timestamp_col],
+                    row_id_columns=sorted(expected_join_keys)
+                    + [entity_df_event_timestamp_col],
+                    column_types=entity_column_types,
+                )
+            df_query = f"`{table_name}`"
+        elif table_name:
+            with timed(ENTITY_UPLOAD):
+                add_table_index(
+                    conn,
+                    table_name,
+                    sorted(expected_join_keys) + [entity_df_event_timestamp_col],
+                )
+
+        query_context = _get_query_context(
+            conn,
+            entity_df,
+            entity_df_event_timestamp_col,
+            df_query,
+            feature_views,
+            feature_refs,
+            registry,
+            project,
+        )
+
+        with timed(TEMPLATE_RENDER):
+            query = build_point_in_time_query(
+                query_context,
+                left_table_query_string=df_query,
+                entity_df_event_timestamp_col=entity_df_event_timestamp_col,
+                entity_df_columns=entity_schema.keys(),
+                query_template=POINT_IN_TIME_JOIN_TEMPLATES[
+                    config.offline_store.point_in_time_join
+                ],
+                full_feature_names=full_feature_names,
+                entity_row_ids_uploaded=isinstance(entity_df, pd.DataFrame),
+            )
+        yield query
+    finally:
+        # The entity table is a TEMPORARY table on conn, drop it before the
+        # connection goes back to the pool
+        if table_name:
+            with get_cur(conn) as cur, timed(TEMP_TABLE_CLEANUP):
+                cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{table_name}`")
+
+
+def _materialize_entity_query(
+    conn: Connection, entity_df: str, table_name: str
+) -> Dict[str, np.dtype]:
+    """
+    Run the entity query once into a temporary table on conn and return its schema
+    """
+    with get_cur(conn) as cur:
+        cur.execute(
+            f"CREATE TEMPORARY TABLE `{table_name}` "
+            f"AS SELECT * FROM ({entity_df}) AS sub"
+        )
+        cur.execute(f"SELECT * FROM `{table_name}` LIMIT 0")
+        empty_df = cursor_to_arrow_table(cur).to_pandas()
+    return dict(zip(empty_df.columns, empty_df.dtypes))
+
+
+def _get_query_context(
+    conn: Connection,
     entity_df: Union[pd.DataFrame, str],
     entity_df_event_timestamp_col: str,
+    df_query: str,
+    feature_views: List[FeatureView],
+    feature_refs: List[str],
+    registry: Registry,
+    project: str,
+) -> List[dict]:
+    if isinstance(entity_df, str) and not any(
+        feature_view.batch_source.date_partition_column
+        for feature_view in feature_views
+    ):
+        # The templates bound the feature rows by the entity timestamps themselves,
+        # the range is only needed for date partition bounds. Skip the MIN/MAX scan
+        # of the entity query without them.
+        entity_df_event_timestamp_range = (_EPOCH, _EPOCH)
+    else:
+        with timed(TIMESTAMP_RANGE):
+            entity_df_event_timestamp_range = _get_entity_df_event_timestamp_range(
+                entity_df, entity_df_event_timestamp_col, conn, df_query,
+            )
+        timings = current_timings()
+        if timings is not None:
+            timings.observe_event_timestamps(*entity_df_event_timestamp_range)
+
+    query_context = offline_utils.get_feature_view_query_context(
+        feature_refs,
+        feature_views,
+        registry,
+        project,
+        entity_df_event_timestamp_range,
+    )
+
+    date_partition_columns = {
+        feature_view.projection.name_to_use(): (
+            feature_view.batch_source.date_partition_column
+        )
+        for feature_view in feature_views
+    }
+
+    query_context_dicts = [asdict(context) for context in query_context]
+    # Quote the "<column> AS <join key>" entity selections so uppercase and
+    # reserved column names work, and keep the pairs for the LATERAL template
+    for context in query_context_dicts:
+        context["entity_columns"] = [
+            entity_selection.split(" AS ")
+            for entity_selection in context["entity_selections"]
+        ]
+        context["entity_selections"] = [
+            f"`{column}` AS `{join_key}`"
+            for column, join_key in context["entity_columns"]
+        ]
+        # Constant bounds on the date partition column for partition pruning: the
+        # date of the earliest row any entity row can see, and the latest entity row
+        date_partition_column = date_partition_columns.get(context["name"])
+        context["date_partition_condition"] = (
+            _date_partition_condition(
+                f"sub.`{date_partition_column}`",
+                _parse_timestamp(context["min_event_timestamp"]),
+                _parse_timestamp(context["max_event_timestamp"]),
+            )
+            if date_partition_column
+            else None
+        )
+    return query_context_dicts
+
+
+def _result_cache_key(
+    conn: Connection,
     config: RepoConfig,
+    entity_df: pd.DataFrame,
+    feature_views: List[FeatureView],
+    feature_refs: List[str],
+    registry: Registry,
+    project: str,
+    full_feature_names: bool,
+) -> Optional[str]:
+    """
+    Content key of a historical retrieval: a hash of the rendered SQL with the
+    entity table left as a slot, the entity rows, and the freshness token of every
+    feature view source. None if any source has no freshness token.
+    """
+    freshness_tokens = []
+    for feature_view in feature_views:
+        source = feature_view.batch_source
+        if not isinstance(source, MySQLSource):
+            return None
+        token = source.get_freshness_token(conn)
+        if token is None:
+            return None
+        freshness_tokens.append(token)
+
+    entity_schema = dict(zip(entity_df.columns, entity_df.dtypes))
+    entity_df_event_timestamp_col = offline_utils.infer_event_timestamp_from_entity_df(
+        entity_schema
+    )
+    query_context = _get_query_context(
+        conn,
+        entity_df,
+        entity_df_event_timestamp_col,
+        _LEFT_TABLE_PLACEHOLDER,
+        feature_views,
+        feature_refs,
+        registry,
+        project,
+    )
+    query = build_point_in_time_query(
+        query_context,
+        left_table_query_string=_LEFT_TABLE_PLACEHOLDER,
+        entity_df_event_timestamp_col=entity_df_event_timestamp_col,
+        entity_df_columns=entity_schema.keys(),
+        query_template=POINT_IN_TIME_JOIN_TEMPLATES[
+            config.offline_store.point_in_time_join
+        ],
+        full_feature_names=full_feature_names,
+        entity_row_ids_uploaded=True,
+    )
+
+    key = hashlib.sha256(query.encode())
+    key.update(
+        json.dumps(
+            [[str(name), str(dtype)] for name, dtype in entity_schema.items()]
+            + freshness_tokens
+        ).encode()
+    )
+    key.update(pd.util.hash_pandas_object(entity_df, index=False).values.tobytes())
+    return key.hexdigest()
+
+
+def _partition_entity_df(
+    entity_df: pd.DataFrame,
+    partitions: int,
+    partition_by: str,
+    join_keys: List[str],
+) -> List[pd.DataFrame]:
+    """
+    Split the entity data frame into at most ``partitions`` non-empty parts, either
+    by a hash of the join keys or into consecutive event timestamp ranges. Every
+    row is tagged with its original position in ENTITY_ROW_ORDER_COLUMN so the
+    partition results can be put back in order.
+    """
+    entity_df = entity_df.assign(
+        **{ENTITY_ROW_ORDER_COLUMN: np.arange(len(entity_df), dtype=np.int64)}
+    )
+    join_keys = [key for key in join_keys if key in entity_df.columns]
+
+    if partition_by == "event_timestamp" or not join_keys:
+        event_timestamp_col = offline_utils.infer_event_timestamp_from_entity_df(
+            dict(zip(entity_df.columns, entity_df.dtypes))
+        )
+        order = np.argsort(entity_df[event_timestamp_col].values, kind="stable")
+        return [
+            entity_df.iloc[rows]
+            for rows in np.array_split(order, partitions)
+            if len(rows)
+        ]
+
+    buckets = (
+        pd.util.hash_pandas_object(entity_df[join_keys], index=False).values
+        % partitions
+    )
+    return [
+        entity_df[buckets == bucket]
+        for bucket in range(partitions)
+        if (buckets == bucket).any()
+    ]
+
+
+def _get_entity_df_event_timestamp_range(
+    entity_df: Union[pd.DataFrame, str],
+    entity_df_event_timestamp_col: str,
+    conn: Connection,
     table_name: str,
 ) -> Tuple[datetime, datetime]:
     if isinstance(entity_df, pd.DataFrame):
@@ -313,10 +1251,10 @@ def _get_entity_df_event_timestamp_range(
     elif isinstance(entity_df, str):
         # If the entity_df is a string (SQL query), determine range
         # from table
-        with _get_conn(config.offline_store) as conn, conn.cursor() as cur:
+        with get_cur(conn) as cur:
             cur.execute(
-                f"SELECT MIN({entity_df_event_timestamp_col}) AS min, MAX({entity_df_event_timestamp_col}) AS max FROM {table_name}"
-            ),
+                f"SELECT MIN(`{entity_df_event_timestamp_col}`) AS min, MAX(`{entity_df_event_timestamp_col}`) AS max FROM {table_name}"
+            )
             res = cur.fetchone()
         entity_df_event_timestamp_range = (res[0], res[1])
     else:
@@ -325,8 +1263,246 @@ def _get_entity_df_event_timestamp_range(
     return entity_df_event_timestamp_range
 
 
+def _pull_latest_query(
+    from_expression: str,
+    join_key_columns: List[str],
+    feature_name_columns: List[str],
+    event_timestamp_column: str,
+    created_timestamp_column: Optional[str],
+    start_date: datetime,
+    end_date: datetime,
+    end_inclusive: bool = True,
+    date_partition_column: Optional[str] = None,
+    watermark: Optional[datetime] = None,
+    watermark_column: bool = False,
+) -> str:
+    """
+    Latest row per entity with an event timestamp in [start_date, end_date], or in
+    [start_date, end_date) without end_inclusive, restricted to the date partitions
+    of that range if the source has a date_partition_column. Given a
+    watermark, only rows with an event or created timestamp after it are read. With
+    watermark_column, the newest event or created timestamp read is added to every
+    row as WATERMARK_COLUMN.
+    """
+    partition_by_join_key_string = ", ".join(_append_alias(join_key_columns, "a"))
+    if partition_by_join_key_string != "":
+        partition_by_join_key_string = "PARTITION BY " + partition_by_join_key_string
+    timestamps = [event_timestamp_column]
+    if created_timestamp_column:
+        timestamps.append(created_timestamp_column)
+    timestamp_desc_string = " DESC, ".join(_append_alias(timestamps, "a")) + " DESC"
+    a_field_string = ", ".join(
+        _append_alias(join_key_columns + feature_name_columns + timestamps, "a")
+    )
+    b_field_string = ", ".join(
+        _append_alias(join_key_columns + feature_name_columns + timestamps, "b")
+    )
+
+    conditions = [
+        _time_range_condition(
+            f"a.`{event_timestamp_column}`", start_date, end_date, end_inclusive
+        )
+    ]
+    if date_partition_column:
+        conditions.append(
+            _date_partition_condition(
+                f"a.`{date_partition_column}`", start_date, end_date
+            )
+        )
+    if watermark is not None:
+        conditions.append(
+            "("
+            + " OR ".join(
+                f"{timestamp} > {_datetime_literal(watermark)}"
+                for timestamp in _append_alias(timestamps, "a")
+            )
+            + ")"
+        )
+
+    if watermark_column:
+        latest_timestamp = (
+            f"GREATEST(a.`{event_timestamp_column}`, "
+            f"COALESCE(a.`{created_timestamp_column}`, a.`{event_timestamp_column}`))"
+            if created_timestamp_column
+            else f"a.`{event_timestamp_column}`"
+        )
+        a_field_string += f", MAX({latest_timestamp}) OVER () AS `{WATERMARK_COLUMN}`"
+        b_field_string += f", b.`{WATERMARK_COLUMN}`"
+
+    return f"""
+        SELECT
+            {b_field_string}
+            {f", {repr(DUMMY_ENTITY_VAL)} AS `{DUMMY_ENTITY_ID}`" if not join_key_columns else ""}
+        FROM (
+            SELECT {a_field_string},
+            ROW_NUMBER() OVER({partition_by_join_key_string} ORDER BY {timestamp_desc_string}) AS _feast_row
+            FROM {from_expression} AS a
+            WHERE {" AND ".join(conditions)}
+        ) b
+        WHERE _feast_row = 1
+        """
+
+
+@contextlib.contextmanager
+def _pull_latest_query_generator(
+    conn: Connection,
+    watermark: Optional[MaterializationWatermark],
+    pull_end_date: datetime,
+    **query_args,
+) -> Iterator[str]:
+    # The end of the whole pull, not of the slice: a pull ending before the
+    # watermark is a backfill of rows that were already read, it reads them again
+    watermark_value = watermark.get(conn) if watermark is not None else None
+    if watermark_value is not None and (
+        _to_naive_utc(pull_end_date) <= watermark_value
+    ):
+        watermark_value = None
+    yield _pull_latest_query(
+        watermark=watermark_value,
+        watermark_column=watermark is not None,
+        **query_args,
+    )
+
+
+def _pull_all_query(
+    from_expression: str,
+    join_key_columns: List[str],
+    feature_name_columns: List[str],
+    event_timestamp_column: str,
+    start_date: datetime,
+    end_date: datetime,
+    end_inclusive: bool = True,
+    date_partition_column: Optional[str] = None,
+) -> str:
+    field_string = ", ".join(
+        _append_alias(
+            join_key_columns + feature_name_columns + [event_timestamp_column], "a"
+        )
+    )
+    conditions = [
+        _time_range_condition(
+            f"a.`{event_timestamp_column}`", start_date, end_date, end_inclusive
+        )
+    ]
+    if date_partition_column:
+        conditions.append(
+            _date_partition_condition(
+                f"a.`{date_partition_column}`", start_date, end_date
+            )
+        )
+    return f"""
+        SELECT {field_string}
+        FROM {from_expression} AS a
+        WHERE {" AND ".join(conditions)}
+    """
+
+
+@contextlib.contextmanager
+def _static_query(conn: Connection, query: str) -> Iterator[str]:
+    yield query
+
+
+def _time_slices(
+    start_date: datetime, end_date: datetime, slice_seconds: Optional[int]
+) -> List[Tuple[datetime, datetime, bool]]:
+    """
+    Split [start_date, end_date] into (start, end, end_inclusive) slices of
+    slice_seconds, oldest first. Only the last slice includes its end.
+    """
+    if not slice_seconds:
+        return [(start_date, end_date, True)]
+
+    step = timedelta(seconds=slice_seconds)
+    slices = []
+    slice_start = start_date
+    while slice_start + step < end_date:
+        slices.append((slice_start, slice_start + step, False))
+        slice_start += step
+    slices.append((slice_start, end_date, True))
+    return slices
+
+
+def _time_range_condition(
+    column: str, start_date: datetime, end_date: datetime, end_inclusive: bool
+) -> str:
+    return (
+        f"{column} >= {_datetime_literal(start_date)} AND "
+        f"{column} {'<=' if end_inclusive else '<'} {_datetime_literal(end_date)}"
+    )
+
+
+def _date_partition_condition(
+    column: str, start_date: Optional[datetime], end_date: datetime
+) -> str:
+    """
+    Constant bounds on a date partition column for rows with event timestamps in
+    [start_date, end_date], so MySQL can prune partitions and use range indexes. A
+    partition holds the rows of one UTC day, so the lower bound is the start's UTC
+    date. Without a start_date only the upper bound applies.
+    """
+    condition = f"{column} <= {_datetime_literal(end_date)}"
+    if start_date is None:
+        return condition
+    start_literal = f"'{_to_naive_utc(start_date).date().isoformat()}'"
+    return f"{column} >= {start_literal} AND {condition}"
+
+
+def _drop_seen_entities(
+    table: pa.Table, join_keys: List[str], seen_entities: Set[Tuple]
+) -> pa.Table:
+    """
+    Drop the rows of entities in seen_entities, a set of join key tuples, and add
+    the entities of the remaining rows to it. Keys are compared by value rather
+    than by hash, so two entities are never mistaken for one another.
+    """
+    if table.num_rows == 0:
+        return table
+    entity_keys = list(
+        zip(*(table.column(join_key).to_pylist() for join_key in join_keys))
+    )
+    unseen = [entity_key not in seen_entities for entity_key in entity_keys]
+    seen_entities.update(itertools.compress(entity_keys, unseen))
+    return table.filter(pa.array(unseen, type=pa.bool_()))
+
+
+def _datetime_literal(value: datetime) -> str:
+    # DATETIME columns are compared as naive UTC
+    value = _to_naive_utc(value)
+    return f"'{value.isoformat(sep=' ', timespec='microseconds')}'"
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    # ISO 8601 timestamps of the query context, with or without an offset
+    return pd.Timestamp(value).to_pydatetime() if value else None
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(tz=utc).replace(tzinfo=None)
+    return value
+
+
 def _append_alias(field_names: List[str], alias: str) -> List[str]:
-    return [f'{alias}."{field_name}"' for field_name in field_names]
+    return [f"{alias}.`{field_name}`" for field_name in field_names]
+
+
+# Rendered point-in-time queries kept per process, see build_point_in_time_query
+RENDERED_QUERY_CACHE_SIZE = 256
+# Rendered in place of the entity table or query and substituted afterwards, so the
+# rendered SQL doesn't depend on the random temporary table name
+_LEFT_TABLE_PLACEHOLDER = "__feast_left_table_query_string__"
+# Query context values that depend on the entity timestamp range of the request.
+# The templates don't read the timestamps, and the date partition conditions are
+# slotted in like the entity table, so rendered queries are reused across ranges.
+_TIMESTAMP_RANGE_CONTEXT_KEYS = ("min_event_timestamp", "max_event_timestamp")
+_DATE_PARTITION_PLACEHOLDER = "__feast_date_partition_condition_{}__"
+
+_TEMPLATE_ENVIRONMENT = Environment(loader=BaseLoader())
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_template(query_template: str) -> Template:
+    return _TEMPLATE_ENVIRONMENT.from_string(source=query_template)
 
 
 def build_point_in_time_query(
@@ -336,9 +1512,53 @@ def build_point_in_time_query(
     entity_df_columns: KeysView[str],
     query_template: str,
     full_feature_names: bool = False,
+    entity_row_ids_uploaded: bool = False,
 ) -> str:
-    """Build point-in-time query between each feature view table and the entity dataframe for MySQL"""
-    template = Environment(loader=BaseLoader()).from_string(source=query_template)
+    """
+    Build point-in-time query between each feature view table and the entity dataframe for MySQL
+
+    Templates are compiled once per process, and rendered queries are cached by
+    their inputs with the entity table and the date partition conditions left as
+    slots, so repeated retrievals of the same features skip rendering, whatever
+    their entity timestamps.
+    """
+    slots = {}
+    cached_contexts = []
+    for i, context in enumerate(feature_view_query_contexts):
+        context = {
+            key: value
+            for key, value in context.items()
+            if key not in _TIMESTAMP_RANGE_CONTEXT_KEYS
+        }
+        if context.get("date_partition_condition"):
+            placeholder = _DATE_PARTITION_PLACEHOLDER.format(i)
+            slots[placeholder] = context["date_partition_condition"]
+            context["date_partition_condition"] = placeholder
+        cached_contexts.append(context)
+
+    query = _render_point_in_time_query(
+        json.dumps(cached_contexts, sort_keys=True, default=str),
+        entity_df_event_timestamp_col,
+        tuple(entity_df_columns),
+        query_template,
+        full_feature_names,
+        entity_row_ids_uploaded,
+    )
+    for placeholder, value in slots.items():
+        query = query.replace(placeholder, value)
+    return query.replace(_LEFT_TABLE_PLACEHOLDER, left_table_query_string)
+
+
+@functools.lru_cache(maxsize=RENDERED_QUERY_CACHE_SIZE)
+def _render_point_in_time_query(
+    feature_view_query_contexts_json: str,
+    entity_df_event_timestamp_col: str,
+    entity_df_columns: Tuple[str, ...],
+    query_template: str,
+    full_feature_names: bool,
+    entity_row_ids_uploaded: bool,
+) -> str:
+    feature_view_query_contexts = json.loads(feature_view_query_contexts_json)
 
     final_output_feature_names = list(entity_df_columns)
     final_output_feature_names.extend(
@@ -351,171 +1571,121 @@ def build_point_in_time_query(
 
     # Add additional fields to dict
     template_context = {
-        "left_table_query_string": left_table_query_string,
+        "left_table_query_string": _LEFT_TABLE_PLACEHOLDER,
         "entity_df_event_timestamp_col": entity_df_event_timestamp_col,
-        "unique_entity_keys": set(
-            [entity for fv in feature_view_query_contexts for entity in fv["entities"]]
+        "unique_entity_keys": sorted(
+            set(
+                entity
+                for fv in feature_view_query_contexts
+                for entity in fv["entities"]
+            )
         ),
+        "entity_row_id_column": ENTITY_ROW_ID_COLUMN,
+        "entity_row_ids_uploaded": entity_row_ids_uploaded,
         "featureviews": feature_view_query_contexts,
         "full_feature_names": full_feature_names,
         "final_output_feature_names": final_output_feature_names,
     }
 
-    query = template.render(template_context)
-    return query
+    return _compile_template(query_template).render(template_context)
 
 
-# Copied from the Feast Postgres offline store implementation
-# MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN
-# https://github.com/feast-dev/feast/blob/104155cfcd681fe3ce88ece71f1d47eb5d7cfd36/sdk/python/feast/infra/offline_stores/contrib/postgres_offline_store/postgres.py
+# Point-in-time join templates for MySQL 8. Identifiers are quoted with backticks,
+# timestamp arithmetic uses INTERVAL ... SECOND, and each feature view is resolved in
+# a single pass instead of the base/dedup/latest/cleaned CTE chain of the Postgres
+# store the original template was copied from.
 
 MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN = """
 /*
- Compute a deterministic hash for the `left_table_query_string` that will be used throughout
- all the logic as the field to GROUP BY the data
+ Number every distinct (entity keys, event timestamp) tuple of the entity dataframe
+ with a dense BIGINT that is used throughout all the logic to PARTITION BY and join
+ on. Uploaded entity dataframes already carry it.
+
+ The entity table is a TEMPORARY table, which MySQL can't open more than once in a
+ statement (ER_CANT_REOPEN_TABLE). The LIMIT keeps MySQL from merging this CTE into
+ each of its references, so it is materialized once and the table read once.
 */
 WITH entity_dataframe AS (
     SELECT *,
-        {{entity_df_event_timestamp_col}} AS entity_timestamp
-        {% for featureview in featureviews %}
-            {% if featureview.entities %}
-            ,(
-                {% for entity in featureview.entities %}
-                    CAST({{entity}} as CHAR) ||
-                {% endfor %}
-                CAST({{entity_df_event_timestamp_col}} AS CHAR)
-            ) AS {{featureview.name}}__entity_row_unique_id
-            {% else %}
-            ,CAST({{entity_df_event_timestamp_col}} AS CHAR) AS {{featureview.name}}__entity_row_unique_id
-            {% endif %}
-        {% endfor %}
+        `{{ entity_df_event_timestamp_col }}` AS entity_timestamp
+        {% if not entity_row_ids_uploaded %}
+        ,DENSE_RANK() OVER (
+            ORDER BY {% for entity in unique_entity_keys %}`{{ entity }}`, {% endfor %}`{{ entity_df_event_timestamp_col }}`
+        ) AS `{{ entity_row_id_column }}`
+        {% endif %}
     FROM {{ left_table_query_string }}
+    LIMIT 18446744073709551615
 ),
 
 {% for featureview in featureviews %}
 
-{{ featureview.name }}__entity_dataframe AS (
-    SELECT
-        {% if featureview.entities %}{{ featureview.entities | join('", "') }},{% endif %}
+`{{ featureview.name }}__entity_dataframe` AS (
+    SELECT DISTINCT
+        {% for entity in featureview.entities %}`{{ entity }}`, {% endfor %}
         entity_timestamp,
-        {{featureview.name}}__entity_row_unique_id
+        `{{ entity_row_id_column }}`
     FROM entity_dataframe
-    GROUP BY
-        {% if featureview.entities %}{{ featureview.entities | join('", "')}},{% endif %}
-        entity_timestamp,
-        {{featureview.name}}__entity_row_unique_id
 ),
 
 /*
- This query template performs the point-in-time correctness join for a single feature set table
- to the provided entity table.
-
- 1. We first join the current feature_view to the entity dataframe that has been passed.
- This JOIN has the following logic:
-    - For each row of the entity dataframe, only keep the rows where the `event_timestamp_column`
-    is less than the one provided in the entity dataframe
-    - If there a TTL for the current feature_view, also keep the rows where the `event_timestamp_column`
-    is higher the the one provided minus the TTL
-    - For each row, Join on the entity key and retrieve the `entity_row_unique_id` that has been
-    computed previously
-
- The output of this CTE will contain all the necessary information and already filtered out most
- of the data that is not relevant.
+ Rows of the feature view that can be the latest value for some entity row: of an
+ entity in the entity dataframe, not after the latest entity timestamp and, with a
+ TTL, not older than the earliest entity timestamp minus the TTL. On table sources
+ these filters apply to the base table and can use its indexes.
 */
-
-{{ featureview.name }}__subquery AS (
+`{{ featureview.name }}__subquery` AS (
     SELECT
-        {{ featureview.event_timestamp_column }} as event_timestamp,
-        {{ '"' ~ featureview.created_timestamp_column ~ '" as created_timestamp,' if featureview.created_timestamp_column else '' }}
-        {{ featureview.entity_selections | join(', ')}}{% if featureview.entity_selections %},{% else %}{% endif %}
+        `{{ featureview.event_timestamp_column }}` AS event_timestamp,
+        {% if featureview.created_timestamp_column %}
+        `{{ featureview.created_timestamp_column }}` AS created_timestamp,
+        {% endif %}
+        {{ featureview.entity_selections | join(', ') }}{% if featureview.entity_selections %},{% endif %}
         {% for feature in featureview.features %}
-            {{ feature }} as {% if full_feature_names %}{{ featureview.name }}__{{feature}}{% else %}{{ feature }}{% endif %}{% if loop.last %}{% else %}, {% endif %}
+        `{{ feature }}` AS `{% if full_feature_names %}{{ featureview.name }}__{{ feature }}{% else %}{{ feature }}{% endif %}`{% if not loop.last %},{% endif %}
         {% endfor %}
     FROM {{ featureview.table_subquery }} AS sub
-    WHERE {{ featureview.event_timestamp_column }} <= (SELECT MAX(entity_timestamp) FROM entity_dataframe)
-    {% if featureview.ttl == 0 %}{% else %}
-    AND {{ featureview.event_timestamp_column }} >= (SELECT MIN(entity_timestamp) FROM entity_dataframe) - {{ featureview.ttl }} * interval '1' second
+    WHERE `{{ featureview.event_timestamp_column }}` <= (SELECT MAX(entity_timestamp) FROM entity_dataframe)
+    {% if featureview.ttl %}
+    AND `{{ featureview.event_timestamp_column }}` >= (SELECT MIN(entity_timestamp) FROM entity_dataframe) - INTERVAL {{ featureview.ttl }} SECOND
+    {% endif %}
+    {% if featureview.date_partition_condition %}
+    AND {{ featureview.date_partition_condition }}
+    {% endif %}
+    {% if featureview.entity_columns %}
+    AND ({% for column, join_key in featureview.entity_columns %}`{{ column }}`{% if not loop.last %}, {% endif %}{% endfor %}) IN (
+        SELECT {% for column, join_key in featureview.entity_columns %}`{{ join_key }}`{% if not loop.last %}, {% endif %}{% endfor %}
+        FROM entity_dataframe
+    )
     {% endif %}
-),
-
-{{ featureview.name }}__base AS (
-    SELECT
-        subquery.*,
-        entity_dataframe.entity_timestamp,
-        entity_dataframe.{{featureview.name}}__entity_row_unique_id
-    FROM {{ featureview.name }}__subquery AS subquery
-    INNER JOIN {{ featureview.name }}__entity_dataframe AS entity_dataframe
-    ON TRUE
-        AND subquery.event_timestamp <= entity_dataframe.entity_timestamp
-
-        {% if featureview.ttl == 0 %}{% else %}
-        AND subquery.event_timestamp >= entity_dataframe.entity_timestamp - {{ featureview.ttl }} * interval '1' second
-        {% endif %}
-
-        {% for entity in featureview.entities %}
-        AND subquery.{{ entity }} = entity_dataframe.{{ entity }}
-        {% endfor %}
-),
-
-/*
- 2. If the `created_timestamp_column` has been set, we need to
- deduplicate the data first. This is done by calculating the
- `MAX(created_at_timestamp)` for each event_timestamp.
- We then join the data on the next CTE
-*/
-{% if featureview.created_timestamp_column %}
-{{ featureview.name }}__dedup AS (
-    SELECT
-        {{featureview.name}}__entity_row_unique_id,
-        event_timestamp,
-        MAX(created_timestamp) as created_timestamp
-    FROM {{ featureview.name }}__base
-    GROUP BY {{featureview.name}}__entity_row_unique_id, event_timestamp
-),
-{% endif %}
-
-/*
- 3. The data has been filtered during the first CTE "*__base"
- Thus we only need to compute the latest timestamp of each feature.
-*/
-{{ featureview.name }}__latest AS (
-    SELECT
-        event_timestamp,
-        {% if featureview.created_timestamp_column %}created_timestamp,{% endif %}
-        {{featureview.name}}__entity_row_unique_id
-    FROM
-    (
-        SELECT *,
-            ROW_NUMBER() OVER(
-                PARTITION BY {{featureview.name}}__entity_row_unique_id
-                ORDER BY event_timestamp DESC{% if featureview.created_timestamp_column %},created_timestamp DESC{% endif %}
-            ) AS row_number
-        FROM {{ featureview.name }}__base
-        {% if featureview.created_timestamp_column %}
-            INNER JOIN {{ featureview.name }}__dedup
-            USING ({{featureview.name}}__entity_row_unique_id, event_timestamp, created_timestamp)
-        {% endif %}
-    ) AS sub
-    WHERE row_number = 1
 ),
 
 /*
- 4. Once we know the latest value of each feature for a given timestamp,
- we can join again the data back to the original "base" dataset
+ Join the candidate rows to the entity rows they are visible to and rank them once.
+ The first row per entity row is the latest event, and among rows with the same
+ event timestamp the latest created one.
 */
-{{ featureview.name }}__cleaned AS (
-    SELECT base.*
-    FROM {{ featureview.name }}__base as base
-    INNER JOIN {{ featureview.name }}__latest
-    USING(
-        {{featureview.name}}__entity_row_unique_id,
-        event_timestamp
-        {% if featureview.created_timestamp_column %}
-            ,created_timestamp
+`{{ featureview.name }}__latest` AS (
+    SELECT *
+    FROM (
+        SELECT
+            subquery.*,
+            entity_dataframe.`{{ entity_row_id_column }}`,
+            ROW_NUMBER() OVER (
+                PARTITION BY entity_dataframe.`{{ entity_row_id_column }}`
+                ORDER BY subquery.event_timestamp DESC{% if featureview.created_timestamp_column %}, subquery.created_timestamp DESC{% endif %}
+            ) AS _feast_row
+        FROM `{{ featureview.name }}__subquery` AS subquery
+        INNER JOIN `{{ featureview.name }}__entity_dataframe` AS entity_dataframe
+        ON subquery.event_timestamp <= entity_dataframe.entity_timestamp
+        {% if featureview.ttl %}
+        AND subquery.event_timestamp >= entity_dataframe.entity_timestamp - INTERVAL {{ featureview.ttl }} SECOND
         {% endif %}
-    )
-){% if loop.last %}{% else %}, {% endif %}
-
+        {% for entity in featureview.entities %}
+        AND subquery.`{{ entity }}` = entity_dataframe.`{{ entity }}`
+        {% endfor %}
+    ) AS ranked
+    WHERE _feast_row = 1
+){% if not loop.last %},{% endif %}
 
 {% endfor %}
 /*
@@ -523,16 +1693,57 @@ WITH entity_dataframe AS (
  The entity_dataframe dataset being our source of truth here.
  */
 
-SELECT {{ final_output_feature_names | join('", "')}}
+SELECT `{{ final_output_feature_names | join('`, `') }}`
 FROM entity_dataframe
 {% for featureview in featureviews %}
 LEFT JOIN (
     SELECT
-        {{featureview.name}}__entity_row_unique_id
+        `{{ entity_row_id_column }}`
+        {% for feature in featureview.features %}
+        ,`{% if full_feature_names %}{{ featureview.name }}__{{ feature }}{% else %}{{ feature }}{% endif %}`
+        {% endfor %}
+    FROM `{{ featureview.name }}__latest`
+) AS `{{ featureview.name }}`
+ON `{{ featureview.name }}`.`{{ entity_row_id_column }}` = entity_dataframe.`{{ entity_row_id_column }}`
+{% endfor %}
+"""
+
+# Looks up the latest row of each feature view for every entity row with a LATERAL
+# derived table (MySQL 8.0.14+). With an index on (join keys, event timestamp) on the
+# feature table every lookup is a single backward index range scan.
+MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_LATERAL_JOIN = """
+WITH entity_dataframe AS (
+    SELECT *,
+        `{{ entity_df_event_timestamp_col }}` AS entity_timestamp
+    FROM {{ left_table_query_string }}
+)
+
+SELECT `{{ final_output_feature_names | join('`, `') }}`
+FROM entity_dataframe
+{% for featureview in featureviews %}
+LEFT JOIN LATERAL (
+    SELECT
         {% for feature in featureview.features %}
-            ,{% if full_feature_names %}{{ featureview.name }}__{{feature}}{% else %}{{ feature }}{% endif %}
+        sub.`{{ feature }}` AS `{% if full_feature_names %}{{ featureview.name }}__{{ feature }}{% else %}{{ feature }}{% endif %}`{% if not loop.last %},{% endif %}
         {% endfor %}
-    FROM {{ featureview.name }}__cleaned
-) AS {{featureview.name}} USING ({{featureview.name}}__entity_row_unique_id)
+    FROM {{ featureview.table_subquery }} AS sub
+    WHERE sub.`{{ featureview.event_timestamp_column }}` <= entity_dataframe.entity_timestamp
+    {% if featureview.ttl %}
+    AND sub.`{{ featureview.event_timestamp_column }}` >= entity_dataframe.entity_timestamp - INTERVAL {{ featureview.ttl }} SECOND
+    {% endif %}
+    {% if featureview.date_partition_condition %}
+    AND {{ featureview.date_partition_condition }}
+    {% endif %}
+    {% for column, join_key in featureview.entity_columns %}
+    AND sub.`{{ column }}` = entity_dataframe.`{{ join_key }}`
+    {% endfor %}
+    ORDER BY sub.`{{ featureview.event_timestamp_column }}` DESC{% if featureview.created_timestamp_column %}, sub.`{{ featureview.created_timestamp_column }}` DESC{% endif %}
+    LIMIT 1
+) AS `{{ featureview.name }}` ON TRUE
 {% endfor %}
 """
+
+POINT_IN_TIME_JOIN_TEMPLATES = {
+    "window": MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN,
+    "lateral": MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_LATERAL_JOIN,
+}
@@ -1,25 +1,81 @@
 import json
-from typing import Callable, Dict, Iterable, Optional, Tuple
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymysql import Connection
 
 from feast import ValueType
 from feast.data_source import DataSource
 from feast.protos.feast.core.DataSource_pb2 import DataSource as DataSourceProto
+from feast.protos.feast.core.SavedDataset_pb2 import (
+    SavedDatasetStorage as SavedDatasetStorageProto,
+)
 from feast.repo_config import RepoConfig
-from ..type_map import mysql_type_to_feast_value_type, mysql_type_code_to_mysql_type
-from ..utils import _get_conn, get_cur
+from feast.saved_dataset import SavedDatasetStorage
+from ..type_map import (
+    mysql_type_to_feast_value_type,
+    resolve_result_shape,
+    result_shape,
+)
+from ..instrumentation import SCHEMA_PROBE, timed
+from ..mysql_config import MySQLConfig
+from ..schema_cache import get_schema_cache, invalidate_schema_cache
+from ..utils import _get_conn, get_cur, quote_table_name
+from .index_advisor import (
+    ensure_index,
+    find_index,
+    lookup_index_columns,
+    table_indexes,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class MySQLSource(DataSource):
     def __init__(
         self,
-        query: str,
+        query: Optional[str] = None,
         event_timestamp_column: Optional[str] = "",
         created_timestamp_column: Optional[str] = "",
         field_mapping: Optional[Dict[str, str]] = None,
         date_partition_column: Optional[str] = "",
         name: Optional[str] = "",
+        freshness_query: Optional[str] = None,
+        table: Optional[str] = None,
+        schema: Optional[List[Tuple[str, str]]] = None,
+        index_columns: Optional[List[str]] = None,
     ):
-        self._mysql_options = MySQLOptions(query=query)
+        """
+        A source is either a ``query`` or a ``table`` (``table`` or
+        ``database.table``). Offline queries select from a table directly, so their
+        filters can use its indexes and partitions, while a query is read as a
+        derived table.
+
+        ``freshness_query`` is an optional query whose result changes whenever the
+        source data does, e.g. ``SELECT MAX(updated_at) FROM driver_stats``. Table
+        sources without one fall back to the table's UPDATE_TIME. Results read from
+        sources with neither are never served from the result cache.
+
+        ``schema`` is the source's list of (column, MySQL type) pairs. It is
+        filled in by get_table_column_names_and_types when the offline store has
+        ``persist_source_schemas`` set, and stored in the registry with the source.
+
+        ``index_columns`` are the join key columns of a table source. With
+        ``auto_create_indexes``, feast_mysql.MySQLProvider indexes the table on
+        them followed by the event and created timestamps on ``feast apply``,
+        unless it already has such an index. See create_index.
+        """
+        if (query is None) == (table is None):
+            raise ValueError("MySQLSource takes exactly one of query or table")
+        if index_columns is not None and table is None:
+            raise ValueError("index_columns can only be given for table sources")
+        self._mysql_options = MySQLOptions(
+            query=query,
+            freshness_query=freshness_query,
+            table=table,
+            schema=schema,
+            index_columns=index_columns,
+        )
 
         super().__init__(
             name=name,
@@ -32,6 +88,14 @@ class MySQLSource(DataSource):
     def __hash__(self):
         return super().__hash__()
 
+    @property
+    def query(self) -> Optional[str]:
+        return self._mysql_options._query
+
+    @property
+    def table(self) -> Optional[str]:
+        return self._mysql_options._table
+
     def __eq__(self, other):
         if not isinstance(other, MySQLSource):
             raise TypeError(
@@ -40,6 +104,11 @@ class MySQLSource(DataSource):
 
         return (
             self._mysql_options._query == other._mysql_options._query
+            and self._mysql_options._table == other._mysql_options._table
+            and self._mysql_options._freshness_query
+            == other._mysql_options._freshness_query
+            and self._mysql_options._index_columns
+            == other._mysql_options._index_columns
             and self.event_timestamp_column == other.event_timestamp_column
             and self.created_timestamp_column == other.created_timestamp_column
             and self.field_mapping == other.field_mapping
@@ -51,7 +120,11 @@ class MySQLSource(DataSource):
 
         mysql_options = json.loads(data_source.custom_options.configuration)
         return MySQLSource(
-            query=mysql_options["query"],
+            query=mysql_options.get("query"),
+            table=mysql_options.get("table"),
+            freshness_query=mysql_options.get("freshness_query"),
+            schema=mysql_options.get("schema"),
+            index_columns=mysql_options.get("index_columns"),
             field_mapping=dict(data_source.field_mapping),
             event_timestamp_column=data_source.event_timestamp_column,
             created_timestamp_column=data_source.created_timestamp_column,
@@ -72,7 +145,48 @@ class MySQLSource(DataSource):
         return data_source_proto
 
     def validate(self, config: RepoConfig):
-        pass
+        """
+        Runs on ``feast apply`` and ``feast plan``, so it only reports: with
+        auto_create_indexes, a missing lookup index of a table source with
+        index_columns is logged. It is created by create_index.
+        """
+        offline_store_config = config.offline_store
+        if (
+            not offline_store_config.auto_create_indexes
+            or self._mysql_options._index_columns is None
+        ):
+            return
+
+        columns = self._lookup_index_columns()
+        with _get_conn(offline_store_config) as conn:
+            indexes = table_indexes(conn, self._mysql_options._table)
+        if find_index(indexes, columns) is None:
+            logger.warning(
+                "Table %s has no index on (%s), feast apply creates it with the "
+                "feast_mysql.MySQLProvider provider",
+                self._mysql_options._table,
+                ", ".join(columns),
+            )
+
+    def create_index(self, config: RepoConfig) -> Optional[str]:
+        """
+        Index a table source with index_columns on them followed by the event and
+        created timestamps, unless it has such an index. Returns the name of the
+        created index.
+        """
+        if self._mysql_options._index_columns is None:
+            return None
+        with _get_conn(config.offline_store) as conn:
+            return ensure_index(
+                conn, self._mysql_options._table, self._lookup_index_columns()
+            )
+
+    def _lookup_index_columns(self) -> List[str]:
+        return lookup_index_columns(
+            self._mysql_options._index_columns,
+            self.event_timestamp_column,
+            self.created_timestamp_column,
+        )
 
     @staticmethod
     def source_datatype_to_feast_value_type() -> Callable[[str], ValueType]:
@@ -81,34 +195,154 @@ class MySQLSource(DataSource):
     def get_table_column_names_and_types(
         self, config: RepoConfig
     ) -> Iterable[Tuple[str, str]]:
-        ret = None
-        with _get_conn(config.offline_store) as conn, get_cur(conn) as cur:
+        if self._mysql_options._schema is not None:
+            return [tuple(column) for column in self._mysql_options._schema]
+
+        offline_store_config = config.offline_store
+        ret = get_schema_cache().get(
+            offline_store_config,
+            "columns",
+            self.get_table_query_string(),
+            lambda: self._probe_column_names_and_types(offline_store_config),
+        )
+        if offline_store_config.persist_source_schemas:
+            self._mysql_options._schema = list(ret)
+        return list(ret)
+
+    def invalidate_schema(self, config: RepoConfig):
+        """Forget the cached and persisted schema, so the next lookup probes again"""
+        self._mysql_options._schema = None
+        invalidate_schema_cache(config.offline_store, self.get_table_query_string())
+
+    def _probe_column_names_and_types(
+        self, config: MySQLConfig
+    ) -> List[Tuple[str, str]]:
+        with _get_conn(config) as conn, get_cur(conn) as cur, timed(SCHEMA_PROBE):
             cur.execute(
-                f"SELECT * FROM ({self.get_table_query_string()}) AS sub LIMIT 0"
+                f"SELECT * FROM {self.get_table_query_string()} AS sub LIMIT 0"
             )
-            ret = ((c[0], mysql_type_code_to_mysql_type(c[1])) for c in cur.description)
-        return ret
+            shape = result_shape(cur)
+            return [
+                (column[0], column_type.mysql_type)
+                for column, column_type in zip(shape, resolve_result_shape(shape))
+            ]
 
     def get_table_query_string(self) -> str:
+        if self._mysql_options._table:
+            return quote_table_name(self._mysql_options._table)
         return f"({self._mysql_options._query})"
 
+    def get_freshness_token(self, conn: Connection) -> Optional[str]:
+        """
+        Run the freshness query on conn and return its result as a string. Without
+        one, table sources return their UPDATE_TIME if the server knows it, and
+        query sources return None.
+        """
+        if self._mysql_options._freshness_query:
+            with get_cur(conn) as cur:
+                cur.execute(self._mysql_options._freshness_query)
+                return json.dumps(cur.fetchall(), default=str)
+
+        if not self._mysql_options._table:
+            return None
+        database, _, table_name = self._mysql_options._table.rpartition(".")
+        with get_cur(conn) as cur:
+            # information_schema caches table statistics for a day by default
+            cur.execute("SET SESSION information_schema_stats_expiry = 0")
+            cur.execute(
+                "SELECT UPDATE_TIME FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE()) AND TABLE_NAME = %s",
+                (database or None, table_name),
+            )
+            row = cur.fetchone()
+        # UPDATE_TIME is NULL for tables not written to since the server started
+        if row is None or row[0] is None:
+            return None
+        return str(row[0])
+
 
 class MySQLOptions:
-    def __init__(self, query: Optional[str]):
+    def __init__(
+        self,
+        query: Optional[str],
+        freshness_query: Optional[str] = None,
+        table: Optional[str] = None,
+        schema: Optional[List[Tuple[str, str]]] = None,
+        index_columns: Optional[List[str]] = None,
+    ):
         self._query = query
+        self._freshness_query = freshness_query
+        self._table = table
+        self._schema = schema
+        self._index_columns = index_columns
 
     @classmethod
     def from_proto(cls, mysql_options_proto: DataSourceProto.CustomSourceOptions):
         config = json.loads(mysql_options_proto.configuration.decode("utf8"))
         mysql_options = cls(
-            query=config["query"],
+            query=config.get("query"),
+            freshness_query=config.get("freshness_query"),
+            table=config.get("table"),
+            schema=config.get("schema"),
+            index_columns=config.get("index_columns"),
         )
 
         return mysql_options
 
     def to_proto(self) -> DataSourceProto.CustomSourceOptions:
         mysql_options_proto = DataSourceProto.CustomSourceOptions(
-            configuration=json.dumps({"query": self._query}).encode()
+            configuration=json.dumps(
+                {
+                    "query": self._query,
+                    "table": self._table,
+                    "freshness_query": self._freshness_query,
+                    "schema": self._schema,
+                    "index_columns": self._index_columns,
+                }
+            ).encode()
         )
 
         return mysql_options_proto
+
+
+class SavedDatasetMySQLStorage(SavedDatasetStorage):
+    """
+    A saved dataset stored in a MySQL table, written server-side by
+    ``MySQLRetrievalJob.persist``.
+
+    The registry can only record the table in Feast releases whose
+    SavedDatasetStorage proto has a ``custom_storage`` field. With older releases,
+    like 0.19, saved datasets aren't supported: ``persist`` raises
+    NotImplementedError before creating the table, and so does
+    ``FeatureStore.create_saved_dataset``, which persists first.
+    """
+
+    _proto_attr_name = "custom_storage"
+
+    def __init__(self, table_ref: str):
+        self.table_ref = table_ref
+
+    @staticmethod
+    def from_proto(storage_proto: SavedDatasetStorageProto) -> SavedDatasetStorage:
+        _check_custom_storage()
+        config = json.loads(storage_proto.custom_storage.configuration.decode("utf8"))
+        return SavedDatasetMySQLStorage(table_ref=config["table"])
+
+    def to_proto(self) -> SavedDatasetStorageProto:
+        _check_custom_storage()
+        return SavedDatasetStorageProto(
+            custom_storage=DataSourceProto.CustomSourceOptions(
+                configuration=json.dumps({"table": self.table_ref}).encode()
+            )
+        )
+
+    def to_data_source(self) -> DataSource:
+        return MySQLSource(table=self.table_ref)
+
+
+def _check_custom_storage():
+    if "custom_storage" not in SavedDatasetStorageProto.DESCRIPTOR.fields_by_name:
+        raise NotImplementedError(
+            "This Feast release can't record MySQL saved datasets in the registry, "
+            "its SavedDatasetStorage proto has no custom_storage field."
+        )
@@ -0,0 +1,196 @@
+import contextlib
+import logging
+import os
+import posixpath
+import uuid
+from typing import Iterator, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+from pymysql import Connection
+
+from ..instrumentation import ARROW_CONVERSION, QUERY_EXECUTION, timed
+from ..type_map import resolve_result_shape, result_shape
+from ..utils import get_cur
+
+logger = logging.getLogger(__name__)
+
+# MySQL types whose text form pyarrow parses back into the column's Arrow type.
+# Strings are quoted, so commas, quotes and newlines in them survive. JSON, BIT,
+# TIME, spatial and binary columns don't round trip and use the client protocol.
+_EXPORTABLE_MYSQL_TYPES = {
+    "tinyint",
+    "smallint",
+    "mediumint",
+    "int",
+    "bigint",
+    "bigint unsigned",
+    "float",
+    "double",
+    "decimal",
+    "year",
+    "date",
+    "datetime",
+    "timestamp",
+    "char",
+    "varchar",
+    "tinytext",
+    "text",
+    "mediumtext",
+    "longtext",
+    "enum",
+    "set",
+}
+_STRING_MYSQL_TYPES = {
+    "char",
+    "varchar",
+    "tinytext",
+    "text",
+    "mediumtext",
+    "longtext",
+    "enum",
+    "set",
+}
+
+# CSV dialect of the exported files. With an escape character, MySQL writes NULL as
+# \N, which reads as an unquoted N once pyarrow removed the escape. String values
+# are always quoted, so a quoted "N" stays a string.
+_OUTFILE_FORMAT = (
+    "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+    "LINES TERMINATED BY '\\n'"
+)
+_NULL_VALUE = "N"
+
+# Characters of string values replaced by a backslash sequence in the export, and
+# restored after reading. Without line breaks in values every line is a row, so
+# pyarrow can split the file and parse it on all cores. MySQL would write NUL as
+# \0, which pyarrow reads back as 0. The backslash itself comes first, so every
+# backslash left in an exported value starts one of these sequences.
+_STRING_ESCAPES = (
+    ("\\", "\\s"),
+    ("\n", "\\n"),
+    ("\r", "\\r"),
+    ("\0", "\\0"),
+)
+
+
+@contextlib.contextmanager
+def export_query(
+    conn: Connection, query: str, server_dir: str, client_dir: Optional[str] = None
+) -> Iterator[Optional[Tuple[str, pa.Schema, bool]]]:
+    """
+    Have the server write the result of query into a CSV file in server_dir with
+    SELECT ... INTO OUTFILE, and yield the path the client reads it from (in
+    client_dir, if the directory is mounted elsewhere on the client), the Arrow
+    schema of the result and whether it has string columns. String values are
+    written with their line breaks, NUL bytes and backslashes escaped, see
+    _STRING_ESCAPES. The file is deleted on exit.
+
+    Yields None, without running the query, if any column type doesn't round trip
+    through CSV.
+    """
+    with get_cur(conn) as cur:
+        cur.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+        shape = result_shape(cur)
+    column_types = resolve_result_shape(shape)
+    if any(
+        column_type.mysql_type not in _EXPORTABLE_MYSQL_TYPES
+        for column_type in column_types
+    ):
+        yield None
+        return
+
+    schema = pa.schema(
+        [
+            (column[0], column_type.arrow_type)
+            for column, column_type in zip(shape, column_types)
+        ]
+    )
+    has_strings = any(
+        column_type.mysql_type in _STRING_MYSQL_TYPES for column_type in column_types
+    )
+
+    columns = ", ".join(
+        f"{_escaped_string_sql(conn, column[0])} AS `{column[0]}`"
+        if column_type.mysql_type in _STRING_MYSQL_TYPES
+        else f"q.`{column[0]}`"
+        for column, column_type in zip(shape, column_types)
+    )
+
+    file_name = f"feast_export_{uuid.uuid4().hex}.csv"
+    client_path = os.path.join(client_dir or server_dir, file_name)
+    try:
+        with get_cur(conn) as cur, timed(QUERY_EXECUTION):
+            cur.execute(
+                f"SELECT {columns} FROM ({query}) AS q INTO OUTFILE "
+                f"{conn.escape(posixpath.join(server_dir, file_name))} "
+                f"{_OUTFILE_FORMAT}"
+            )
+        yield client_path, schema, has_strings
+    finally:
+        try:
+            os.remove(client_path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Could not remove exported file %s", client_path)
+
+
+def read_export(path: str, schema: pa.Schema, has_strings: bool) -> pa.Table:
+    """Read an exported file with pyarrow's multithreaded CSV reader"""
+    with timed(ARROW_CONVERSION):
+        table = csv.read_csv(path, **_csv_options(schema))
+        return _unescape_strings(table) if has_strings else table
+
+
+def iter_export_batches(
+    path: str, schema: pa.Schema, has_strings: bool, batch_size: int
+) -> Iterator[pa.RecordBatch]:
+    """Stream an exported file as record batches of at most batch_size rows"""
+    reader = csv.open_csv(path, **_csv_options(schema))
+    while True:
+        with timed(ARROW_CONVERSION):
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                return
+            if has_strings:
+                batch = _unescape_strings(batch)
+        yield from pa.Table.from_batches([batch]).to_batches(batch_size)
+
+
+def _escaped_string_sql(conn: Connection, column: str) -> str:
+    expression = f"q.`{column}`"
+    for character, escaped in _STRING_ESCAPES:
+        expression = (
+            f"REPLACE({expression}, {conn.escape(character)}, {conn.escape(escaped)})"
+        )
+    return expression
+
+
+def _unescape_strings(data):
+    # Table or RecordBatch; the backslash goes last, see _STRING_ESCAPES
+    columns = list(data.columns)
+    for i, field in enumerate(data.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            for character, escaped in _STRING_ESCAPES[::-1]:
+                columns[i] = pc.replace_substring(columns[i], escaped, character)
+    return type(data).from_arrays(columns, schema=data.schema)
+
+
+def _csv_options(schema: pa.Schema) -> dict:
+    return {
+        "read_options": csv.ReadOptions(column_names=schema.names),
+        # Values never span lines, see _STRING_ESCAPES, so the file is parsed in
+        # parallel
+        "parse_options": csv.ParseOptions(
+            escape_char="\\", double_quote=False, newlines_in_values=False
+        ),
+        "convert_options": csv.ConvertOptions(
+            column_types=schema,
+            null_values=[_NULL_VALUE],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    }
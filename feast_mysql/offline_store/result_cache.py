@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import pyarrow as pa
+
+_SUFFIX = ".arrow"
+
+
+class ResultCache:
+    """
+    A directory of retrieval results stored as Arrow IPC files named by their
+    content key.
+
+    Hits are memory-mapped rather than read, so serving a cached result costs
+    little more than opening the file. Each hit refreshes the file's modification
+    time, and once the directory grows past ``max_bytes`` the least recently used
+    files are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "bytes_saved": 0,
+        }
+
+    def get(self, key: str) -> Optional[pa.Table]:
+        path = self._path(key)
+        try:
+            source = pa.memory_map(path, "r")
+            table = pa.ipc.open_file(source).read_all()
+            os.utime(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["bytes_saved"] += source.size()
+        return table
+
+    def put(self, key: str, table: pa.Table):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._stats["stores"] += 1
+        self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses, stores, evictions and the bytes served from the cache"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
+
+
+_caches: Dict[Tuple[str, int], ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(directory: str, max_bytes: int) -> ResultCache:
+    """Return the process-wide result cache for a directory"""
+    key = (os.path.abspath(directory), max_bytes)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = ResultCache(directory, max_bytes)
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional
+
+from pymysql import Connection, ProgrammingError
+from pymysql.constants import ER
+
+from ..utils import get_cur, quote_table_name
+
+# Added to incremental pull_latest results with the newest event or created
+# timestamp read, and removed from the result before it is returned
+WATERMARK_COLUMN = "_feast_watermark"
+
+
+class MaterializationWatermark:
+    """
+    The newest event or created timestamp materialized so far for one feature view,
+    kept as a row of a watermark table in MySQL.
+    """
+
+    def __init__(self, table_name: str, key: str, source: str):
+        self.table_name = table_name
+        self.key = key
+        self.source = source
+
+    def get(self, conn: Connection) -> Optional[datetime]:
+        with get_cur(conn) as cur:
+            try:
+                cur.execute(
+                    f"SELECT watermark FROM {quote_table_name(self.table_name)} "
+                    f"WHERE watermark_key = %s",
+                    (self.key,),
+                )
+            except ProgrammingError as error:
+                if error.args and error.args[0] == ER.NO_SUCH_TABLE:
+                    return None
+                raise
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def advance(self, conn: Connection, watermark: datetime):
+        """
+        Move the watermark forward to ``watermark``. It never moves backwards, so
+        jobs committing out of order can't re-open rows that were already read.
+        """
+        table_name = quote_table_name(self.table_name)
+        with get_cur(conn) as cur:
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {table_name} ("
+                f"watermark_key CHAR(64) NOT NULL PRIMARY KEY, "
+                f"source VARCHAR(255) NOT NULL, "
+                f"watermark DATETIME(6) NOT NULL, "
+                f"updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+                f"ON UPDATE CURRENT_TIMESTAMP(6))"
+            )
+            cur.execute(
+                f"INSERT INTO {table_name} (watermark_key, source, watermark) "
+                f"VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE "
+                f"watermark = GREATEST(watermark, VALUES(watermark))",
+                (self.key, self.source[:255], watermark),
+            )
+        conn.commit()
@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Tuple
+
+from pymysql import Connection, connect, err
+from pymysql.constants import ER
+
+from .mysql_config import MySQLConfig
+
+
+class MySQLConnectionPool:
+    """
+    A thread-safe pool of open MySQL connections.
+
+    Idle connections are handed out most-recently-used first and closed once they
+    have been idle for longer than ``idle_timeout_seconds``, down to ``min_size``.
+    When ``ping_on_checkout`` is set, every connection is pinged before it is handed
+    out and replaced if the server has gone away.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Connection],
+        min_size: int = 0,
+        max_size: int = 10,
+        idle_timeout_seconds: float = 300,
+        ping_on_checkout: bool = True,
+        checkout_timeout_seconds: float = 30,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(
+                f"Invalid pool size: min_size={min_size}, max_size={max_size}"
+            )
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.ping_on_checkout = ping_on_checkout
+        self.checkout_timeout_seconds = checkout_timeout_seconds
+
+        self._cond = threading.Condition()
+        # (connection, monotonic time it was returned to the pool)
+        self._idle: Deque[Tuple[Connection, float]] = deque()
+        self._size = 0
+        self._counters: Dict[str, int] = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "ping_failures": 0,
+            "evicted_idle": 0,
+        }
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._open(), time.monotonic()))
+
+    def acquire(self) -> Connection:
+        deadline = time.monotonic() + self.checkout_timeout_seconds
+        while True:
+            with self._cond:
+                self._evict_idle()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise TimeoutError(
+                            f"Timed out waiting for a MySQL connection, all "
+                            f"{self.max_size} pooled connections are in use"
+                        )
+                    self._counters["waits"] += 1
+                    self._cond.wait(remaining)
+
+                self._counters["checkouts"] += 1
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    self._counters["reused"] += 1
+                else:
+                    conn = None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return self._open()
+                except BaseException:
+                    self._discard()
+                    raise
+
+            if not self.ping_on_checkout:
+                return conn
+            try:
+                conn.ping(reconnect=False)
+                return conn
+            except err.Error:
+                with self._cond:
+                    self._counters["ping_failures"] += 1
+                self._close(conn)
+
+    def release(self, conn: Connection, discard: bool = False):
+        """
+        Return a connection to the pool. Uncommitted work is rolled back so every
+        checkout starts from a clean transaction. Connections in an unknown state
+        should be returned with ``discard=True`` to close them instead.
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except err.Error:
+                discard = True
+
+        if discard:
+            self._close(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        """Close all idle connections. Checked out connections close on release."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                **self._counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+            }
+
+    def _open(self) -> Connection:
+        conn = self._connect()
+        with self._cond:
+            self._counters["created"] += 1
+        return conn
+
+    def _close(self, conn: Connection):
+        try:
+            conn.close()
+        except err.Error:
+            pass
+        self._discard()
+
+    def _discard(self):
+        with self._cond:
+            self._size -= 1
+            self._counters["closed"] += 1
+            self._cond.notify()
+
+    def _evict_idle(self):
+        # Called with the lock held. The oldest idle connections are at the left.
+        now = time.monotonic()
+        while (
+            len(self._idle) > self.min_size
+            and now - self._idle[0][1] > self.idle_timeout_seconds
+        ):
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._counters["evicted_idle"] += 1
+            self._counters["closed"] += 1
+            try:
+                conn.close()
+            except err.Error:
+                pass
+
+
+def _connect(config: MySQLConfig) -> Connection:
+    try:
+        return connect(
+            database=config.database,
+            host=config.host,
+            port=int(config.port),
+            user=config.user,
+            password=config.password,
+            local_infile=config.local_infile,
+        )
+    except err.MySQLError as error:
+        if error.args and error.args[0] == ER.ACCESS_DENIED_ERROR:
+            print("Something is wrong with your user name or password")
+        elif error.args and error.args[0] == ER.BAD_DB_ERROR:
+            print("Database does not exist")
+        raise
+
+
+def kill_query(config: MySQLConfig, conn: Connection):
+    """
+    Stop the statement running on conn with KILL QUERY from a separate, unpooled
+    connection. conn stays open and reads an error once the statement stopped.
+    """
+    killer = _connect(config)
+    try:
+        with killer.cursor() as cur:
+            cur.execute("KILL QUERY %s", (conn.thread_id(),))
+    finally:
+        killer.close()
+
+
+_pools: Dict[Tuple, MySQLConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(config: MySQLConfig) -> Tuple:
+    # Connections can't be shared with a forked child, so each process gets its own
+    return (
+        os.getpid(),
+        config.host,
+        int(config.port),
+        config.user,
+        config.password,
+        config.database,
+        config.local_infile,
+    )
+
+
+def get_connection_pool(config: MySQLConfig) -> MySQLConnectionPool:
+    """Return the process-wide connection pool for the server and user in config"""
+    key = _pool_key(config)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = MySQLConnectionPool(
+                lambda: _connect(config),
+                min_size=config.pool_min_size,
+                max_size=config.pool_max_size,
+                idle_timeout_seconds=config.pool_idle_timeout_seconds,
+                ping_on_checkout=config.pool_ping_on_checkout,
+                checkout_timeout_seconds=config.pool_checkout_timeout_seconds,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def close_connection_pools():
+    """Close the idle connections of every pool and forget the pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import Callable, Sequence
+
+from tqdm import tqdm
+
+from feast import Entity, FeatureView
+from feast.infra.passthrough_provider import DEFAULT_BATCH_SIZE, PassthroughProvider
+from feast.infra.provider import (
+    _convert_arrow_to_proto,
+    _get_column_names,
+    _run_field_mapping,
+)
+from feast.registry import Registry
+from feast.repo_config import RepoConfig
+
+from .offline_store.mysql import MySQLOfflineStore, MySQLRetrievalJob
+from .offline_store.mysql_source import MySQLSource
+
+
+class MySQLProvider(PassthroughProvider):
+    """
+    The local provider, with incremental materialization from the MySQL offline
+    store: pulls are keyed on the feature view, and the materialization watermark is
+    only advanced once the rows are written to the online store. With
+    auto_create_indexes, ``feast apply`` also indexes the sources of the applied
+    feature views. Set ``provider: feast_mysql.MySQLProvider`` in
+    feature_store.yaml to use it.
+    """
+
+    def update_infra(
+        self,
+        project: str,
+        tables_to_delete: Sequence[FeatureView],
+        tables_to_keep: Sequence[FeatureView],
+        entities_to_delete: Sequence[Entity],
+        entities_to_keep: Sequence[Entity],
+        partial: bool,
+    ):
+        super().update_infra(
+            project,
+            tables_to_delete,
+            tables_to_keep,
+            entities_to_delete,
+            entities_to_keep,
+            partial,
+        )
+        # Only runs on feast apply, feast plan validates the sources without
+        # changing anything
+        if getattr(self.repo_config.offline_store, "auto_create_indexes", False):
+            for feature_view in tables_to_keep:
+                source = getattr(feature_view, "batch_source", None)
+                if isinstance(source, MySQLSource):
+                    source.create_index(self.repo_config)
+
+    def materialize_single_feature_view(
+        self,
+        config: RepoConfig,
+        feature_view: FeatureView,
+        start_date: datetime,
+        end_date: datetime,
+        registry: Registry,
+        project: str,
+        tqdm_builder: Callable[[int], tqdm],
+    ) -> None:
+        if not isinstance(self.offline_store, MySQLOfflineStore):
+            return super().materialize_single_feature_view(
+                config,
+                feature_view,
+                start_date,
+                end_date,
+                registry,
+                project,
+                tqdm_builder,
+            )
+
+        entities = [
+            registry.get_entity(entity_name, project)
+            for entity_name in feature_view.entities
+        ]
+        (
+            join_key_columns,
+            feature_name_columns,
+            event_timestamp_column,
+            created_timestamp_column,
+        ) = _get_column_names(feature_view, entities)
+
+        offline_job = self.offline_store.pull_latest_from_table_or_query(
+            config=config,
+            data_source=feature_view.batch_source,
+            join_key_columns=join_key_columns,
+            feature_name_columns=feature_name_columns,
+            event_timestamp_column=event_timestamp_column,
+            created_timestamp_column=created_timestamp_column,
+            start_date=start_date,
+            end_date=end_date,
+            feature_view_name=feature_view.name,
+        )
+        table = offline_job.to_arrow()
+
+        if feature_view.batch_source.field_mapping is not None:
+            table = _run_field_mapping(table, feature_view.batch_source.field_mapping)
+
+        join_keys = {entity.join_key: entity.value_type for entity in entities}
+        with tqdm_builder(table.num_rows) as pbar:
+            for batch in table.to_batches(DEFAULT_BATCH_SIZE):
+                self.online_write_batch(
+                    self.repo_config,
+                    feature_view,
+                    _convert_arrow_to_proto(batch, feature_view, join_keys),
+                    lambda x: pbar.update(x),
+                )
+
+        # Every row is in the online store now, the next run can skip them
+        assert isinstance(offline_job, MySQLRetrievalJob)
+        offline_job.commit_watermark()
@@ -1,72 +1,295 @@
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
 from pymysql import DatabaseError
+from pymysql.cursors import Cursor
 
 from feast.protos.feast.core.Registry_pb2 import Registry as RegistryProto
 from feast.registry_store import RegistryStore
 from feast.repo_config import RegistryConfig
 from .mysql_config import MySQLConfig
-from .utils import _get_conn, get_cur
+from .utils import _get_conn, get_cur, max_statement_length
+
+# Blobs start with a byte no serialized RegistryProto starts with (there is no
+# field number 0), then the codec and the number of chunks the blob is split into.
+# Rows written before compression was added hold the bare proto and still load.
+_BLOB_MARKER = b"\x00"
+_BLOB_HEADER = struct.Struct(">cBI")
+_CODECS = {"none": 0, "zlib": 1, "zstd": 2}
 
 
 class MySQLRegistryStore(RegistryStore):
     def __init__(self, config: RegistryConfig, registry_path: str):
-        self.db_config = (
-            MySQLConfig(
-                host=config.host,
-                port=config.port,
-                database=config.database,
-                user=config.user,
-                password=config.password,
-            )
-            if config.database
-            else MySQLConfig(
-                host=config.host,
-                port=config.port,
-                user=config.user,
-                password=config.password,
-            )
+        self.db_config = MySQLConfig(
+            **{
+                name: getattr(config, name)
+                for name in MySQLConfig.__fields__
+                if getattr(config, name, None) is not None
+            }
         )
         self.table_name = config.path
         self.cache_ttl_seconds = config.cache_ttl_seconds
+        # Registry history retention, see compact()
+        self.keep_versions: Optional[int] = getattr(
+            config, "registry_keep_versions", None
+        )
+        self.keep_seconds: Optional[int] = getattr(
+            config, "registry_keep_seconds", None
+        )
+        # "zlib", "zstd" (needs the zstandard package) or "none"
+        self.compression: str = getattr(config, "registry_compression", "zlib")
+        if self.compression not in _CODECS:
+            raise ValueError(
+                f"Unknown registry_compression {self.compression!r}, "
+                f"expected one of {', '.join(_CODECS)}"
+            )
+        # Blobs longer than max_allowed_packet allows are split into rows of
+        # this table
+        self.chunks_table_name = f"{self.table_name}_chunks"
+
+        # The last registry read, with its version and when the version was checked
+        self._cache_lock = threading.Lock()
+        self._cached_proto: Optional[RegistryProto] = None
+        self._cached_version: Optional[int] = None
+        self._cache_checked_at = 0.0
+        self._cache_stats = {"hits": 0, "misses": 0, "version_checks": 0}
 
     def get_registry_proto(self) -> RegistryProto:
+        """
+        Return the latest registry. The parsed proto is cached together with its
+        version: within ``cache_ttl_seconds`` of the last check it is returned
+        straight away, after that only a ``MAX(version)`` lookup runs and the blob is
+        downloaded and parsed again only if the version changed. A TTL of 0 checks
+        the version on every call.
+
+        Callers get a copy and may modify it freely.
+        """
+        with self._cache_lock:
+            if (
+                self._cached_proto is not None
+                and time.monotonic() - self._cache_checked_at < self.cache_ttl_seconds
+            ):
+                self._cache_stats["hits"] += 1
+                return self._copy_cached_proto()
+
+            registry_proto = RegistryProto()
+            with _get_conn(self.db_config) as conn, get_cur(conn) as cur:
+                try:
+                    cur.execute(f"SELECT MAX(version) FROM {self.table_name}")
+                    self._cache_stats["version_checks"] += 1
+                    (version,) = cur.fetchone()
+                    if version is None:
+                        return registry_proto
+
+                    if version == self._cached_version:
+                        self._cache_stats["hits"] += 1
+                        self._cache_checked_at = time.monotonic()
+                        return self._copy_cached_proto()
+
+                    cur.execute(
+                        f"SELECT registry FROM {self.table_name} WHERE version = %s",
+                        (version,),
+                    )
+                    row = cur.fetchone()
+                    if not row:
+                        return registry_proto
+                    registry_proto = registry_proto.FromString(
+                        self._read_blob(cur, version, row[0])
+                    )
+                except DatabaseError:
+                    return registry_proto
+
+            self._cache_stats["misses"] += 1
+            self._cached_proto = registry_proto
+            self._cached_version = version
+            self._cache_checked_at = time.monotonic()
+            return self._copy_cached_proto()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Registry cache hits, misses (blob downloads) and version lookups"""
+        with self._cache_lock:
+            return dict(self._cache_stats)
+
+    def _copy_cached_proto(self) -> RegistryProto:
         registry_proto = RegistryProto()
-        with _get_conn(self.db_config) as conn, get_cur(conn) as cur:
-            query = (
-                f"SELECT registry FROM {self.table_name}  WHERE version = "
-                f"(SELECT max(version) FROM {self.table_name})"
-            )
-            try:
-                cur.execute(query)
-                row = cur.fetchone()
-                if row:
-                    registry_proto = registry_proto.FromString(row[0])
-            except DatabaseError:
-                pass
+        registry_proto.CopyFrom(self._cached_proto)
         return registry_proto
 
+    def _invalidate_cache(self):
+        with self._cache_lock:
+            self._cached_proto = None
+            self._cached_version = None
+
+    def _read_blob(self, cur: Cursor, version: int, blob: bytes) -> bytes:
+        """The serialized proto of a version, given the blob of its registry row"""
+        if blob[:1] != _BLOB_MARKER:
+            return blob
+
+        _, codec, chunk_count = _BLOB_HEADER.unpack_from(blob)
+        data = blob[_BLOB_HEADER.size :]
+        if chunk_count > 1:
+            cur.execute(
+                f"SELECT data FROM {self.chunks_table_name} WHERE version = %s "
+                f"ORDER BY chunk_index",
+                (version,),
+            )
+            chunks = [row[0] for row in cur.fetchall()]
+            if len(chunks) != chunk_count - 1:
+                raise ValueError(
+                    f"Registry version {version} has {len(chunks) + 1} of its "
+                    f"{chunk_count} chunks"
+                )
+            data = b"".join([data, *chunks])
+        return _decompress(data, codec)
+
     def update_registry_proto(self, registry_proto: RegistryProto):
         """
         Overwrites the current registry proto with the proto passed in. This method
-        writes to the registry path.
+        writes to the registry path. Earlier versions are kept according to the
+        configured retention, see ``compact``.
+
+        The proto is compressed with ``registry_compression``. Blobs too large for
+        one statement under the server's max_allowed_packet are split, the first
+        chunk goes into the registry row and the rest into the chunks table, all in
+        one transaction.
 
         Args:
             registry_proto: the new RegistryProto
         """
+        codec = _CODECS[self.compression]
+        data = _compress(registry_proto.SerializeToString(), self.compression)
+
         with _get_conn(self.db_config) as conn, get_cur(conn) as cur:
-            create_table_query = (
-                f"CREATE TABLE IF NOT EXISTS {self.table_name} (version BIGSERIAL "
-                f"PRIMARY KEY, registry BYTEA NOT NULL);"
+            self._create_tables(cur)
+
+            # Chunks are escaped into the statement, which can double their size
+            chunk_size = max(max_statement_length(cur) // 2, 1024)
+            chunks = _split(data, chunk_size - _BLOB_HEADER.size)
+
+            cur.execute(
+                f"INSERT INTO {self.table_name} (registry) VALUES (%s)",
+                (_BLOB_HEADER.pack(_BLOB_MARKER, codec, len(chunks)) + chunks[0],),
+            )
+            version = cur.lastrowid
+            for chunk_index, chunk in enumerate(chunks[1:], start=1):
+                cur.execute(
+                    f"INSERT INTO {self.chunks_table_name} "
+                    f"(version, chunk_index, data) VALUES (%s, %s, %s)",
+                    (version, chunk_index, chunk),
+                )
+            conn.commit()
+        self._invalidate_cache()
+
+        if self.keep_versions is not None or self.keep_seconds is not None:
+            self.compact()
+
+    def _create_tables(self, cur: Cursor):
+        # AUTO_INCREMENT primary key, so MAX(version) is a single index lookup
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table_name} ("
+            f"version BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY, "
+            f"registry LONGBLOB NOT NULL, "
+            f"created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6));"
+        )
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.chunks_table_name} ("
+            f"version BIGINT NOT NULL, "
+            f"chunk_index INT NOT NULL, "
+            f"data LONGBLOB NOT NULL, "
+            f"PRIMARY KEY (version, chunk_index));"
+        )
+
+    def compact(
+        self,
+        keep_versions: Optional[int] = None,
+        keep_seconds: Optional[int] = None,
+    ) -> int:
+        """
+        Delete old registry versions and return how many were deleted. A version is
+        kept if it is one of the ``keep_versions`` latest or is younger than
+        ``keep_seconds``; the latest version is always kept. Both default to the
+        registry config's ``registry_keep_versions`` and ``registry_keep_seconds``,
+        and with neither set nothing is deleted.
+        """
+        keep_versions = (
+            keep_versions if keep_versions is not None else self.keep_versions
+        )
+        keep_seconds = keep_seconds if keep_seconds is not None else self.keep_seconds
+        if keep_versions is None and keep_seconds is None:
+            return 0
+
+        with _get_conn(self.db_config) as conn, get_cur(conn) as cur:
+            self._create_tables(cur)
+            # MySQL can't DELETE from a table it selects from in a subquery, so the
+            # oldest version to keep is looked up first. Without keep_versions that
+            # is the latest version, which is never deleted.
+            cur.execute(
+                f"SELECT version FROM {self.table_name} ORDER BY version DESC "
+                f"LIMIT 1 OFFSET %s",
+                (max(keep_versions or 1, 1) - 1,),
             )
-            cur.execute(create_table_query)
+            row = cur.fetchone()
+            if row is None:
+                return 0
+
+            conditions = ["version < %s"]
+            params = [row[0]]
+            if keep_seconds is not None:
+                conditions.append("created_at < NOW(6) - INTERVAL %s SECOND")
+                params.append(keep_seconds)
 
-            # Do we want to keep track of the history or just keep the latest?
-            insert_query = (
-                f"INSERT INTO {self.table_name} (registry) VALUES "
-                f"({[registry_proto.SerializeToString()]});"
+            cur.execute(
+                f"DELETE FROM {self.table_name} WHERE {' AND '.join(conditions)}",
+                params,
+            )
+            deleted = cur.rowcount
+            # Chunks of the deleted versions
+            cur.execute(
+                f"DELETE c FROM {self.chunks_table_name} AS c "
+                f"LEFT JOIN {self.table_name} AS r ON r.version = c.version "
+                f"WHERE r.version IS NULL"
             )
-            cur.execute(insert_query)
+            conn.commit()
+        return deleted
 
     def teardown(self):
         with _get_conn(self.db_config) as conn, get_cur(conn) as cur:
-            query = f"DROP TABLE IF EXISTS {self.table_name};"
+            query = f"DROP TABLE IF EXISTS {self.table_name}, {self.chunks_table_name};"
             cur.execute(query)
+        self._invalidate_cache()
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(data)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().compress(data)
+    return data
+
+
+def _decompress(data: bytes, codec: int) -> bytes:
+    if codec == _CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec == _CODECS["zstd"]:
+        return _zstandard().ZstdDecompressor().decompress(data)
+    if codec == _CODECS["none"]:
+        return data
+    raise ValueError(f"Unknown registry blob codec {codec}")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "registry_compression zstd needs zstandard, "
+            "install it with `pip install zstandard`"
+        )
+    return zstandard
+
+
+def _split(data: bytes, chunk_size: int) -> List[bytes]:
+    return [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)] or [b""]
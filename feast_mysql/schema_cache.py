@@ -0,0 +1,95 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from .mysql_config import MySQLConfig
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and drop trailing semicolons, so layout doesn't matter"""
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";").rstrip()
+
+
+class SchemaCache:
+    """
+    Schemas learned by running ``SELECT * ... LIMIT 0`` probes, kept per server,
+    database and normalized query for ``schema_cache_ttl_seconds``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (monotonic time the schema was probed, schema)
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(
+        self, config: MySQLConfig, kind: str, query: str, probe: Callable[[], T]
+    ) -> T:
+        """
+        Return the cached ``kind`` schema of query, or run probe and cache its
+        result. A TTL of 0 probes every time.
+        """
+        ttl_seconds = config.schema_cache_ttl_seconds
+        key = (kind,) + _connection_identity(config) + (normalize_query(query),)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl_seconds:
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        # Probe without the lock, concurrent probes of the same query both run
+        schema = probe()
+        if ttl_seconds > 0:
+            with self._lock:
+                self._entries[key] = (time.monotonic(), schema)
+        return schema
+
+    def invalidate(
+        self, config: Optional[MySQLConfig] = None, query: Optional[str] = None
+    ) -> int:
+        """
+        Drop the cached schemas of query, or of every query, on the server of
+        config, or on every server. Returns how many were dropped.
+        """
+        identity = _connection_identity(config) if config is not None else None
+        normalized = normalize_query(query) if query is not None else None
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if (identity is None or key[1:-1] == identity)
+                and (normalized is None or key[-1] == normalized)
+            ]
+            for key in keys:
+                del self._entries[key]
+            self._stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+def _connection_identity(config: MySQLConfig) -> Tuple:
+    return (config.host, int(config.port), config.user, config.database)
+
+
+_schema_cache = SchemaCache()
+
+
+def get_schema_cache() -> SchemaCache:
+    """Return the process-wide schema cache"""
+    return _schema_cache
+
+
+def invalidate_schema_cache(
+    config: Optional[MySQLConfig] = None, query: Optional[str] = None
+) -> int:
+    """Drop cached schemas, see ``SchemaCache.invalidate``"""
+    return _schema_cache.invalidate(config, query)
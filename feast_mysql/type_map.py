@@ -1,160 +1,332 @@
-from typing import Dict
+import functools
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
 
 import pyarrow as pa
 
 from feast import ValueType
 from pymysql import FIELD_TYPE
+from pymysql.constants import FLAG
+from pymysql.cursors import Cursor
+
+# Character set number of binary strings (BINARY, VARBINARY and BLOB columns)
+BINARY_CHARSET = 63
+
+_ARROW_TYPE_STRING_TO_MYSQL_TYPE: Dict[str, str] = {
+    "null": "null",
+    "bool": "boolean",
+    "int8": "tinyint",
+    "int16": "smallint",
+    "int32": "int",
+    "int64": "bigint",
+    "list<item: int32>": "int[]",
+    "list<item: int64>": "bigint[]",
+    "list<item: bool>": "boolean[]",
+    "list<item: double>": "double[]",
+    "uint8": "tinyint unsigned",
+    "uint16": "smallint unsigned",
+    "uint32": "int unsigned",
+    "uint64": "bigint unsigned",
+    "float": "float",
+    "double": "double",
+    "binary": "longblob",
+    "string": "longtext",
+    "large_string": "longtext",
+}
+
+_MYSQL_TYPE_TO_ARROW_TYPE_STRING: Dict[str, str] = {
+    "null": "null",
+    "boolean": "bool",
+    "tinyint": "int8",
+    "smallint": "int16",
+    "int": "int32",
+    "bigint": "int64",
+    "bigint[]": "list<item: int64>",
+    "decimal": "double",
+    "float": "float",
+    "double": "double",
+    "binary": "binary",
+    "longtext": "string",
+}
+
+_MYSQL_TYPE_TO_FEAST_VALUE_TYPE: Dict[str, ValueType] = {
+    "boolean": ValueType.BOOL,
+    "bit": ValueType.BYTES,
+    "tinyint": ValueType.INT32,
+    "smallint": ValueType.INT32,
+    "mediumint": ValueType.INT32,
+    "int": ValueType.INT32,
+    "year": ValueType.INT32,
+    "bigint": ValueType.INT64,
+    "bigint unsigned": ValueType.INT64,
+    "float": ValueType.DOUBLE,
+    "double": ValueType.DOUBLE,
+    "decimal": ValueType.DOUBLE,
+    "numeric": ValueType.DOUBLE,
+    "char": ValueType.STRING,
+    "varchar": ValueType.STRING,
+    "tinytext": ValueType.STRING,
+    "text": ValueType.STRING,
+    "mediumtext": ValueType.STRING,
+    "longtext": ValueType.STRING,
+    "enum": ValueType.STRING,
+    "set": ValueType.STRING,
+    "json": ValueType.STRING,
+    "binary": ValueType.BYTES,
+    "varbinary": ValueType.BYTES,
+    "tinyblob": ValueType.BYTES,
+    "blob": ValueType.BYTES,
+    "mediumblob": ValueType.BYTES,
+    "longblob": ValueType.BYTES,
+    "geometry": ValueType.BYTES,
+    "date": ValueType.UNIX_TIMESTAMP,
+    "datetime": ValueType.UNIX_TIMESTAMP,
+    "timestamp": ValueType.UNIX_TIMESTAMP,
+    "null": ValueType.NULL,
+    "boolean[]": ValueType.BOOL_LIST,
+    "int[]": ValueType.INT32_LIST,
+    "bigint[]": ValueType.INT64_LIST,
+    "double[]": ValueType.DOUBLE_LIST,
+}
+
+_FEAST_VALUE_TYPE_TO_ARROW_TYPE: Dict[ValueType, pa.DataType] = {
+    ValueType.INT32: pa.int32(),
+    ValueType.INT64: pa.int64(),
+    ValueType.DOUBLE: pa.float64(),
+    ValueType.FLOAT: pa.float32(),
+    ValueType.STRING: pa.string(),
+    ValueType.BYTES: pa.binary(),
+    ValueType.BOOL: pa.bool_(),
+    ValueType.UNIX_TIMESTAMP: pa.timestamp("us"),
+    ValueType.INT32_LIST: pa.list_(pa.int32()),
+    ValueType.INT64_LIST: pa.list_(pa.int64()),
+    ValueType.DOUBLE_LIST: pa.list_(pa.float64()),
+    ValueType.FLOAT_LIST: pa.list_(pa.float32()),
+    ValueType.STRING_LIST: pa.list_(pa.string()),
+    ValueType.BYTES_LIST: pa.list_(pa.binary()),
+    ValueType.BOOL_LIST: pa.list_(pa.bool_()),
+    ValueType.UNIX_TIMESTAMP_LIST: pa.list_(pa.timestamp("us")),
+    ValueType.NULL: pa.null(),
+}
+
+# MySQL type of each result type code. Codes shared by text and binary strings map
+# to the text type, see resolve_column_type for the binary ones.
+_MYSQL_TYPE_CODE_TO_MYSQL_TYPE: Dict[int, str] = {
+    FIELD_TYPE.DECIMAL: "decimal",
+    FIELD_TYPE.NEWDECIMAL: "decimal",
+    FIELD_TYPE.TINY: "tinyint",
+    FIELD_TYPE.SHORT: "smallint",
+    FIELD_TYPE.INT24: "mediumint",
+    FIELD_TYPE.LONG: "int",
+    FIELD_TYPE.LONGLONG: "bigint",
+    FIELD_TYPE.YEAR: "year",
+    FIELD_TYPE.FLOAT: "float",
+    FIELD_TYPE.DOUBLE: "double",
+    FIELD_TYPE.NULL: "null",
+    FIELD_TYPE.TIMESTAMP: "timestamp",
+    FIELD_TYPE.DATETIME: "datetime",
+    FIELD_TYPE.DATE: "date",
+    FIELD_TYPE.NEWDATE: "date",
+    FIELD_TYPE.TIME: "time",
+    FIELD_TYPE.BIT: "bit",
+    FIELD_TYPE.JSON: "json",
+    FIELD_TYPE.ENUM: "enum",
+    FIELD_TYPE.SET: "set",
+    FIELD_TYPE.GEOMETRY: "geometry",
+    FIELD_TYPE.VARCHAR: "varchar",
+    FIELD_TYPE.VAR_STRING: "varchar",
+    FIELD_TYPE.STRING: "char",
+    FIELD_TYPE.TINY_BLOB: "tinytext",
+    FIELD_TYPE.BLOB: "text",
+    FIELD_TYPE.MEDIUM_BLOB: "mediumtext",
+    FIELD_TYPE.LONG_BLOB: "longtext",
+}
+
+# The same for binary strings
+_MYSQL_BINARY_TYPE_CODE_TO_MYSQL_TYPE: Dict[int, str] = {
+    FIELD_TYPE.VARCHAR: "varbinary",
+    FIELD_TYPE.VAR_STRING: "varbinary",
+    FIELD_TYPE.STRING: "binary",
+    FIELD_TYPE.TINY_BLOB: "tinyblob",
+    FIELD_TYPE.BLOB: "blob",
+    FIELD_TYPE.MEDIUM_BLOB: "mediumblob",
+    FIELD_TYPE.LONG_BLOB: "longblob",
+}
+
+# Arrow type each MySQL result column is decoded into. String and blob columns
+# share type codes, so they are left as ``None`` and inferred from the values when
+# the character set of the column isn't known.
+_MYSQL_TYPE_CODE_TO_ARROW_TYPE: Dict[int, Optional[pa.DataType]] = {
+    FIELD_TYPE.DECIMAL: pa.float64(),
+    FIELD_TYPE.NEWDECIMAL: pa.float64(),
+    FIELD_TYPE.TINY: pa.int32(),
+    FIELD_TYPE.SHORT: pa.int32(),
+    FIELD_TYPE.INT24: pa.int32(),
+    FIELD_TYPE.LONG: pa.int64(),
+    FIELD_TYPE.LONGLONG: pa.int64(),
+    FIELD_TYPE.YEAR: pa.int16(),
+    FIELD_TYPE.FLOAT: pa.float32(),
+    FIELD_TYPE.DOUBLE: pa.float64(),
+    FIELD_TYPE.NULL: pa.null(),
+    FIELD_TYPE.TIMESTAMP: pa.timestamp("us"),
+    FIELD_TYPE.DATETIME: pa.timestamp("us"),
+    FIELD_TYPE.DATE: pa.date32(),
+    FIELD_TYPE.NEWDATE: pa.date32(),
+    FIELD_TYPE.TIME: pa.duration("us"),
+    FIELD_TYPE.BIT: pa.binary(),
+    FIELD_TYPE.JSON: pa.string(),
+    FIELD_TYPE.VARCHAR: pa.string(),
+    FIELD_TYPE.ENUM: pa.string(),
+    FIELD_TYPE.SET: pa.string(),
+    FIELD_TYPE.GEOMETRY: pa.binary(),
+    FIELD_TYPE.VAR_STRING: None,
+    FIELD_TYPE.STRING: None,
+    FIELD_TYPE.TINY_BLOB: None,
+    FIELD_TYPE.MEDIUM_BLOB: None,
+    FIELD_TYPE.LONG_BLOB: None,
+    FIELD_TYPE.BLOB: None,
+}
+
+
+class ColumnType(NamedTuple):
+    """How a MySQL result column is named, decoded and exposed to Feast"""
+
+    mysql_type: str
+    # None when it has to be inferred from the decoded values
+    arrow_type: Optional[pa.DataType]
+    value_type: ValueType
+
+
+# name, type code, flags, length, scale and character set number of a result column
+ColumnShape = Tuple[str, int, int, int, int, Optional[int]]
 
 
 def arrow_type_string_to_mysql_type(t_str: str) -> str:
+    if t_str.startswith("timestamp"):
+        # Timezone-aware timestamps are uploaded as UTC
+        return "datetime(6)"
     try:
-        if t_str.startswith("timestamp"):
-            return "timestamptz" if "tz=" in t_str else "timestamp"
-        return {
-            "null": "null",
-            "bool": "boolean",
-            "int8": "tinyint",
-            "int16": "smallint",
-            "int32": "int",
-            "int64": "bigint",
-            "list<item: int32>": "int[]",
-            "list<item: int64>": "bigint[]",
-            "list<item: bool>": "boolean[]",
-            "list<item: double>": "double[]",
-            "uint8": "tinyint unsigned",
-            "uint16": "smallint unsigned",
-            "uint32": "int unsigned",
-            "uint64": "bigint unsigned",
-            "float": "float",
-            "double": "double",
-            "binary": "binary",
-            "string": "longtext",
-        }[t_str]
+        return _ARROW_TYPE_STRING_TO_MYSQL_TYPE[t_str]
     except KeyError:
         raise ValueError(f"Unsupported type: {t_str}")
 
 
 def mysql_type_to_arrow_type_string(t_str: str) -> str:
+    if t_str.startswith("timestamp"):
+        return "timestamptz" if "tz=" in t_str else "timestamp"
     try:
-        if t_str.startswith("timestamp"):
-            return "timestamptz" if "tz=" in t_str else "timestamp"
-        return {
-            "null": "null",
-            "boolean": "bool",
-            "tinyint": "int8",
-            "smallint": "int16",
-            "int": "int32",
-            "bigint": "int64",
-            "bigint[]": "list<item: int64>",
-            "decimal": "double",
-            "float": "float",
-            "double": "double",
-            "binary": "binary",
-            "longtext": "string",
-        }[t_str]
+        return _MYSQL_TYPE_TO_ARROW_TYPE_STRING[t_str]
     except KeyError:
         raise ValueError(f"Unsupported type: {t_str}")
 
 
 def mysql_type_to_feast_value_type(type_str: str) -> ValueType:
-    type_map: Dict[str, ValueType] = {
-        "boolean": ValueType.BOOL,
-        "blob": ValueType.BYTES,
-        "char": ValueType.STRING,
-        "bigint": ValueType.INT64,
-        "smallint": ValueType.INT32,
-        "int": ValueType.INT32,
-        "float": ValueType.DOUBLE,
-        "double": ValueType.DOUBLE,
-        "boolean[]": ValueType.BOOL_LIST,
-        "blob[]": ValueType.BYTES_LIST,
-        "char[]": ValueType.STRING_LIST,
-        "smallint[]": ValueType.INT32_LIST,
-        "int[]": ValueType.INT32_LIST,
-        "longtext": ValueType.STRING,
-        "longtext[]": ValueType.STRING_LIST,
-        "character[]": ValueType.STRING_LIST,
-        "bigint[]": ValueType.INT64_LIST,
-        "float[]": ValueType.DOUBLE_LIST,
-        "double[]": ValueType.DOUBLE_LIST,
-        "character": ValueType.STRING,
-        "varchar": ValueType.STRING,
-        "date": ValueType.UNIX_TIMESTAMP,
-        "time without time zone": ValueType.UNIX_TIMESTAMP,
-        "timestamp without time zone": ValueType.UNIX_TIMESTAMP,
-        "timestamp without time zone[]": ValueType.UNIX_TIMESTAMP_LIST,
-        "date[]": ValueType.UNIX_TIMESTAMP_LIST,
-        "time without time zone[]": ValueType.UNIX_TIMESTAMP_LIST,
-        "timestamp with time zone": ValueType.UNIX_TIMESTAMP,
-        "timestamp with time zone[]": ValueType.UNIX_TIMESTAMP_LIST,
-        "numeric[]": ValueType.DOUBLE_LIST,
-        "numeric": ValueType.DOUBLE,
-        "uuid": ValueType.STRING,
-        "uuid[]": ValueType.STRING_LIST,
-    }
-    value = (
-        type_map[type_str.lower()]
-        if type_str.lower() in type_map
-        else ValueType.UNKNOWN
-    )
+    # Accept full column types such as "varchar(255)" or "int unsigned"
+    type_str = type_str.lower()
+    value = _MYSQL_TYPE_TO_FEAST_VALUE_TYPE.get(type_str)
+    if value is None:
+        value = _MYSQL_TYPE_TO_FEAST_VALUE_TYPE.get(
+            type_str.split("(")[0].split(" ")[0], ValueType.UNKNOWN
+        )
     if value == ValueType.UNKNOWN:
         print("unknown type:", type_str)
     return value
 
 
 def feast_value_type_to_arrow_type(feast_type: ValueType) -> pa.DataType:
-    type_map = {
-        ValueType.INT32: pa.int32(),
-        ValueType.INT64: pa.int64(),
-        ValueType.DOUBLE: pa.float64(),
-        ValueType.FLOAT: pa.float32(),
-        ValueType.STRING: pa.string(),
-        ValueType.BYTES: pa.binary(),
-        ValueType.BOOL: pa.bool_(),
-        ValueType.UNIX_TIMESTAMP: pa.timestamp("us"),
-        ValueType.INT32_LIST: pa.list_(pa.int32()),
-        ValueType.INT64_LIST: pa.list_(pa.int64()),
-        ValueType.DOUBLE_LIST: pa.list_(pa.float64()),
-        ValueType.FLOAT_LIST: pa.list_(pa.float32()),
-        ValueType.STRING_LIST: pa.list_(pa.string()),
-        ValueType.BYTES_LIST: pa.list_(pa.binary()),
-        ValueType.BOOL_LIST: pa.list_(pa.bool_()),
-        ValueType.UNIX_TIMESTAMP_LIST: pa.list_(pa.timestamp("us")),
-        ValueType.NULL: pa.null(),
-    }
-    return type_map[feast_type]
+    return _FEAST_VALUE_TYPE_TO_ARROW_TYPE[feast_type]
 
 
 def mysql_type_code_to_mysql_type(code: int) -> str:
-    return {
-        FIELD_TYPE.DECIMAL: "",
-        FIELD_TYPE.TINY: "char",
-        FIELD_TYPE.SHORT: "smallint",
-        FIELD_TYPE.LONG: "int",
-        FIELD_TYPE.FLOAT: "float",
-        FIELD_TYPE.DOUBLE: "double",
-        FIELD_TYPE.NULL: "",
-        FIELD_TYPE.TIMESTAMP: "",
-        FIELD_TYPE.LONGLONG: "",
-        FIELD_TYPE.INT24: "",
-        FIELD_TYPE.DATE: "date",
-        FIELD_TYPE.TIME: "",
-        FIELD_TYPE.DATETIME: "",
-        FIELD_TYPE.YEAR: "",
-        FIELD_TYPE.NEWDATE: "",
-        FIELD_TYPE.VARCHAR: "varchar",
-        FIELD_TYPE.BIT: "boolean",
-        FIELD_TYPE.JSON: "",
-        FIELD_TYPE.NEWDECIMAL: "",
-        FIELD_TYPE.ENUM: "",
-        FIELD_TYPE.SET: "",
-        FIELD_TYPE.TINY_BLOB: "",
-        FIELD_TYPE.MEDIUM_BLOB: "",
-        FIELD_TYPE.LONG_BLOB: "",
-        FIELD_TYPE.BLOB: "blob",
-        FIELD_TYPE.VAR_STRING: "varchar",
-        FIELD_TYPE.STRING: "varchar",
-        FIELD_TYPE.GEOMETRY: "",
-        FIELD_TYPE.CHAR: "char",
-        FIELD_TYPE.INTERVAL: "",
-    }[code]
+    try:
+        return _MYSQL_TYPE_CODE_TO_MYSQL_TYPE[code]
+    except KeyError:
+        raise ValueError(f"Unsupported type code: {code}")
+
+
+def mysql_type_code_to_arrow_type(code: int) -> Optional[pa.DataType]:
+    """
+    Return the Arrow type for a ``cursor.description`` type code, or None when the
+    type has to be inferred from the decoded values (CHAR/TEXT vs BINARY/BLOB).
+    """
+    try:
+        return _MYSQL_TYPE_CODE_TO_ARROW_TYPE[code]
+    except KeyError:
+        raise ValueError(f"Unsupported type code: {code}")
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_column_type(
+    type_code: int,
+    flags: int = 0,
+    length: int = 0,
+    charsetnr: Optional[int] = None,
+) -> ColumnType:
+    """
+    Resolve a result column from its type code, flags, length and character set.
+    Without the character set, string columns are assumed to be text in
+    ``mysql_type`` and ``value_type`` and their Arrow type is left to inference.
+    """
+    binary = charsetnr == BINARY_CHARSET
+    if flags & FLAG.ENUM:
+        mysql_type = "enum"
+    elif flags & FLAG.SET:
+        mysql_type = "set"
+    elif binary and type_code in _MYSQL_BINARY_TYPE_CODE_TO_MYSQL_TYPE:
+        mysql_type = _MYSQL_BINARY_TYPE_CODE_TO_MYSQL_TYPE[type_code]
+    else:
+        mysql_type = mysql_type_code_to_mysql_type(type_code)
+
+    arrow_type = mysql_type_code_to_arrow_type(type_code)
+    if mysql_type in ("enum", "set"):
+        arrow_type = pa.string()
+    elif arrow_type is None and charsetnr is not None:
+        arrow_type = pa.binary() if binary else pa.string()
+    elif type_code == FIELD_TYPE.LONGLONG and flags & FLAG.UNSIGNED:
+        mysql_type = "bigint unsigned"
+        arrow_type = pa.uint64()
+    elif type_code == FIELD_TYPE.BIT and length == 1:
+        mysql_type = "boolean"
+        arrow_type = pa.bool_()
+
+    return ColumnType(
+        mysql_type, arrow_type, mysql_type_to_feast_value_type(mysql_type)
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def resolve_result_shape(shape: Tuple[ColumnShape, ...]) -> Tuple[ColumnType, ...]:
+    """Resolve the column types of a result set, cached per result shape"""
+    return tuple(
+        resolve_column_type(type_code, flags, length, charsetnr)
+        for _, type_code, flags, length, _, charsetnr in shape
+    )
+
+
+def result_shape(cur: Cursor) -> Tuple[ColumnShape, ...]:
+    """
+    The shape of the result of an executed cursor. Flags and character sets come
+    from the protocol field descriptors, which ``cursor.description`` leaves out.
+    """
+    fields = getattr(getattr(cur, "_result", None), "fields", None)
+    if fields and len(fields) == len(cur.description):
+        return tuple(
+            (
+                column[0],
+                field.type_code,
+                field.flags,
+                field.length,
+                field.scale,
+                field.charsetnr,
+            )
+            for column, field in zip(cur.description, fields)
+        )
+    return description_shape(cur.description)
+
+
+def description_shape(
+    description: Sequence[Tuple[Any, ...]]
+) -> Tuple[ColumnShape, ...]:
+    return tuple(
+        (column[0], column[1], 0, column[3] or 0, column[5] or 0, None)
+        for column in description
+    )
@@ -1,99 +1,436 @@
+import os
+import re
+import tempfile
 from contextlib import contextmanager
-from typing import Dict
+from typing import Dict, List, Optional, Type
 
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
 
-from pymysql import connect, Connection, err
+from pymysql import Connection, err
+from pymysql.constants import ER
 from pymysql.cursors import Cursor
 
+from .instrumentation import CONNECTION_ACQUIRE, SCHEMA_PROBE, timed
 from .mysql_config import MySQLConfig
-from .type_map import arrow_type_string_to_mysql_type
+from .pool import get_connection_pool
+from .schema_cache import get_schema_cache
+from .type_map import (
+    arrow_type_string_to_mysql_type,
+    resolve_result_shape,
+    result_shape,
+)
 
 
 @contextmanager
 def _get_conn(config: MySQLConfig) -> Connection:
+    """
+    Borrow a connection from the process-wide pool for config. The connection goes
+    back to the pool on exit, or is closed if the block raised.
+    """
+    pool = get_connection_pool(config)
+    with timed(CONNECTION_ACQUIRE):
+        conn = pool.acquire()
     try:
-        conn = (
-            connect(
-                database=config.database,
-                host=config.host,
-                port=int(config.port),
-                user=config.user,
-                password=config.password,
-                # options="-c search_path={}".format(config.db_schema or config.user),
-            )
-            if config.database
-            else connect(
-                host=config.host,
-                port=int(config.port),
-                user=config.user,
-                password=config.password,
-                # options="-c search_path={}".format(config.db_schema or config.user),
-            )
-        )
-
         yield conn
-    except err.MySQLError as error:
-        if error.errno == err.ER.ACCESS_DENIED_ERROR:
-            print("Something is wrong with your user name or password")
-        elif error.errno == err.ER.BAD_DB_ERROR:
-            print("Database does not exist")
-    finally:
-        conn.close()
+    except BaseException:
+        pool.release(conn, discard=True)
+        raise
+    else:
+        pool.release(conn)
 
 
 @contextmanager
-def get_cur(connection: Connection) -> Cursor:
+def get_cur(connection: Connection, cursor_class: Type[Cursor] = Cursor) -> Cursor:
     try:
-        cur = connection.cursor()
+        cur = connection.cursor(cursor_class)
 
         yield cur
     finally:
         cur.close()
 
 
+# Dense integer id of each distinct (entity keys, event timestamp) tuple of an
+# uploaded entity data frame
+ENTITY_ROW_ID_COLUMN = "_feast_entity_row_id"
+
+# Rows handed to each executemany() call on the INSERT path
+INSERT_CHUNK_ROWS = 100_000
+# Room left in max_allowed_packet for the statement text around the row values
+_PACKET_HEADROOM = 4096
+# Server or client refused LOAD DATA LOCAL INFILE
+_LOCAL_INFILE_DISABLED_ERRORS = (
+    ER.NOT_ALLOWED_COMMAND,
+    2068,  # CR_LOAD_DATA_LOCAL_INFILE_REJECTED
+    3948,  # ER_CLIENT_LOCAL_FILES_DISABLED
+)
+
+
+# String columns up to this many characters are created as VARCHAR, longer ones as
+# LONGTEXT, which the MEMORY engine doesn't support
+MAX_VARCHAR_LENGTH = 2048
+# Prefix length used when a LONGTEXT column is part of an index
+_TEXT_INDEX_PREFIX_LENGTH = 255
+# InnoDB limit on the length of an index key, in bytes
+MAX_INDEX_KEY_BYTES = 3072
+# Bytes per character of utf8mb4, the server's default character set
+_BYTES_PER_CHARACTER = 4
+# Bytes counted for a key part of any other type, no fixed size type takes more
+# than a DECIMAL's 16
+_FIXED_KEY_PART_BYTES = 16
+_CHARACTER_TYPE = re.compile(r"^(?:var)?char\((\d+)\)")
+# Column types that can only be indexed on a prefix
+_PREFIX_INDEXED_TYPES = {
+    "tinytext",
+    "text",
+    "mediumtext",
+    "longtext",
+    "tinyblob",
+    "blob",
+    "mediumblob",
+    "longblob",
+}
+
+
 def df_to_mysql_table(
-    config: MySQLConfig, df: pd.DataFrame, table_name: str
+    conn: Connection,
+    df: pd.DataFrame,
+    table_name: str,
+    local_infile: bool = False,
+    temporary: bool = False,
+    engine: Optional[str] = None,
+    index_columns: Optional[List[str]] = None,
+    row_id_columns: Optional[List[str]] = None,
+    column_types: Optional[Dict[str, str]] = None,
 ) -> Dict[str, str]:
     """
-    Create a table for the data frame, insert all the values, and return the table schema
-    """
-    with _get_conn(config) as conn, get_cur(conn) as cur:
-        cur.execute(df_to_create_table_sql(df, table_name))
+    Create a table for the data frame, bulk load all the values, and return the table
+    schema.
+
+    With ``local_infile`` the rows are streamed to the server as CSV through LOAD DATA
+    LOCAL INFILE. Otherwise, or when the server refuses local files, they are sent as
+    multi-row INSERT statements sized to the server's max_allowed_packet.
 
-        columns = sql_column_names(df)
-        mysql_insert_query = (
-            f'INSERT INTO {table_name} {columns} VALUES ({len(columns)*"%s, "})'
+    A composite index over ``index_columns`` is added once the rows are loaded, which
+    is cheaper than maintaining it row by row. Temporary tables only exist for
+    ``conn``, so queries using them must run on the same connection.
+
+    With ``row_id_columns``, every distinct combination of their values is numbered
+    with a dense BIGINT in an extra ENTITY_ROW_ID_COLUMN column. It is not part of
+    the returned schema.
+
+    ``column_types`` overrides the MySQL types of columns, e.g. with the
+    upload_column_types of a whole data frame when uploading parts of it, so every
+    part gets the same table schema.
+    """
+    schema = dict(zip(df.columns, df.dtypes))
+    if row_id_columns:
+        df = df.assign(
+            **{
+                ENTITY_ROW_ID_COLUMN: df.groupby(
+                    row_id_columns, sort=False, dropna=False
+                ).ngroup()
+            }
         )
-        cur.executemany(mysql_insert_query, list(df.to_records(index=False)))
-        conn.commit()
+    table = _df_to_upload_table(df)
+    with get_cur(conn) as cur:
+        cur.execute(
+            _create_table_sql(table, table_name, temporary, engine, column_types)
+        )
+        if not (local_infile and _load_data_local_infile(cur, table, table_name)):
+            _insert_values(cur, table, table_name)
+        if index_columns:
+            cur.execute(
+                _add_index_sql(table, table_name, index_columns, column_types)
+            )
+    conn.commit()
+
+    return schema
+
+
+def _df_to_upload_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert the data frame to Arrow in the shape MySQL expects: timestamps as naive
+    UTC microseconds for DATETIME(6) and booleans as integers.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            column = table.column(i).cast(pa.timestamp("us"), safe=False)
+        elif pa.types.is_boolean(field.type):
+            column = table.column(i).cast(pa.int8())
+        else:
+            continue
+        table = table.set_column(i, field.name, column)
+    return table.replace_schema_metadata(None)
+
+
+def _load_data_local_infile(cur: Cursor, table: pa.Table, table_name: str) -> bool:
+    """
+    Stream the table to the server with LOAD DATA LOCAL INFILE. Returns False, with
+    nothing loaded, when the data can't be written as CSV or local files are
+    disabled.
+    """
+    if any(
+        pa.types.is_binary(f.type) or pa.types.is_nested(f.type) for f in table.schema
+    ):
+        return False
+
+    try:
+        # NULL is written as \N, which LOAD DATA reads as NULL with a backslash
+        # escape, so NULL and empty strings stay apart
+        write_options = csv.WriteOptions(include_header=False, null_string="\\N")
+    except TypeError:
+        # pyarrow before null_string can only write NULL as an empty field
+        return False
+    table = _escape_backslashes(table)
+
+    fd, path = tempfile.mkstemp(prefix="feast_mysql_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            csv.write_csv(table, f, write_options)
+
+        columns = ", ".join(f"`{name}`" for name in table.column_names)
+        try:
+            cur.execute(
+                f"LOAD DATA LOCAL INFILE {cur.connection.escape(path)} "
+                f"INTO TABLE `{table_name}` "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                f"ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' "
+                f"({columns})"
+            )
+        except (err.OperationalError, err.InternalError) as error:
+            if error.args and error.args[0] in _LOCAL_INFILE_DISABLED_ERRORS:
+                return False
+            raise
+        return True
+    finally:
+        os.remove(path)
+
+
+def _escape_backslashes(table: pa.Table) -> pa.Table:
+    """Double the backslashes of string columns, LOAD DATA unescapes them"""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(
+                i, field, pc.replace_substring(table.column(i), "\\", "\\\\")
+            )
+    return table
 
-        return dict(zip(df.columns, df.dtypes))
+
+def max_statement_length(cur: Cursor) -> int:
+    """
+    The longest statement, in bytes, the server accepts with room for the statement
+    text around the values, from its max_allowed_packet
+    """
+    cur.execute("SELECT @@max_allowed_packet")
+    (max_allowed_packet,) = cur.fetchone()
+    return max(int(max_allowed_packet) - _PACKET_HEADROOM, 1024)
+
+
+def _insert_values(cur: Cursor, table: pa.Table, table_name: str):
+    """
+    Insert the table with multi-row INSERT statements. pymysql's executemany packs
+    as many rows into one statement as fit in max_stmt_length, which is set from
+    the server's max_allowed_packet.
+    """
+    cur.max_stmt_length = max_statement_length(cur)
+
+    columns = ", ".join(f"`{name}`" for name in table.column_names)
+    placeholders = ", ".join(["%s"] * table.num_columns)
+    insert_query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
+    for offset in range(0, table.num_rows, INSERT_CHUNK_ROWS):
+        chunk = table.slice(offset, INSERT_CHUNK_ROWS)
+        cur.executemany(
+            insert_query, list(zip(*(c.to_pylist() for c in chunk.columns)))
+        )
 
 
 def df_to_create_table_sql(entity_df, table_name) -> str:
-    columns = sql_column_names(entity_df)
-    return f'CREATE TABLE "{table_name}" {columns};'
+    return _create_table_sql(_df_to_upload_table(entity_df), table_name)
 
 
 def sql_column_names(entity_df) -> str:
-    pa_table = pa.Table.from_pandas(entity_df)
+    return _sql_column_definitions(_df_to_upload_table(entity_df))
+
+
+def upload_column_types(df: pd.DataFrame) -> Dict[str, str]:
+    """The MySQL types df_to_mysql_table creates the string columns of df with"""
+    table = _df_to_upload_table(df.select_dtypes(include=["object", "string"]))
+    return {
+        f.name: _mysql_column_type(table.column(i), f.type)
+        for i, f in enumerate(table.schema)
+    }
+
+
+def _create_table_sql(
+    table: pa.Table,
+    table_name: str,
+    temporary: bool = False,
+    engine: Optional[str] = None,
+    column_types: Optional[Dict[str, str]] = None,
+) -> str:
+    columns = _sql_column_definitions(table, column_types)
+    if engine and engine.upper() == "MEMORY" and "longtext" in columns:
+        # MEMORY tables can't hold TEXT columns, keep the server default instead
+        engine = None
+    return (
+        f"CREATE {'TEMPORARY ' if temporary else ''}TABLE `{table_name}` {columns}"
+        f"{f' ENGINE={engine}' if engine else ''};"
+    )
+
+
+def _sql_column_definitions(
+    table: pa.Table, column_types: Optional[Dict[str, str]] = None
+) -> str:
     columns = [
-        f'"{f.name}" {arrow_type_string_to_mysql_type(str(f.type))}'
-        for f in pa_table.schema
+        f"`{name}` {_column_type(table, name, column_types)}"
+        for name in table.column_names
     ]
     return f'({", ".join(columns)})'
 
 
+def _column_type(
+    table: pa.Table, name: str, column_types: Optional[Dict[str, str]]
+) -> str:
+    if column_types and name in column_types:
+        return column_types[name]
+    return _mysql_column_type(table.column(name), table.schema.field(name).type)
+
+
+def _mysql_column_type(column: pa.ChunkedArray, arrow_type: pa.DataType) -> str:
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        max_length = pc.max(pc.utf8_length(column)).as_py() or 1
+        if max_length <= MAX_VARCHAR_LENGTH:
+            return f"varchar({max_length})"
+    return arrow_type_string_to_mysql_type(str(arrow_type))
+
+
+def _add_index_sql(
+    table: pa.Table,
+    table_name: str,
+    index_columns: List[str],
+    column_types: Optional[Dict[str, str]] = None,
+) -> str:
+    return add_index_sql(
+        f"`{table_name}`",
+        index_columns,
+        [_column_type(table, name, column_types) for name in index_columns],
+    )
+
+
+def add_table_index(conn: Connection, table_name: str, index_columns: List[str]):
+    """
+    Index an existing table on index_columns, using a prefix of TEXT and BLOB
+    columns
+    """
+    columns = ", ".join(f"`{name}`" for name in index_columns)
+    with get_cur(conn) as cur:
+        cur.execute(f"SELECT {columns} FROM `{table_name}` LIMIT 0")
+        column_types = resolve_result_shape(result_shape(cur))
+        cur.execute(
+            add_index_sql(
+                f"`{table_name}`",
+                index_columns,
+                [column_type.mysql_type for column_type in column_types],
+            )
+        )
+
+
+def add_index_sql(
+    quoted_table_name: str,
+    index_columns: List[str],
+    mysql_types: List[str],
+    index_name: Optional[str] = None,
+) -> str:
+    """
+    The statement adding an index on index_columns, whose key parts come from
+    index_key_parts
+    """
+    key_parts = ", ".join(index_key_parts(index_columns, mysql_types))
+    name = f"`{index_name}` " if index_name else ""
+    # MEMORY tables default to HASH indexes, which can't serve the range and
+    # ordering conditions on the event timestamp
+    return (
+        f"ALTER TABLE {quoted_table_name} ADD INDEX {name}({key_parts}) USING BTREE"
+    )
+
+
+def index_key_part(column: str, mysql_type: str) -> str:
+    """The key part indexing column, a prefix of it for TEXT and BLOB columns"""
+    if mysql_type.lower() in _PREFIX_INDEXED_TYPES:
+        return f"`{column}`({_TEXT_INDEX_PREFIX_LENGTH})"
+    return f"`{column}`"
+
+
+def index_key_parts(columns: List[str], mysql_types: List[str]) -> List[str]:
+    """
+    The key parts of an index on columns. TEXT and BLOB columns are indexed on a
+    prefix, and so are CHAR and VARCHAR columns when the whole key would exceed
+    MAX_INDEX_KEY_BYTES. The available bytes are then shared evenly between the
+    string columns, shorter ones keep their full length.
+    """
+    lengths: Dict[str, int] = {}
+    fixed_bytes = 0
+    for column, mysql_type in zip(columns, mysql_types):
+        mysql_type = mysql_type.lower()
+        match = _CHARACTER_TYPE.match(mysql_type)
+        if match:
+            lengths[column] = int(match.group(1))
+        elif mysql_type in _PREFIX_INDEXED_TYPES:
+            lengths[column] = _TEXT_INDEX_PREFIX_LENGTH
+        else:
+            fixed_bytes += _FIXED_KEY_PART_BYTES
+
+    prefix_lengths = dict(lengths)
+    key_bytes = fixed_bytes + sum(lengths.values()) * _BYTES_PER_CHARACTER
+    if key_bytes > MAX_INDEX_KEY_BYTES:
+        available = (MAX_INDEX_KEY_BYTES - fixed_bytes) // _BYTES_PER_CHARACTER
+        by_length = sorted(lengths, key=lengths.get)
+        for i, column in enumerate(by_length):
+            prefix_lengths[column] = max(
+                min(lengths[column], available // (len(by_length) - i)), 1
+            )
+            available -= prefix_lengths[column]
+
+    return [
+        f"`{column}`({prefix_lengths[column]})"
+        if prefix_lengths.get(column, 0) < lengths.get(column, 0)
+        else index_key_part(column, mysql_type)
+        for column, mysql_type in zip(columns, mysql_types)
+    ]
+
+
+def quote_table_name(table_ref: str) -> str:
+    """Quote a ``table`` or ``database.table`` reference with backticks"""
+    return ".".join(f"`{part}`" for part in table_ref.split("."))
+
+
+def table_exists(cur: Cursor, table_ref: str) -> bool:
+    database, _, table_name = table_ref.rpartition(".")
+    cur.execute(
+        "SELECT 1 FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE()) AND TABLE_NAME = %s",
+        (database or None, table_name),
+    )
+    return cur.fetchone() is not None
+
+
 def get_query_schema(config: MySQLConfig, sql_query: str) -> Dict[str, str]:
     """
     We'll use the statement when we perform the query rather than copying data to a
-    new table
+    new table. Schemas are cached, see ``schema_cache_ttl_seconds``.
     """
-    with _get_conn(config) as conn:
-        df = pd.read_sql(
-            f"SELECT * FROM {sql_query} LIMIT 0",
-            conn,
-        )
-        return dict(zip(df.columns, df.dtypes))
+
+    def probe() -> Dict[str, str]:
+        with _get_conn(config) as conn, timed(SCHEMA_PROBE):
+            df = pd.read_sql(
+                f"SELECT * FROM {sql_query} LIMIT 0",
+                conn,
+            )
+            return dict(zip(df.columns, df.dtypes))
+
+    return dict(get_schema_cache().get(config, "dtypes", sql_query, probe))
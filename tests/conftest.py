@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from feast_mysql.mysql_config import MySQLConfig
+
+
+@pytest.fixture(scope="session")
+def mysql_config() -> MySQLConfig:
+    """
+    The MySQL 8 server the integration tests run against, set with the
+    FEAST_MYSQL_TEST_HOST, _PORT, _USER, _PASSWORD and _DATABASE environment
+    variables. Tests using it are skipped without FEAST_MYSQL_TEST_HOST.
+    """
+    host = os.environ.get("FEAST_MYSQL_TEST_HOST")
+    if not host:
+        pytest.skip("FEAST_MYSQL_TEST_HOST is not set")
+    return MySQLConfig(
+        host=host,
+        port=int(os.environ.get("FEAST_MYSQL_TEST_PORT", 3306)),
+        user=os.environ.get("FEAST_MYSQL_TEST_USER", "root"),
+        password=os.environ.get("FEAST_MYSQL_TEST_PASSWORD", ""),
+        database=os.environ.get("FEAST_MYSQL_TEST_DATABASE", "feast"),
+        local_infile=True,
+    )
@@ -0,0 +1,19 @@
+import pyarrow as pa
+from pymysql import FIELD_TYPE
+
+from feast_mysql.arrow_decoder import ArrowResultDecoder
+
+
+def test_untyped_column_keeps_its_type_after_an_all_null_batch():
+    # BLOB and TEXT share a type code, without a character set the Arrow type of
+    # the column is taken from the first batch
+    description = [("payload", FIELD_TYPE.BLOB, None, 65535, 65535, 0, True)]
+    decoder = ArrowResultDecoder(description)
+
+    first = decoder.decode([(None,), (None,)])
+    second = decoder.decode([("a",), (None,)])
+
+    assert first.schema == second.schema == decoder.schema
+    assert decoder.schema.field("payload").type == pa.string()
+    table = pa.Table.from_batches([first, second], schema=decoder.schema)
+    assert table.column("payload").to_pylist() == [None, None, "a", None]
@@ -0,0 +1,29 @@
+import pyarrow as pa
+from pyarrow import csv
+
+from feast_mysql.offline_store.outfile_export import (
+    _STRING_ESCAPES,
+    _csv_options,
+    _unescape_strings,
+)
+
+
+def exported_line(row_id, value):
+    # What SELECT ... INTO OUTFILE writes for the REPLACE()d string value
+    if value is None:
+        return f"{row_id},\\N\n"
+    for character, escaped in _STRING_ESCAPES:
+        value = value.replace(character, escaped)
+    value = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'{row_id},"{value}"\n'
+
+
+def test_exported_strings_round_trip_on_single_lines(tmp_path):
+    values = ["a\nb", "x\\ny", "\\s", "\0z", "c\r\nd", 'q"uote,', "N", None, ""]
+    path = tmp_path / "export.csv"
+    path.write_text("".join(exported_line(i, v) for i, v in enumerate(values)))
+    schema = pa.schema([("i", pa.int64()), ("s", pa.string())])
+
+    assert len(path.read_text().splitlines()) == len(values)
+    table = _unescape_strings(csv.read_csv(path, **_csv_options(schema)))
+    assert table.column("s").to_pylist() == values
@@ -0,0 +1,140 @@
+import pandas as pd
+import pytest
+
+from feast_mysql.offline_store.mysql import (
+    POINT_IN_TIME_JOIN_TEMPLATES,
+    _render_point_in_time_query,
+    build_point_in_time_query,
+)
+from feast_mysql.utils import _get_conn, df_to_mysql_table, get_cur
+
+FEATURE_TABLE = "feast_test_driver_stats"
+ENTITY_TABLE = "feast_test_entity_df"
+
+
+@pytest.fixture
+def feature_table(mysql_config):
+    with _get_conn(mysql_config) as conn, get_cur(conn) as cur:
+        cur.execute(f"DROP TABLE IF EXISTS `{FEATURE_TABLE}`")
+        cur.execute(
+            f"CREATE TABLE `{FEATURE_TABLE}` ("
+            "driver_id BIGINT NOT NULL, event_timestamp DATETIME(6) NOT NULL, "
+            "created DATETIME(6) NOT NULL, conv_rate DOUBLE)"
+        )
+        cur.executemany(
+            f"INSERT INTO `{FEATURE_TABLE}` VALUES (%s, %s, %s, %s)",
+            [
+                (1, "2022-01-01 00:00:00", "2022-01-01 00:00:00", 0.1),
+                (1, "2022-01-02 00:00:00", "2022-01-02 00:00:00", 0.2),
+                (1, "2022-01-02 00:00:00", "2022-01-02 01:00:00", 0.25),
+                (2, "2022-01-01 00:00:00", "2022-01-01 00:00:00", 0.3),
+            ],
+        )
+        conn.commit()
+    yield FEATURE_TABLE
+    with _get_conn(mysql_config) as conn, get_cur(conn) as cur:
+        cur.execute(f"DROP TABLE IF EXISTS `{FEATURE_TABLE}`")
+
+
+@pytest.mark.parametrize("template", sorted(POINT_IN_TIME_JOIN_TEMPLATES))
+def test_point_in_time_join_on_uploaded_entity_table(
+    mysql_config, feature_table, template
+):
+    # The entity table is a TEMPORARY table like the offline store's, which the
+    # window template reads from several CTEs
+    entity_df = pd.DataFrame(
+        {
+            "driver_id": [1, 1, 2, 3],
+            "event_timestamp": pd.to_datetime(
+                [
+                    "2022-01-01 12:00:00",
+                    "2022-01-03 00:00:00",
+                    "2022-01-01 06:00:00",
+                    "2022-01-02 00:00:00",
+                ]
+            ),
+        }
+    )
+    context = {
+        "name": "driver_stats",
+        "ttl": 0,
+        "entities": ["driver_id"],
+        "features": ["conv_rate"],
+        "event_timestamp_column": "event_timestamp",
+        "created_timestamp_column": "created",
+        "table_subquery": f"(SELECT * FROM `{feature_table}`)",
+        "entity_selections": ["`driver_id` AS `driver_id`"],
+        "entity_columns": [["driver_id", "driver_id"]],
+        "date_partition_condition": None,
+    }
+    query = build_point_in_time_query(
+        [context],
+        left_table_query_string=f"`{ENTITY_TABLE}`",
+        entity_df_event_timestamp_col="event_timestamp",
+        entity_df_columns=dict.fromkeys(entity_df.columns).keys(),
+        query_template=POINT_IN_TIME_JOIN_TEMPLATES[template],
+        entity_row_ids_uploaded=True,
+    )
+
+    with _get_conn(mysql_config) as conn:
+        df_to_mysql_table(
+            conn,
+            entity_df,
+            ENTITY_TABLE,
+            temporary=True,
+            index_columns=["driver_id", "event_timestamp"],
+            row_id_columns=["driver_id", "event_timestamp"],
+        )
+        try:
+            with get_cur(conn) as cur:
+                cur.execute(query)
+                rows = sorted(
+                    (driver_id, str(event_timestamp), conv_rate)
+                    for driver_id, event_timestamp, conv_rate in cur.fetchall()
+                )
+        finally:
+            with get_cur(conn) as cur:
+                cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{ENTITY_TABLE}`")
+
+    assert rows == [
+        (1, "2022-01-01 12:00:00", 0.1),
+        (1, "2022-01-03 00:00:00", 0.25),
+        (2, "2022-01-01 06:00:00", 0.3),
+        (3, "2022-01-02 00:00:00", None),
+    ]
+
+
+@pytest.mark.parametrize("template", sorted(POINT_IN_TIME_JOIN_TEMPLATES))
+def test_rendered_queries_are_reused_across_timestamp_ranges(template):
+    def build(day: int) -> str:
+        context = {
+            "name": "driver_stats",
+            "ttl": 0,
+            "entities": ["driver_id"],
+            "features": ["conv_rate"],
+            "event_timestamp_column": "event_timestamp",
+            "created_timestamp_column": None,
+            "table_subquery": "`driver_stats`",
+            "entity_selections": ["`driver_id` AS `driver_id`"],
+            "entity_columns": [["driver_id", "driver_id"]],
+            "min_event_timestamp": None,
+            "max_event_timestamp": f"2022-01-{day:02d}T00:00:00",
+            "date_partition_condition": f"sub.`ds` <= '2022-01-{day:02d}'",
+        }
+        return build_point_in_time_query(
+            [context],
+            left_table_query_string="`entity_df`",
+            entity_df_event_timestamp_col="event_timestamp",
+            entity_df_columns=dict.fromkeys(["driver_id", "event_timestamp"]).keys(),
+            query_template=POINT_IN_TIME_JOIN_TEMPLATES[template],
+            entity_row_ids_uploaded=True,
+        )
+
+    first = build(1)
+    hits = _render_point_in_time_query.cache_info().hits
+    second = build(2)
+
+    assert _render_point_in_time_query.cache_info().hits == hits + 1
+    assert "sub.`ds` <= '2022-01-01'" in first
+    assert "sub.`ds` <= '2022-01-02'" in second
+    assert first.replace("2022-01-01", "2022-01-02") == second
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pytest
+
+from feast_mysql.offline_store.mysql import (
+    _drop_seen_entities,
+    _pull_latest_query_generator,
+    _watermark_commit_mode,
+)
+
+
+class FixedWatermark:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, conn):
+        return self.value
+
+
+def pull_latest_query(watermark, pull_end_date):
+    with _pull_latest_query_generator(
+        None,
+        watermark=FixedWatermark(watermark),
+        pull_end_date=pull_end_date,
+        from_expression="`driver_stats`",
+        join_key_columns=["driver_id"],
+        feature_name_columns=["conv_rate"],
+        event_timestamp_column="event_timestamp",
+        created_timestamp_column="created",
+        start_date=datetime(2022, 1, 1, tzinfo=timezone.utc),
+        end_date=pull_end_date,
+    ) as query:
+        return query
+
+
+def test_pull_after_the_watermark_skips_rows_already_read():
+    query = pull_latest_query(
+        datetime(2022, 1, 5), datetime(2022, 1, 10, tzinfo=timezone.utc)
+    )
+    assert "a.`event_timestamp` > '2022-01-05 00:00:00.000000'" in query
+    assert "_feast_watermark" in query
+
+
+def test_backfill_ending_before_the_watermark_reads_the_whole_range():
+    query = pull_latest_query(
+        datetime(2022, 1, 5), datetime(2022, 1, 3, tzinfo=timezone.utc)
+    )
+    assert "> '2022-01-05" not in query
+    assert "_feast_watermark" in query
+
+
+def test_drop_seen_entities_compares_join_keys_by_value():
+    seen_entities = set()
+    join_keys = ["driver_id", "city"]
+    first = pa.table(
+        {"driver_id": [1, 2], "city": ["a", "b"], "conv_rate": [0.1, 0.2]}
+    )
+    second = pa.table(
+        {"driver_id": [2, 2, 3], "city": ["b", "c", None], "conv_rate": [0.3, 0.4, 0.5]}
+    )
+
+    assert _drop_seen_entities(first, join_keys, seen_entities).num_rows == 2
+    remaining = _drop_seen_entities(second, join_keys, seen_entities)
+
+    assert remaining.column("conv_rate").to_pylist() == [0.4, 0.5]
+    assert seen_entities == {(1, "a"), (2, "b"), (2, "c"), (3, None)}
+
+
+@pytest.mark.parametrize(
+    "provider, commit, expected",
+    [
+        ("feast_mysql.MySQLProvider", None, "manual"),
+        ("feast_mysql.provider.MySQLProvider", None, "manual"),
+        ("local", None, "on_read"),
+        ("feast.infra.passthrough_provider.PassthroughProvider", None, "on_read"),
+        ("local", "manual", "manual"),
+        ("feast_mysql.MySQLProvider", "on_read", "on_read"),
+    ],
+)
+def test_watermark_commit_mode_follows_the_provider(provider, commit, expected):
+    config = SimpleNamespace(
+        provider=provider,
+        offline_store=SimpleNamespace(materialization_watermark_commit=commit),
+    )
+    assert _watermark_commit_mode(config) == expected
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from pymysql.cursors import DictCursor
+
+from feast import Entity, Feature, FeatureView, ValueType
+from feast_mysql import MySQLSource
+from feast_mysql.offline_store.mysql import (
+    _date_partition_condition,
+    _get_query_context,
+    _pull_latest_query,
+    _time_slices,
+)
+from feast_mysql.utils import _get_conn, get_cur
+
+PLUS_FIVE = timezone(timedelta(hours=5))
+
+
+class EntityRegistry:
+    """The part of the registry query contexts are built from"""
+
+    def __init__(self, *entities: Entity):
+        self.entities = {entity.name: entity for entity in entities}
+
+    def get_entity(self, name, project):
+        return self.entities[name]
+
+    def list_on_demand_feature_views(self, project):
+        return []
+
+
+def test_date_partition_condition_bounds_by_utc_date():
+    # 01:00 at +05:00 is still the previous day in UTC
+    condition = _date_partition_condition(
+        "ds",
+        datetime(2022, 1, 2, 1, tzinfo=PLUS_FIVE),
+        datetime(2022, 1, 3, 12, tzinfo=timezone.utc),
+    )
+    assert condition == "ds >= '2022-01-01' AND ds <= '2022-01-03 12:00:00.000000'"
+
+
+def test_date_partition_condition_without_start():
+    assert _date_partition_condition("ds", None, datetime(2022, 1, 3)) == (
+        "ds <= '2022-01-03 00:00:00.000000'"
+    )
+
+
+def test_time_slices_without_slice_seconds_is_the_whole_range():
+    start, end = datetime(2022, 1, 1), datetime(2022, 1, 2)
+    assert _time_slices(start, end, None) == [(start, end, True)]
+
+
+def test_time_slices_only_include_the_end_of_the_last_slice():
+    start = datetime(2022, 1, 1)
+    slices = _time_slices(start, start + timedelta(hours=5), 2 * 3600)
+    assert slices == [
+        (start, start + timedelta(hours=2), False),
+        (start + timedelta(hours=2), start + timedelta(hours=4), False),
+        (start + timedelta(hours=4), start + timedelta(hours=5), True),
+    ]
+
+
+def test_query_context_partition_bounds_are_utc():
+    driver = Entity(name="driver", value_type=ValueType.INT64, join_key="driver_id")
+    feature_view = FeatureView(
+        name="driver_stats",
+        entities=["driver"],
+        ttl=timedelta(hours=2),
+        features=[Feature(name="conv_rate", dtype=ValueType.DOUBLE)],
+        batch_source=MySQLSource(
+            table="driver_stats",
+            event_timestamp_column="event_timestamp",
+            date_partition_column="ds",
+        ),
+    )
+    entity_df = pd.DataFrame(
+        {
+            "driver_id": [1, 2],
+            "event_timestamp": [
+                pd.Timestamp("2022-01-02 03:00", tz=PLUS_FIVE),
+                pd.Timestamp("2022-01-03 04:00", tz=PLUS_FIVE),
+            ],
+        }
+    )
+
+    (context,) = _get_query_context(
+        None,
+        entity_df,
+        "event_timestamp",
+        "`entity_df`",
+        [feature_view],
+        ["driver_stats:conv_rate"],
+        EntityRegistry(driver),
+        "project",
+    )
+
+    # The earliest visible row is at 2022-01-01 20:00 UTC, two hours before the
+    # earliest entity row
+    assert context["date_partition_condition"] == (
+        "sub.`ds` >= '2022-01-01' AND sub.`ds` <= '2022-01-02 23:00:00.000000'"
+    )
+
+
+def test_pull_queries_prune_date_partitions(mysql_config):
+    with _get_conn(mysql_config) as conn, get_cur(conn, DictCursor) as cur:
+        cur.execute("DROP TABLE IF EXISTS feast_test_partitioned")
+        cur.execute(
+            "CREATE TABLE feast_test_partitioned ("
+            "driver_id BIGINT, event_timestamp DATETIME(6), ds DATE, conv_rate DOUBLE"
+            ") PARTITION BY RANGE COLUMNS(ds) ("
+            "PARTITION p20220101 VALUES LESS THAN ('2022-01-02'), "
+            "PARTITION p20220102 VALUES LESS THAN ('2022-01-03'), "
+            "PARTITION p20220103 VALUES LESS THAN ('2022-01-04'), "
+            "PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        )
+        try:
+            cur.execute(
+                "EXPLAIN "
+                + _pull_latest_query(
+                    from_expression="`feast_test_partitioned`",
+                    join_key_columns=["driver_id"],
+                    feature_name_columns=["conv_rate"],
+                    event_timestamp_column="event_timestamp",
+                    created_timestamp_column=None,
+                    # 2022-01-01 22:00 UTC
+                    start_date=datetime(2022, 1, 2, 3, tzinfo=PLUS_FIVE),
+                    end_date=datetime(2022, 1, 2, 12, tzinfo=timezone.utc),
+                    date_partition_column="ds",
+                )
+            )
+            plan = cur.fetchall()
+        finally:
+            cur.execute("DROP TABLE feast_test_partitioned")
+
+    (row,) = [row for row in plan if row["table"] == "a"]
+    assert row["partitions"] == "p20220101,p20220102"
@@ -0,0 +1,46 @@
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+
+from feast import FeatureStore
+from feast.infra.offline_stores.offline_store import RetrievalMetadata
+from feast.protos.feast.core.SavedDataset_pb2 import (
+    SavedDatasetStorage as SavedDatasetStorageProto,
+)
+from feast_mysql.offline_store.mysql import MySQLRetrievalJob
+from feast_mysql.offline_store.mysql_source import SavedDatasetMySQLStorage
+
+
+@pytest.mark.skipif(
+    "custom_storage" in SavedDatasetStorageProto.DESCRIPTOR.fields_by_name,
+    reason="this Feast release can register MySQL saved datasets",
+)
+def test_create_saved_dataset_fails_before_writing_the_table():
+    queries_run = []
+
+    @contextlib.contextmanager
+    def query_generator(conn):
+        queries_run.append(conn)
+        yield "SELECT 1"
+
+    job = MySQLRetrievalJob(
+        query_generator,
+        config=SimpleNamespace(offline_store=SimpleNamespace(pool_max_size=1)),
+        full_feature_names=False,
+        on_demand_feature_views=None,
+        metadata=RetrievalMetadata(
+            features=["driver_stats:conv_rate"], keys=["driver_id"]
+        ),
+    )
+    # Nothing past persist may be reached, the store is never used
+    store = SimpleNamespace()
+
+    with pytest.raises(NotImplementedError):
+        FeatureStore.create_saved_dataset(
+            store,
+            from_=job,
+            name="driver_training",
+            storage=SavedDatasetMySQLStorage(table_ref="feast_test_saved_dataset"),
+        )
+    assert queries_run == []
@@ -0,0 +1,30 @@
+import time
+
+from pymysql.cursors import SSCursor
+
+from feast_mysql.offline_store.mysql import _stop_unbuffered_query
+from feast_mysql.utils import _get_conn, get_cur
+
+# Far more rows than the client would want to drain
+LONG_QUERY = """
+    WITH RECURSIVE n (i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50000000)
+    SELECT i, REPEAT('x', 100) AS padding FROM n
+"""
+
+
+def test_stopping_an_unbuffered_query_does_not_drain_it(mysql_config):
+    with _get_conn(mysql_config) as conn:
+        with get_cur(conn) as cur:
+            cur.execute("SET SESSION cte_max_recursion_depth = 100000000")
+        with get_cur(conn, SSCursor) as cur:
+            cur.execute(LONG_QUERY)
+            assert len(cur.fetchmany(1000)) == 1000
+
+            start = time.perf_counter()
+            _stop_unbuffered_query(mysql_config, conn, cur)
+            assert time.perf_counter() - start < 10
+
+        # The connection is still usable afterwards
+        with get_cur(conn) as cur:
+            cur.execute("SELECT 1")
+            assert cur.fetchone() == (1,)
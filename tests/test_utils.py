@@ -0,0 +1,100 @@
+import pandas as pd
+import pyarrow as pa
+
+from feast_mysql.utils import (
+    MAX_INDEX_KEY_BYTES,
+    _add_index_sql,
+    _create_table_sql,
+    _df_to_upload_table,
+    _escape_backslashes,
+    _get_conn,
+    df_to_mysql_table,
+    get_cur,
+    index_key_parts,
+    upload_column_types,
+)
+
+
+def test_index_key_parts_keep_keys_within_the_limit():
+    assert index_key_parts(["driver_id", "ts"], ["bigint", "datetime(6)"]) == [
+        "`driver_id`",
+        "`ts`",
+    ]
+    assert index_key_parts(["name", "ts"], ["longtext", "datetime(6)"]) == [
+        "`name`(255)",
+        "`ts`",
+    ]
+
+
+def test_index_key_parts_prefix_varchar_keys_over_the_limit():
+    key_parts = index_key_parts(
+        ["a", "b", "c", "ts"],
+        ["varchar(2048)", "varchar(10)", "varchar(2048)", "datetime(6)"],
+    )
+    assert key_parts[1] == "`b`"
+    assert key_parts[3] == "`ts`"
+    prefixes = [int(part.split("(")[1].rstrip(")")) for part in key_parts[::2]]
+    assert prefixes[0] == prefixes[1]
+    assert (sum(prefixes) + 10) * 4 + 16 <= MAX_INDEX_KEY_BYTES
+
+
+def test_add_index_sql_uses_btree():
+    table = _df_to_upload_table(
+        pd.DataFrame(
+            {
+                "driver_id": ["x" * 2048],
+                "event_timestamp": pd.to_datetime(["2022-01-01"]),
+            }
+        )
+    )
+    assert _add_index_sql(table, "t", ["driver_id", "event_timestamp"]) == (
+        "ALTER TABLE `t` ADD INDEX (`driver_id`(764), `event_timestamp`) USING BTREE"
+    )
+
+
+def test_source_index_sql_shares_the_key_part_rules():
+    from feast_mysql.offline_store.index_advisor import _create_index_sql, index_name
+
+    assert _create_index_sql(
+        "db.driver_stats", ["name", "ts"], ["varchar(4096)", "datetime(6)"]
+    ) == (
+        f"ALTER TABLE `db`.`driver_stats` ADD INDEX `{index_name(['name', 'ts'])}` "
+        "(`name`(764), `ts`) USING BTREE"
+    )
+
+
+def test_escape_backslashes_only_touches_strings():
+    table = _escape_backslashes(pa.table({"s": ["a\\b", None, ""], "i": [1, None, 3]}))
+    assert table.column("s").to_pylist() == ["a\\\\b", None, ""]
+    assert table.column("i").to_pylist() == [1, None, 3]
+
+
+def test_load_data_keeps_nulls_and_empty_strings_apart(mysql_config):
+    df = pd.DataFrame(
+        {"s": ["", None, "a\\b", '"q"', "\\N"], "i": [1.0, None, 3.0, 4.0, 5.0]}
+    )
+    with _get_conn(mysql_config) as conn:
+        df_to_mysql_table(conn, df, "feast_test_load_data", local_infile=True)
+        try:
+            with get_cur(conn) as cur:
+                cur.execute("SELECT s, i FROM feast_test_load_data")
+                rows = cur.fetchall()
+        finally:
+            with get_cur(conn) as cur:
+                cur.execute("DROP TABLE feast_test_load_data")
+
+    assert sorted(rows, key=repr) == sorted(
+        [("", 1.0), (None, None), ("a\\b", 3.0), ('"q"', 4.0), ("\\N", 5.0)],
+        key=repr,
+    )
+
+
+def test_parts_of_a_data_frame_share_its_column_types():
+    df = pd.DataFrame({"name": ["a", "abcdef"], "value": [1, 2]})
+    column_types = upload_column_types(df)
+    assert column_types == {"name": "varchar(6)"}
+
+    first_part = _df_to_upload_table(df.iloc[:1])
+    assert _create_table_sql(first_part, "t", column_types=column_types) == (
+        "CREATE TABLE `t` (`name` varchar(6), `value` bigint);"
+    )